@@ -1,12 +1,32 @@
 """
 MFA Setup Routes
 Provides endpoints for TOTP-based Multi-Factor Authentication setup.
+
+Enrollments live in an MfaEnrollmentStore:
+- Pending (unverified) secrets are kept in memory only and expire after
+  MFA_PENDING_TTL seconds; at most MFA_PENDING_MAX are held at once, oldest
+  evicted first. Calling /api/mfa/init again replaces the user's pending
+  secret instead of leaving the old one behind.
+- Verified secrets are written to an append-only log (fsynced before the
+  enrollment is acknowledged) and replayed on startup. The log is compacted
+  to one line per user when it grows past twice the live record count.
+- Each verified record remembers the last accepted TOTP time step; a code
+  for that step or an earlier one is rejected, so a code can't be replayed
+  within its validity window.
+- /api/mfa/status is a dict lookup - no I/O.
 """
 
 import pyotp
 import qrcode
 import io
+import os
+import json
+import time
+import hmac
 import base64
+import asyncio
+import threading
+from collections import OrderedDict
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import JSONResponse, HTMLResponse
 from typing import Optional
@@ -14,9 +34,207 @@ from typing import Optional
 # Create router
 router = APIRouter()
 
-# In-memory storage for MFA secrets (in production, store in database)
-# Format: {email: {"secret": "...", "verified": False}}
-mfa_secrets = {}
+# Where verified enrollments are persisted (contains TOTP secrets - mode 0600)
+MFA_STORE_PATH = os.environ.get('MFA_STORE_PATH', '/opt/employee-portal/data/mfa_enrollments.log')
+# Seconds an unverified secret from /api/mfa/init stays usable
+MFA_PENDING_TTL = int(os.environ.get('MFA_PENDING_TTL', '600'))
+# Upper bound on unverified secrets held in memory
+MFA_PENDING_MAX = int(os.environ.get('MFA_PENDING_MAX', '10000'))
+# Accept codes from this many time steps either side of now (clock drift)
+MFA_VALID_WINDOW = 1
+# Compact the log once it has this many lines more than live records
+MFA_COMPACT_SLACK = 100
+
+
+class Enrollment:
+    """One user's TOTP secret."""
+
+    __slots__ = ('secret', 'created_at', 'verified_at', 'last_step')
+
+    def __init__(self, secret: str, created_at: float, verified_at: Optional[float] = None, last_step: int = -1):
+        self.secret = secret
+        self.created_at = created_at
+        self.verified_at = verified_at
+        # Last TOTP time step accepted for this secret (replay protection)
+        self.last_step = last_step
+
+
+class MfaEnrollmentStore:
+    """
+    Pending enrollments with TTL eviction plus verified enrollments backed by
+    an append-only log.
+
+    Log lines are JSON objects:
+        {"op": "enroll", "email": ..., "secret": ..., "verified_at": ..., "step": ...}
+        {"op": "step", "email": ..., "step": ...}
+        {"op": "remove", "email": ...}
+    """
+
+    def __init__(self, path: str, pending_ttl: int = MFA_PENDING_TTL, pending_max: int = MFA_PENDING_MAX):
+        self.path = path
+        self.pending_ttl = pending_ttl
+        self.pending_max = pending_max
+        # email -> Enrollment, oldest first (insertion order = creation order)
+        self.pending = OrderedDict()
+        # email -> verified Enrollment
+        self.verified = {}
+        self.log_lines = 0
+        self.lock = threading.Lock()
+        self._log = None
+        self._replay()
+
+    # -- persistence --------------------------------------------------------
+
+    def _replay(self) -> None:
+        """Rebuild verified enrollments from the log, cutting off a torn last line."""
+        if not os.path.exists(self.path):
+            return
+        good_bytes = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Crash mid-append: the entry was never acknowledged
+                    print(f"[MFA-STORE] Truncating torn last line in {self.path}")
+                    break
+                good_bytes += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    print(f"[MFA-STORE] Skipping unreadable log line in {self.path}")
+                    continue
+                self.log_lines += 1
+                self._apply(entry)
+        if good_bytes < os.path.getsize(self.path):
+            os.truncate(self.path, good_bytes)
+        print(f"[MFA-STORE] Loaded {len(self.verified)} enrollments from {self.path} ({self.log_lines} log lines)")
+
+    def _apply(self, entry: dict) -> None:
+        email = entry['email']
+        if entry['op'] == 'enroll':
+            self.verified[email] = Enrollment(entry['secret'], entry['verified_at'], entry['verified_at'], entry.get('step', -1))
+        elif entry['op'] == 'step' and email in self.verified:
+            self.verified[email].last_step = max(self.verified[email].last_step, entry['step'])
+        elif entry['op'] == 'remove':
+            self.verified.pop(email, None)
+
+    def _open_log(self):
+        if self._log is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            self._log = os.fdopen(fd, 'a')
+        return self._log
+
+    def _append(self, entry: dict) -> None:
+        """Durably append one entry before it is applied in memory."""
+        log = self._open_log()
+        log.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        log.flush()
+        os.fsync(log.fileno())
+        self.log_lines += 1
+
+    def _maybe_compact(self) -> None:
+        """Compact once superseded lines outnumber live records (call after applying an entry)."""
+        if self.log_lines > 2 * len(self.verified) + MFA_COMPACT_SLACK:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the log as one enroll line per verified user, then swap it in atomically."""
+        tmp_path = self.path + '.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            for email, record in self.verified.items():
+                f.write(json.dumps({
+                    'op': 'enroll', 'email': email, 'secret': record.secret,
+                    'verified_at': record.verified_at, 'step': record.last_step
+                }, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        os.replace(tmp_path, self.path)
+        self.log_lines = len(self.verified)
+        print(f"[MFA-STORE] Compacted log to {self.log_lines} lines")
+
+    # -- pending enrollments ------------------------------------------------
+
+    def _evict_pending(self, now: float) -> None:
+        while self.pending:
+            email, record = next(iter(self.pending.items()))
+            if now - record.created_at < self.pending_ttl and len(self.pending) <= self.pending_max:
+                break
+            del self.pending[email]
+
+    def begin(self, email: str, secret: str, now: Optional[float] = None) -> None:
+        """Start (or restart) enrollment with a new, unverified secret."""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.pending.pop(email, None)
+            self.pending[email] = Enrollment(secret, now)
+            self._evict_pending(now)
+
+    # -- verification -------------------------------------------------------
+
+    def verify(self, email: str, code: str, now: Optional[float] = None) -> Optional[str]:
+        """
+        Check a TOTP code against the user's pending or verified secret.
+
+        A correct code for a pending secret makes it the user's verified
+        secret. A code whose time step was already accepted is rejected.
+
+        Args:
+            email: User email
+            code: 6-digit code from the authenticator app
+            now: Unix time to verify at (default: current time)
+
+        Returns:
+            str: None if accepted, otherwise 'not_initialized', 'invalid' or 'replayed'
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self._evict_pending(now)
+            record = self.pending.get(email) or self.verified.get(email)
+            if record is None:
+                return 'not_initialized'
+            # compare_digest raises TypeError on non-ASCII str, so reject those here
+            if not (code.isascii() and code.isdigit()):
+                return 'invalid'
+
+            totp = pyotp.TOTP(record.secret)
+            current = int(now // totp.interval)
+            step = next((s for s in range(current - MFA_VALID_WINDOW, current + MFA_VALID_WINDOW + 1)
+                         if hmac.compare_digest(totp.generate_otp(s), code)), None)
+            if step is None:
+                return 'invalid'
+            if step <= record.last_step:
+                return 'replayed'
+
+            if email in self.pending and self.pending[email] is record:
+                self._append({'op': 'enroll', 'email': email, 'secret': record.secret, 'verified_at': now, 'step': step})
+                del self.pending[email]
+                record.verified_at = now
+                self.verified[email] = record
+            else:
+                self._append({'op': 'step', 'email': email, 'step': step})
+            record.last_step = step
+            self._maybe_compact()
+            return None
+
+    def remove(self, email: str) -> None:
+        """Forget a user's enrollment (pending and verified)."""
+        with self.lock:
+            self.pending.pop(email, None)
+            if email in self.verified:
+                self._append({'op': 'remove', 'email': email})
+                del self.verified[email]
+                self._maybe_compact()
+
+    def is_enabled(self, email: str) -> bool:
+        """True if the user has a verified secret (in-memory lookup)."""
+        return email in self.verified
+
+
+mfa_store = MfaEnrollmentStore(MFA_STORE_PATH)
 
 def require_auth(request: Request):
     """Extract user email from ALB headers."""
@@ -38,11 +256,8 @@ async def initialize_mfa(request: Request):
     # Generate a new TOTP secret
     secret = pyotp.random_base32()
 
-    # Store the secret temporarily (not verified yet)
-    mfa_secrets[email] = {
-        "secret": secret,
-        "verified": False
-    }
+    # Hold the secret as a pending enrollment until a code verifies it
+    mfa_store.begin(email, secret)
 
     # Create TOTP URI for QR code
     # Format: otpauth://totp/CAPSULE:user@email.com?secret=SECRET&issuer=CAPSULE
@@ -69,7 +284,8 @@ async def initialize_mfa(request: Request):
         "success": True,
         "secret": secret,
         "qr_code": f"data:image/png;base64,{qr_base64}",
-        "provisioning_uri": provisioning_uri
+        "provisioning_uri": provisioning_uri,
+        "expires_in": MFA_PENDING_TTL
     })
 
 
@@ -94,26 +310,22 @@ async def verify_mfa_code(request: Request):
             "error": "Please enter a 6-digit code"
         }, status_code=400)
 
-    # Check if user has initiated MFA setup
-    if email not in mfa_secrets:
+    # Verifying a new enrollment appends to the log and fsyncs - keep it off the event loop
+    result = await asyncio.to_thread(mfa_store.verify, email, code)
+
+    if result == 'not_initialized':
         return JSONResponse({
             "success": False,
-            "error": "MFA setup not initialized. Please refresh and try again."
+            "error": "MFA setup not initialized or expired. Please refresh and try again."
         }, status_code=400)
 
-    secret = mfa_secrets[email]["secret"]
-
-    # Verify the code
-    totp = pyotp.TOTP(secret)
-    is_valid = totp.verify(code, valid_window=1)  # Allow 1 time step window
-
-    if is_valid:
-        # Mark as verified
-        mfa_secrets[email]["verified"] = True
-
-        # In production: Save to Cognito or database
-        # For now, we'll just store in memory
+    if result == 'replayed':
+        return JSONResponse({
+            "success": False,
+            "error": "This code was already used. Wait for the next code and try again."
+        }, status_code=400)
 
+    if result is None:
         return JSONResponse({
             "success": True,
             "message": "MFA successfully configured!"
@@ -132,10 +344,7 @@ async def get_mfa_status(request: Request):
     """
     email = require_auth(request)
 
-    # Check if user has verified MFA
-    has_mfa = email in mfa_secrets and mfa_secrets[email].get("verified", False)
-
     return JSONResponse({
         "email": email,
-        "mfa_enabled": has_mfa
+        "mfa_enabled": mfa_store.is_enabled(email)
     })
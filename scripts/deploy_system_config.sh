@@ -75,54 +75,12 @@ async def system_config(request: Request):
     import socket
     from datetime import datetime
 
-    try:
-        # Get current instance metadata using IMDSv2
-        import requests
-
-        # Get IMDSv2 token
-        ec2_metadata_token = requests.put(
-            "http://169.254.169.254/latest/api/token",
-            headers={"X-aws-ec2-metadata-token-ttl-seconds": "21600"},
-            timeout=1
-        ).text
-
-        headers = {"X-aws-ec2-metadata-token": ec2_metadata_token}
-
-        instance_id = requests.get(
-            "http://169.254.169.254/latest/meta-data/instance-id",
-            headers=headers, timeout=1
-        ).text
-
-        instance_type = requests.get(
-            "http://169.254.169.254/latest/meta-data/instance-type",
-            headers=headers, timeout=1
-        ).text
-
-        availability_zone = requests.get(
-            "http://169.254.169.254/latest/meta-data/placement/availability-zone",
-            headers=headers, timeout=1
-        ).text
-
-        local_ipv4 = requests.get(
-            "http://169.254.169.254/latest/meta-data/local-ipv4",
-            headers=headers, timeout=1
-        ).text
-
-        try:
-            public_ipv4 = requests.get(
-                "http://169.254.169.254/latest/meta-data/public-ipv4",
-                headers=headers, timeout=1
-            ).text
-        except:
-            public_ipv4 = "N/A (private subnet)"
-
-    except Exception as e:
-        print(f"Error fetching instance metadata: {e}")
-        instance_id = "unknown"
-        instance_type = "unknown"
-        availability_zone = "unknown"
-        local_ipv4 = "unknown"
-        public_ipv4 = "unknown"
+    # Instance metadata via the app's IMDSv2 helper (token cached across calls)
+    instance_id = get_instance_metadata('instance-id') or "unknown"
+    instance_type = get_instance_metadata('instance-type') or "unknown"
+    availability_zone = get_instance_metadata('placement/availability-zone') or "unknown"
+    local_ipv4 = get_instance_metadata('local-ipv4') or "unknown"
+    public_ipv4 = get_instance_metadata('public-ipv4') or "N/A (private subnet)"
 
     hostname = socket.gethostname()
 
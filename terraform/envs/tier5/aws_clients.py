@@ -0,0 +1,139 @@
+"""
+Shared AWS client factory for the employee portal and the MFA Lambdas.
+
+Every boto3 client and resource in a process is built from one boto3
+session, so credentials are resolved once and reused. Clients are cached
+per (service, region, timeout) and all use the same tuned botocore config:
+
+- max_pool_connections sized to the callers' worker threads (botocore's
+  default of 10 makes extra threads queue for a connection)
+- adaptive retries (client-side rate limiting when AWS throttles)
+- TCP keepalive so idle pooled connections survive NAT/ALB idle timeouts
+
+Deployed next to app.py by deploy-portal.sh and packaged into each Lambda
+zip by lambda.tf.
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+import boto3
+from botocore.config import Config
+
+# Connections per client pool - match the number of threads that call AWS
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '32'))
+RETRY_MODE = os.environ.get('AWS_RETRY_MODE', 'adaptive')
+RETRY_MAX_ATTEMPTS = int(os.environ.get('AWS_RETRY_MAX_ATTEMPTS', '3'))
+
+_session = None
+_clients = {}
+_resources = {}
+# boto3 sessions are not thread-safe while creating clients
+_lock = threading.Lock()
+
+
+def get_session() -> boto3.session.Session:
+    """The process-wide boto3 session (created on first use)."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = boto3.session.Session()
+        return _session
+
+
+def client_config(timeout: Optional[float] = None, max_pool_connections: int = MAX_POOL_CONNECTIONS) -> Config:
+    """
+    botocore config shared by every client from this module.
+
+    Args:
+        timeout: Connect and read timeout in seconds (None keeps botocore's defaults)
+        max_pool_connections: HTTP connection pool size
+
+    Returns:
+        Config: Pool size, adaptive retries, TCP keepalive and timeouts
+    """
+    options = {
+        'max_pool_connections': max_pool_connections,
+        'retries': {'mode': RETRY_MODE, 'max_attempts': RETRY_MAX_ATTEMPTS},
+        'tcp_keepalive': True
+    }
+    if timeout is not None:
+        options['connect_timeout'] = timeout
+        options['read_timeout'] = timeout
+    return Config(**options)
+
+
+def get_client(service: str, region: Optional[str] = None, timeout: Optional[float] = None):
+    """
+    Cached boto3 client for a service and region.
+
+    Args:
+        service: Service name (e.g. 'ec2', 'cognito-idp', 'ses')
+        region: Region name (default: the session's region, i.e. AWS_REGION in Lambda)
+        timeout: Connect/read timeout in seconds (clients with different timeouts are cached separately)
+
+    Returns:
+        botocore client
+    """
+    key = (service, region, timeout)
+    client = _clients.get(key)
+    if client is None:
+        session = get_session()
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = session.client(service, region_name=region, config=client_config(timeout))
+                _clients[key] = client
+    return client
+
+
+def get_resource(service: str, region: Optional[str] = None):
+    """Cached boto3 resource (e.g. 'dynamodb') built on the shared session and config."""
+    key = (service, region)
+    resource = _resources.get(key)
+    if resource is None:
+        session = get_session()
+        with _lock:
+            resource = _resources.get(key)
+            if resource is None:
+                resource = session.resource(service, region_name=region, config=client_config())
+                _resources[key] = resource
+    return resource
+
+
+def warm_up(checks: dict) -> dict:
+    """
+    Resolve credentials and open connections before serving traffic.
+
+    Args:
+        checks: {name: callable} - each makes one cheap call through a
+                client so its connection pool has a live, TLS-established
+                connection
+
+    Returns:
+        dict: {name: {'ok': bool, 'ms': float, 'error': str (on failure)}},
+              including a 'credentials' entry; failures are reported, not raised
+    """
+    results = {}
+
+    def timed(name, fn):
+        started = time.perf_counter()
+        try:
+            fn()
+            results[name] = {'ok': True}
+        except Exception as e:
+            results[name] = {'ok': False, 'error': str(e)}
+        results[name]['ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+    def resolve_credentials():
+        credentials = get_session().get_credentials()
+        if credentials is None:
+            raise RuntimeError('no AWS credentials found')
+        credentials.get_frozen_credentials()
+
+    timed('credentials', resolve_credentials)
+    for name, fn in checks.items():
+        timed(name, fn)
+    return results
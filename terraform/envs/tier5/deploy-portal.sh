@@ -49,6 +49,9 @@ mkdir -p "$DEPLOY_DIR/templates"
 echo "Extracting application code..."
 sed -n '/^cat > \/opt\/employee-portal\/app.py << .EOFAPP./,/^EOFAPP$/p' user_data.sh | sed '1d;$d' > "$DEPLOY_DIR/app.py"
 
+# Shared AWS client factory imported by app.py
+cp aws_clients.py "$DEPLOY_DIR/aws_clients.py"
+
 # Substitute variables
 sed -i "s/\${user_pool_id}/$USER_POOL_ID/g" "$DEPLOY_DIR/app.py"
 sed -i "s/\${aws_region}/$AWS_REGION/g" "$DEPLOY_DIR/app.py"
@@ -100,7 +103,7 @@ while [ ! -f /tmp/bootstrap-complete ]; do
 done
 
 # Copy files
-sudo cp app.py /opt/employee-portal/
+sudo cp app.py aws_clients.py /opt/employee-portal/
 sudo cp -r templates /opt/employee-portal/
 sudo cp employee-portal.service /etc/systemd/system/
 
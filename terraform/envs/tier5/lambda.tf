@@ -65,14 +65,34 @@ data "archive_file" "define_auth_challenge" {
 
 data "archive_file" "create_auth_challenge" {
   type        = "zip"
-  source_file = "${path.module}/lambdas/create_auth_challenge.py"
   output_path = "${path.module}/lambdas/create_auth_challenge.zip"
+
+  source {
+    content  = file("${path.module}/lambdas/create_auth_challenge.py")
+    filename = "create_auth_challenge.py"
+  }
+
+  # Shared boto3 client factory (also deployed with the portal app)
+  source {
+    content  = file("${path.module}/aws_clients.py")
+    filename = "aws_clients.py"
+  }
 }
 
 data "archive_file" "verify_auth_challenge" {
   type        = "zip"
-  source_file = "${path.module}/lambdas/verify_auth_challenge.py"
   output_path = "${path.module}/lambdas/verify_auth_challenge.zip"
+
+  source {
+    content  = file("${path.module}/lambdas/verify_auth_challenge.py")
+    filename = "verify_auth_challenge.py"
+  }
+
+  # Shared boto3 client factory (also deployed with the portal app)
+  source {
+    content  = file("${path.module}/aws_clients.py")
+    filename = "aws_clients.py"
+  }
 }
 
 # DefineAuthChallenge Lambda
@@ -110,6 +130,7 @@ resource "aws_lambda_function" "create_auth_challenge" {
     variables = {
       MFA_CODES_TABLE = aws_dynamodb_table.mfa_codes.name
       SES_FROM_EMAIL  = "noreply@capsule-playground.com"
+      SES_REGION      = var.aws_region
     }
   }
 
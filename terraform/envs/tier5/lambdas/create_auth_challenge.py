@@ -11,9 +11,16 @@ This Lambda:
 
 import os
 import random
-import boto3
 from datetime import datetime, timedelta, timezone
 
+from aws_clients import get_client, get_resource
+
+# Built once per container and reused across invocations (warm starts skip
+# client construction and reuse pooled connections)
+mfa_codes_table = get_resource('dynamodb').Table(os.environ['MFA_CODES_TABLE'])
+# SES identity region (defaults to the Lambda's own region)
+ses_client = get_client('ses', os.environ.get('SES_REGION', os.environ.get('AWS_REGION', 'us-west-2')))
+
 
 def lambda_handler(event, context):
     """
@@ -42,15 +49,11 @@ def lambda_handler(event, context):
 
     # Store in DynamoDB with 5-minute TTL
     try:
-        dynamodb = boto3.resource('dynamodb')
-        table_name = os.environ['MFA_CODES_TABLE']
-        table = dynamodb.Table(table_name)
-
         # Calculate expiry timestamp (5 minutes from now) - use UTC
         expiry_time = datetime.now(timezone.utc) + timedelta(minutes=5)
         ttl = int(expiry_time.timestamp())
 
-        table.put_item(
+        mfa_codes_table.put_item(
             Item={
                 'username': email,
                 'code': code,
@@ -66,10 +69,9 @@ def lambda_handler(event, context):
 
     # Send email via SES
     try:
-        ses = boto3.client('ses', region_name='us-west-2')
         from_email = os.environ.get('SES_FROM_EMAIL', 'noreply@capsule-playground.com')
 
-        ses.send_email(
+        ses_client.send_email(
             Source=from_email,
             Destination={'ToAddresses': [email]},
             Message={
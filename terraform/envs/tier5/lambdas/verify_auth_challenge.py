@@ -9,7 +9,11 @@ This Lambda:
 """
 
 import os
-import boto3
+
+from aws_clients import get_resource
+
+# Built once per container and reused across invocations
+mfa_codes_table = get_resource('dynamodb').Table(os.environ['MFA_CODES_TABLE'])
 
 
 def lambda_handler(event, context):
@@ -48,11 +52,7 @@ def lambda_handler(event, context):
 
         # Delete code from DynamoDB to prevent reuse
         try:
-            dynamodb = boto3.resource('dynamodb')
-            table_name = os.environ['MFA_CODES_TABLE']
-            table = dynamodb.Table(table_name)
-
-            table.delete_item(
+            mfa_codes_table.delete_item(
                 Key={'username': email}
             )
             print(f"Deleted code from DynamoDB for {email}")
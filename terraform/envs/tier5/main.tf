@@ -586,7 +586,7 @@ resource "aws_lb_target_group" "main" {
     unhealthy_threshold = 2
     timeout             = 5
     interval            = 30
-    path                = "/health"
+    path                = "/ready" # 503 until the startup warm-up finishes
     matcher             = "200"
   }
 
@@ -637,7 +637,7 @@ resource "aws_lb_listener_rule" "health" {
 
   condition {
     path_pattern {
-      values = ["/health"]
+      values = ["/health", "/ready"]
     }
   }
 }
@@ -748,8 +748,9 @@ resource "aws_lb_listener_rule" "authenticated" {
 #   iam_instance_profile   = aws_iam_instance_profile.ec2.name
 #
 #   user_data = base64gzip(templatefile("${path.module}/user_data.sh", {
-#     user_pool_id = aws_cognito_user_pool.main.id
-#     aws_region   = var.aws_region
+#     user_pool_id   = aws_cognito_user_pool.main.id
+#     aws_region     = var.aws_region
+#     aws_clients_py = file("${path.module}/aws_clients.py")
 #   }))
 #
 #   tags = {
@@ -19,6 +19,11 @@ source venv/bin/activate
 # Install dependencies
 pip install fastapi uvicorn[standard] python-jose[cryptography] boto3 jinja2 python-multipart
 
+# Shared AWS client factory imported by app.py (same file the Lambdas package)
+cat > /opt/employee-portal/aws_clients.py << 'EOFCLIENTS'
+${aws_clients_py}
+EOFCLIENTS
+
 # Create app.py
 cat > /opt/employee-portal/app.py << EOFAPP
 """
@@ -69,14 +74,25 @@ import time
 import re
 import hmac
 import hashlib
+import asyncio
+import threading
+import uuid
+import csv
+import sys
+import random
+from contextvars import ContextVar, copy_context
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, TimeoutError as FutureTimeoutError
+from bisect import bisect_left, bisect_right, insort
 from typing import Optional
 from datetime import datetime, timedelta
 import io
-import boto3
+from aws_clients import get_client, warm_up, MAX_POOL_CONNECTIONS
 from fastapi import FastAPI, Request, HTTPException, Form, Response
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse, FileResponse
 from fastapi.templating import Jinja2Templates
 from jose import jwt, JWTError
+from cryptography.fernet import Fernet, InvalidToken
 
 app = FastAPI()
 templates = Jinja2Templates(directory="/opt/employee-portal/templates")
@@ -90,8 +106,15 @@ AWS_REGION = "${aws_region}"
 CLIENT_ID = "${client_id}"
 CLIENT_SECRET = "${client_secret}"
 
+# Socket timeouts for the portal-region clients - caps how long any single AWS
+# call can hold a worker thread (route latency budgets are tighter, see
+# LATENCY BUDGETS section)
+AWS_CALL_TIMEOUT = float(os.environ.get('AWS_CALL_TIMEOUT', '10'))
+
 # Cognito client
-cognito_client = boto3.client('cognito-idp', region_name=AWS_REGION)
+# All clients come from aws_clients.py (shared session, pooled connections,
+# adaptive retries, keepalive)
+cognito_client = get_client('cognito-idp', AWS_REGION, timeout=AWS_CALL_TIMEOUT)
 
 def get_secret_hash(username: str) -> str:
     """Calculate SECRET_HASH for Cognito client with secret."""
@@ -100,17 +123,281 @@ def get_secret_hash(username: str) -> str:
     dig = hmac.new(secret, message, hashlib.sha256).digest()
     return base64.b64encode(dig).decode()
 
-# EC2 client
-ec2_client = boto3.client('ec2', region_name=AWS_REGION)
+# EC2 client (portal's own region - launches and the legacy whitelist routes)
+ec2_client = get_client('ec2', AWS_REGION, timeout=AWS_CALL_TIMEOUT)
+
+# Regions scanned for VibeCode instances (comma-separated, default: portal region)
+EC2_REGIONS = [r.strip() for r in os.environ.get('EC2_REGIONS', AWS_REGION).split(',') if r.strip()]
+# Per-region budget for inventory calls - a slow region is reported, not waited on
+EC2_REGION_TIMEOUT = float(os.environ.get('EC2_REGION_TIMEOUT', '5'))
+
+# One client per additional region, with socket timeouts matching the budget
+ec2_clients = {
+    region: get_client('ec2', region, timeout=EC2_REGION_TIMEOUT)
+    for region in EC2_REGIONS if region != AWS_REGION
+}
+region_executor = ThreadPoolExecutor(max_workers=max(4, 2 * len(EC2_REGIONS)), thread_name_prefix='ec2-region')
+
+
+def get_ec2_client(region: str = AWS_REGION):
+    """
+    EC2 client for a configured region (the portal region uses ec2_client).
+
+    Always the one warmed, pooled client per region - request budgets are
+    enforced by call_with_budget()/fan_out_regions() waits, not per-budget clients.
+    """
+    if region == AWS_REGION:
+        return ec2_client
+    return ec2_clients[region]
+
+
+def fan_out_regions(fn, regions: Optional[list] = None, timeout: Optional[float] = EC2_REGION_TIMEOUT) -> tuple:
+    """
+    Run fn(region) for every region concurrently.
+
+    Args:
+        fn: Callable taking a region name
+        regions: Regions to run (default: EC2_REGIONS)
+        timeout: Seconds to wait for all regions (None waits indefinitely);
+                 tightened to the request's remaining latency budget
+
+    Returns:
+        tuple: (results {region: value}, errors {region: message}) - a failed,
+               timed-out or circuit-broken region is reported in errors, never raised
+    """
+    timeout = budget_timeout(timeout)
+    futures = {}
+    errors = {}
+    for region in (EC2_REGIONS if regions is None else regions):
+        if ec2_breaker(region).allow():
+            # Run in a copy of the request context so fn's clients see its deadline
+            futures[region_executor.submit(copy_context().run, fn, region)] = region
+        else:
+            errors[region] = 'circuit open'
+    done, not_done = wait(futures, timeout=timeout) if futures else (set(), set())
+
+    results = {}
+    for future in done:
+        region = futures[future]
+        try:
+            results[region] = future.result()
+            ec2_breaker(region).record_success()
+        except Exception as e:
+            errors[region] = str(e)
+            ec2_breaker(region).record_failure()
+            print(f"[EC2-REGION] {region} failed: {e}")
+    for future in not_done:
+        future.cancel()
+        errors[futures[future]] = f"timed out after {timeout}s"
+        ec2_breaker(futures[future]).record_failure()
+        print(f"[EC2-REGION] {futures[future]} timed out after {timeout}s")
+
+    return results, errors
 
 # In-memory cache for group memberships
 group_cache = {}
 CACHE_TTL = 60  # seconds
 
+# Whitelist reconciler settings (see WHITELIST RECONCILER section)
+# Set via Environment= lines in employee-portal.service
+# Opt-in: the reconciler revokes security group rules it considers stale
+RECONCILER_ENABLED = os.environ.get('RECONCILER_ENABLED', 'false').lower() == 'true'
+RECONCILER_INTERVAL = int(os.environ.get('RECONCILER_INTERVAL', '300'))  # seconds
+RECONCILER_DRY_RUN = os.environ.get('RECONCILER_DRY_RUN', 'false').lower() == 'true'
+# When False, /verify-code only records the user's IP and wakes the reconciler
+WHITELIST_ON_LOGIN = os.environ.get('WHITELIST_ON_LOGIN', 'true').lower() == 'true'
+
+# ============================================================================
+# LATENCY BUDGETS AND CIRCUIT BREAKERS
+# ============================================================================
+# Every request gets a deadline (auth_middleware) taken from ROUTE_BUDGETS.
+# AWS calls on the request path wait at most the remaining budget, and a
+# circuit breaker per dependency (cognito, ec2:<region>) stops calling an
+# upstream that keeps failing. When a call fails, callers fall back to the
+# last value that succeeded and mark the response stale (X-Served-Stale).
+
+DEFAULT_ROUTE_BUDGET = float(os.environ.get('ROUTE_BUDGET_SECONDS', '3'))
+# Longest matching path prefix wins; None = no deadline (long-lived streams)
+ROUTE_BUDGETS = {
+    '/api/ec2/stream': None,
+    '/api/admin/users/stream': None,
+    '/admin/ip-whitelist-audit/stream': None,
+    '/api/users/bulk': None,
+    '/admin/': 30.0,
+    '/api/admin/': 10.0,
+    '/verify-code': 10.0,
+}
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_SECONDS = float(os.environ.get('CIRCUIT_RESET_SECONDS', '30'))
+
+# Monotonic deadline of the current request (None outside a request)
+request_deadline = ContextVar('request_deadline', default=None)
+# Dependencies whose last known good value was served to the current request
+stale_dependencies = ContextVar('stale_dependencies', default=None)
+
+# Worker pool for budgeted single calls (see call_with_budget)
+aws_call_executor = ThreadPoolExecutor(max_workers=MAX_POOL_CONNECTIONS, thread_name_prefix='aws-call')
+
+
+class UpstreamUnavailable(HTTPException):
+    """An AWS dependency failed and there is no last known good value to serve."""
+
+    def __init__(self, dependency: str):
+        super().__init__(
+            status_code=503,
+            detail=f"{dependency} is unavailable, please retry shortly",
+            headers={'Retry-After': str(int(CIRCUIT_RESET_SECONDS))}
+        )
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one dependency.
+
+    closed -> open after CIRCUIT_FAILURE_THRESHOLD failures in a row; open ->
+    half-open after CIRCUIT_RESET_SECONDS, letting a single probe through.
+    The probe's outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now (claims the probe when half-open)."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= CIRCUIT_RESET_SECONDS:
+                self.state = 'half-open'
+                print(f"[CIRCUIT] {self.name} half-open, probing")
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != 'closed':
+                print(f"[CIRCUIT] {self.name} closed")
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half-open' or (self.state == 'closed' and self.failures >= CIRCUIT_FAILURE_THRESHOLD):
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                print(f"[CIRCUIT] {self.name} open after {self.failures} consecutive failures")
+
+
+cognito_breaker = CircuitBreaker('cognito')
+ec2_breakers = {}
+
+
+def ec2_breaker(region: str) -> CircuitBreaker:
+    """Circuit breaker for EC2 in one region."""
+    breaker = ec2_breakers.get(region)
+    if breaker is None:
+        breaker = ec2_breakers.setdefault(region, CircuitBreaker(f"ec2:{region}"))
+    return breaker
+
+
+def route_budget(path: str) -> Optional[float]:
+    """Latency budget in seconds for a request path (longest prefix in ROUTE_BUDGETS)."""
+    matches = [prefix for prefix in ROUTE_BUDGETS if path.startswith(prefix)]
+    if not matches:
+        return DEFAULT_ROUTE_BUDGET
+    return ROUTE_BUDGETS[max(matches, key=len)]
+
+
+def budget_timeout(timeout: Optional[float]) -> Optional[float]:
+    """
+    Tighten a finite timeout to the current request's remaining budget.
+
+    Outside a request (reconciler, feed poller, launch jobs) or with
+    timeout=None the timeout is returned unchanged.
+    """
+    deadline = request_deadline.get()
+    if deadline is None or timeout is None:
+        return timeout
+    return max(0.0, min(timeout, deadline - time.monotonic()))
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """
+    Whether an error means the dependency is unhealthy. AWS rejecting the
+    request itself (UserNotFound, UsernameExists, ...) is an answer, not an
+    outage, so it doesn't count towards opening the circuit.
+    """
+    response = getattr(error, 'response', None)
+    if not isinstance(response, dict):
+        return True
+    status = response.get('ResponseMetadata', {}).get('HTTPStatusCode', 500)
+    code = response.get('Error', {}).get('Code', '')
+    return status >= 500 or 'Throttl' in code or code == 'TooManyRequestsException'
+
+
+def call_with_budget(breaker: CircuitBreaker, fn, *args, **kwargs):
+    """
+    Call fn through a circuit breaker, waiting at most the remaining budget.
+
+    fn runs in a worker thread with a copy of the request context. A call
+    that overruns is abandoned (its thread finishes on the client's own
+    AWS_CALL_TIMEOUT) and counts as a failure.
+
+    Blocks the calling thread - async routes must reach it through
+    asyncio.to_thread().
+
+    Raises:
+        CircuitOpen: The breaker is open, fn was not called
+        Exception: Whatever fn raised, or FutureTimeoutError on overrun
+    """
+    if not breaker.allow():
+        raise CircuitOpen(f"{breaker.name} circuit open")
+
+    future = aws_call_executor.submit(copy_context().run, fn, *args, **kwargs)
+    try:
+        result = future.result(timeout=budget_timeout(AWS_CALL_TIMEOUT))
+    except FutureTimeoutError:
+        future.cancel()
+        breaker.record_failure()
+        raise FutureTimeoutError(f"{breaker.name} call exceeded the latency budget")
+    except Exception as e:
+        if is_upstream_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    breaker.record_success()
+    return result
+
+
+def mark_stale(dependency: str) -> None:
+    """Record that the current request was served a last known good value."""
+    stale = stale_dependencies.get()
+    if stale is not None:
+        stale.add(dependency)
+
+
+def served_stale() -> list:
+    """Dependencies served stale to the current request."""
+    return sorted(stale_dependencies.get() or ())
+
 # ============================================================================
 # EC2 INSTANCE LAUNCH HELPERS
 # ============================================================================
 
+IMDS_TOKEN_TTL = 21600  # seconds
+imds_token = [None, 0.0]  # [token, expires_at]
+
 def get_instance_metadata(path: str) -> Optional[str]:
     """
     Query EC2 metadata service (IMDSv2) for current instance info.
@@ -128,13 +415,16 @@ def get_instance_metadata(path: str) -> Optional[str]:
     import urllib.error
 
     try:
-        # Step 1: Get IMDSv2 token
-        token_request = urllib.request.Request(
-            'http://169.254.169.254/latest/api/token',
-            headers={'X-aws-ec2-metadata-token-ttl-seconds': '21600'},
-            method='PUT'
-        )
-        token = urllib.request.urlopen(token_request, timeout=2).read().decode('utf-8')
+        # Step 1: Get IMDSv2 token (reused until shortly before it expires)
+        token, expires_at = imds_token
+        if not token or time.time() >= expires_at:
+            token_request = urllib.request.Request(
+                'http://169.254.169.254/latest/api/token',
+                headers={'X-aws-ec2-metadata-token-ttl-seconds': str(IMDS_TOKEN_TTL)},
+                method='PUT'
+            )
+            token = urllib.request.urlopen(token_request, timeout=2).read().decode('utf-8')
+            imds_token[:] = [token, time.time() + IMDS_TOKEN_TTL - 60]
 
         # Step 2: Query metadata using token
         metadata_request = urllib.request.Request(
@@ -147,6 +437,9 @@ def get_instance_metadata(path: str) -> Optional[str]:
         return None
 
 
+# The portal host's network placement doesn't change while the process runs
+portal_instance_info = {}
+
 def get_current_instance_info() -> dict:
     """
     Get portal instance's VPC, subnet, private IP, and security groups.
@@ -156,8 +449,11 @@ def get_current_instance_info() -> dict:
 
     Returns:
         dict: {instance_id, private_ip, vpc_id, subnet_id, security_groups}
-              Returns empty dict on error
+              (cached after the first success). Returns empty dict on error
     """
+    if portal_instance_info:
+        return dict(portal_instance_info)
+
     try:
         # Query metadata service
         instance_id = get_instance_metadata('instance-id')
@@ -176,13 +472,14 @@ def get_current_instance_info() -> dict:
 
         instance = response['Reservations'][0]['Instances'][0]
 
-        return {
+        portal_instance_info.update({
             'instance_id': instance_id,
             'private_ip': private_ip,
             'vpc_id': instance.get('VpcId'),
             'subnet_id': instance.get('SubnetId'),
             'security_groups': [sg['GroupId'] for sg in instance.get('SecurityGroups', [])]
-        }
+        })
+        return dict(portal_instance_info)
     except Exception as e:
         print(f"Failed to get current instance info: {e}")
         return {}
@@ -382,7 +679,10 @@ def ensure_ssh_security_group(vpc_id: str, portal_private_ip: str) -> Optional[s
         return None
 
 
-def launch_ec2_instance(instance_type: str, area: str) -> tuple:
+VALID_INSTANCE_TYPES = ['t3.micro', 't3.small', 't3.medium', 't3.large', 'm7i.large']
+
+
+def launch_ec2_instance(instance_type: str, area: str, on_stage=None) -> tuple:
     """
     Launch EC2 instance with full configuration and atomic tagging.
 
@@ -393,15 +693,16 @@ def launch_ec2_instance(instance_type: str, area: str) -> tuple:
     Args:
         instance_type: EC2 instance type (e.g., 't3.micro', 't3.small')
         area: VibeCodeArea tag value (e.g., 'engineering', 'hr')
+        on_stage: Optional callback(stage, message) for launch job progress
+                  ('resolving-ami', 'creating')
 
     Returns:
         tuple: (success: bool, message: str, result_data: dict)
                result_data contains {instance_id, name, private_ip, type, area}
     """
     # Validate inputs
-    valid_instance_types = ['t3.micro', 't3.small', 't3.medium', 't3.large', 'm7i.large']
-    if not instance_type or instance_type not in valid_instance_types:
-        return (False, f"Invalid instance type. Must be one of: {', '.join(valid_instance_types)}", {})
+    if not instance_type or instance_type not in VALID_INSTANCE_TYPES:
+        return (False, f"Invalid instance type. Must be one of: {', '.join(VALID_INSTANCE_TYPES)}", {})
 
     if not area or not area.strip():
         return (False, "VibeCodeArea tag is required", {})
@@ -426,6 +727,8 @@ def launch_ec2_instance(instance_type: str, area: str) -> tuple:
 
         # Step 2: Get latest Ubuntu 22.04 AMI
         print("Looking up latest Ubuntu 22.04 AMI...")
+        if on_stage:
+            on_stage('resolving-ami', "Looking up latest Ubuntu 22.04 AMI")
         ami_id = get_latest_ubuntu_ami()
         if not ami_id:
             return (False, "Failed to find Ubuntu 22.04 LTS AMI", {})
@@ -442,6 +745,8 @@ def launch_ec2_instance(instance_type: str, area: str) -> tuple:
 
         # Step 5: Launch instance with atomic tagging
         print(f"Launching {instance_type} instance...")
+        if on_stage:
+            on_stage('creating', f"Launching {instance_type} instance {instance_name}")
         launch_response = ec2_client.run_instances(
             ImageId=ami_id,
             InstanceType=instance_type,
@@ -489,6 +794,123 @@ def launch_ec2_instance(instance_type: str, area: str) -> tuple:
         print(error_message)
         return (False, error_message, {})
 
+# ============================================================================
+# EC2 LAUNCH JOBS
+# ============================================================================
+# /api/ec2/launch-instance returns a job ID straight away; the launch itself
+# runs on launch_executor and reports its stage through /api/ec2/jobs/{id}:
+#   pending -> resolving-ami -> creating -> running   (or failed at any point)
+# With LAUNCH_WAIT_FOR_RUNNING the job stays in 'creating' until the
+# instance_running waiter succeeds, then rescans the EC2 inventory feed.
+# Without it the job ends in 'launched': the instance exists but its
+# running state was never observed.
+# Job records live in a bounded OrderedDict; the oldest finished jobs are
+# evicted first.
+
+LAUNCH_JOB_WORKERS = int(os.environ.get('LAUNCH_JOB_WORKERS', '4'))
+LAUNCH_JOB_HISTORY = 200  # max job records kept (finished jobs evicted oldest first)
+LAUNCH_WAIT_FOR_RUNNING = os.environ.get('LAUNCH_WAIT_FOR_RUNNING', 'true').lower() == 'true'
+LAUNCH_JOB_FINAL_STAGES = ('running', 'launched', 'failed')
+
+launch_executor = ThreadPoolExecutor(max_workers=LAUNCH_JOB_WORKERS, thread_name_prefix='launch-job')
+launch_jobs = OrderedDict()  # job_id -> job record
+launch_jobs_lock = threading.Lock()
+
+
+def create_launch_job(instance_type: str, area: str, requested_by: str) -> Optional[dict]:
+    """
+    Register a pending launch job, evicting the oldest finished jobs if full.
+
+    Returns:
+        dict: Copy of the new job record, or None if LAUNCH_JOB_HISTORY jobs are all still active
+    """
+    now = datetime.utcnow().isoformat()
+    job = {
+        'job_id': uuid.uuid4().hex,
+        'stage': 'pending',
+        'instance_type': instance_type,
+        'area': area,
+        'requested_by': requested_by,
+        'created_at': now,
+        'updated_at': now,
+        'message': 'Queued',
+        'instance': None,
+        'error': None
+    }
+
+    with launch_jobs_lock:
+        if len(launch_jobs) >= LAUNCH_JOB_HISTORY:
+            finished = [job_id for job_id, j in launch_jobs.items() if j['stage'] in LAUNCH_JOB_FINAL_STAGES]
+            for job_id in finished[:len(launch_jobs) - LAUNCH_JOB_HISTORY + 1]:
+                del launch_jobs[job_id]
+            if len(launch_jobs) >= LAUNCH_JOB_HISTORY:
+                return None
+        launch_jobs[job['job_id']] = job
+        return dict(job)
+
+
+def update_launch_job(job_id: str, **fields) -> None:
+    with launch_jobs_lock:
+        job = launch_jobs.get(job_id)
+        if job:
+            job.update(fields, updated_at=datetime.utcnow().isoformat())
+
+
+def get_launch_job(job_id: str) -> Optional[dict]:
+    with launch_jobs_lock:
+        job = launch_jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def run_launch_job(job_id: str, instance_type: str, area: str, loop: asyncio.AbstractEventLoop) -> None:
+    """
+    Executor body for one launch job. Always leaves the job in a final stage -
+    any unexpected error marks it failed.
+
+    Args:
+        loop: The server event loop - feed updates are handed to it thread-safely
+    """
+    try:
+        _run_launch_job_steps(job_id, instance_type, area, loop)
+    except Exception as e:
+        error_message = f"Launch job failed unexpectedly: {e}"
+        print(f"[LAUNCH-JOB] {job_id} | {error_message}")
+        update_launch_job(job_id, stage='failed', message=error_message, error=error_message)
+
+
+def _run_launch_job_steps(job_id: str, instance_type: str, area: str, loop: asyncio.AbstractEventLoop) -> None:
+    def on_stage(stage: str, message: str) -> None:
+        update_launch_job(job_id, stage=stage, message=message)
+
+    success, message, result_data = launch_ec2_instance(instance_type, area, on_stage=on_stage)
+    if not success:
+        update_launch_job(job_id, stage='failed', message=message, error=message)
+        return
+
+    loop.call_soon_threadsafe(ec2_feed.announce_launch, result_data)
+
+    if not LAUNCH_WAIT_FOR_RUNNING:
+        # Running state not observed - report the launch only
+        update_launch_job(job_id, stage='launched', message=message, instance=result_data)
+        return
+
+    update_launch_job(job_id, message=f"{message} - waiting for running state", instance=result_data)
+    try:
+        ec2_client.get_waiter('instance_running').wait(
+            InstanceIds=[result_data['instance_id']],
+            WaiterConfig={'Delay': 5, 'MaxAttempts': 60}
+        )
+    except Exception as e:
+        error_message = f"Instance {result_data['instance_id']} launched but did not reach running: {e}"
+        print(error_message)
+        update_launch_job(job_id, stage='failed', message=error_message, error=error_message)
+        return
+
+    # Warm the inventory feed so open EC2 pages see the running state now
+    loop.call_soon_threadsafe(ec2_feed.poke)
+    update_launch_job(job_id, stage='running', message=f"Instance {result_data['name']} ({result_data['instance_id']}) is running")
+    print(f"[LAUNCH-JOB] {job_id} | INSTANCE: {result_data['instance_id']} | STATUS: running")
+
 # ============================================================================
 # EMAIL MFA CONFIGURATION
 # ============================================================================
@@ -497,18 +919,6 @@ def launch_ec2_instance(instance_type: str, area: str) -> tuple:
 # See: lambdas/create_auth_challenge.py, verify_auth_challenge.py
 # Legacy TOTP/QR code MFA has been removed in favor of this passwordless approach.
 
-# ============================================================================
-# USER REGISTRY
-# ============================================================================
-# Hardcoded user registry for directory page
-USER_REGISTRY = [
-    {"email": "dmar@capsule.com", "areas": "engineering, admins"},
-    {"email": "jahn@capsule.com", "areas": "engineering"},
-    {"email": "ahatcher@capsule.com", "areas": "hr"},
-    {"email": "peter@capsule.com", "areas": "automation"},
-    {"email": "sdedakia@capsule.com", "areas": "product"},
-]
-
 # ============================================================================
 # AREA GROUP CONFIGURATION
 # ============================================================================
@@ -563,7 +973,18 @@ def extract_user_from_alb_header(request: Request) -> Optional[str]:
         return None
 
 def get_user_groups(username: str) -> list:
-    """Get groups for a user from Cognito, with caching."""
+    """
+    Get groups for a user from the membership model, or Cognito (with caching) before it loads.
+
+    If Cognito fails or is slower than the request's budget, an expired cache
+    entry is served as stale rather than reporting no groups.
+
+    Raises:
+        UpstreamUnavailable: Cognito failed and the user has never been cached
+    """
+    if membership.is_loaded():
+        return membership.groups_for(username)
+
     cache_key = username
     now = time.time()
 
@@ -573,21 +994,29 @@ def get_user_groups(username: str) -> list:
         if now - cached_time < CACHE_TTL:
             return cached_data
 
+    def fetch_groups() -> dict:
+        try:
+            return cognito_client.admin_list_groups_for_user(UserPoolId=USER_POOL_ID, Username=username)
+        except cognito_client.exceptions.UserNotFoundException:
+            # Unknown user - an answer, not an upstream failure
+            return {'Groups': []}
+
     # Fetch from Cognito
     try:
-        response = cognito_client.admin_list_groups_for_user(
-            UserPoolId=USER_POOL_ID,
-            Username=username
-        )
-        groups = [g['GroupName'] for g in response.get('Groups', [])]
-
-        # Cache the result
-        group_cache[cache_key] = (groups, now)
-
-        return groups
+        response = call_with_budget(cognito_breaker, fetch_groups)
     except Exception as e:
         print(f"Error fetching groups for {username}: {e}")
-        return []
+        if cache_key in group_cache:
+            mark_stale('cognito')
+            return group_cache[cache_key][0]
+        raise UpstreamUnavailable('cognito')
+
+    groups = [g['GroupName'] for g in response.get('Groups', [])]
+
+    # Cache the result
+    group_cache[cache_key] = (groups, now)
+
+    return groups
 
 def create_cognito_group(group_name: str, description: str = "") -> tuple:
     """
@@ -612,10 +1041,8 @@ def create_cognito_group(group_name: str, description: str = "") -> tuple:
 
         # Check if group already exists
         try:
-            cognito_client.get_group(
-                UserPoolId=USER_POOL_ID,
-                GroupName=group_name
-            )
+            call_with_budget(cognito_breaker, cognito_client.get_group,
+                             UserPoolId=USER_POOL_ID, GroupName=group_name)
             return (False, f"Group '{group_name}' already exists")
         except cognito_client.exceptions.ResourceNotFoundException:
             # Group doesn't exist, we can create it
@@ -625,14 +1052,11 @@ def create_cognito_group(group_name: str, description: str = "") -> tuple:
         if not description:
             description = f"{group_name.capitalize()} team members"
 
-        cognito_client.create_group(
-            UserPoolId=USER_POOL_ID,
-            GroupName=group_name,
-            Description=description
-        )
+        call_with_budget(cognito_breaker, cognito_client.create_group,
+                         UserPoolId=USER_POOL_ID, GroupName=group_name, Description=description)
 
-        # Clear group cache to force refresh
-        group_cache.clear()
+        # Update membership model in place
+        membership.add_group(group_name, description)
 
         return (True, f"Group '{group_name}' created successfully")
 
@@ -685,14 +1109,28 @@ def require_group(request: Request, required_group: str) -> tuple:
     return email, groups
 
 # EC2 Management Functions
+
+# Last successful describe per (tag_key, tag_value, region) - stale fallback
+last_good_instances = {}
+
 def get_instances_by_tag(tag_key: str = "VibeCodeArea", tag_value: Optional[str] = None) -> list:
-    """Query EC2 instances with specified tag. If tag_value is None, returns all instances with the tag."""
-    try:
-        filters = [{'Name': f'tag:{tag_key}', 'Values': ['*']}]
-        if tag_value:
-            filters = [{'Name': f'tag:{tag_key}', 'Values': [tag_value]}]
+    """
+    Query EC2 instances with specified tag in every configured region.
+    If tag_value is None, returns all instances with the tag.
+
+    Regions are queried concurrently. A failing or slow region is logged and
+    answered from its last good result (marking the request stale), or
+    skipped if it never answered. Each instance dict carries its 'region'.
 
-        response = ec2_client.describe_instances(Filters=filters)
+    Raises:
+        UpstreamUnavailable: Every region failed and none has a last good result
+    """
+    filters = [{'Name': f'tag:{tag_key}', 'Values': ['*']}]
+    if tag_value:
+        filters = [{'Name': f'tag:{tag_key}', 'Values': [tag_value]}]
+
+    def describe_region(region: str) -> list:
+        response = get_ec2_client(region).describe_instances(Filters=filters)
 
         instances = []
         for reservation in response['Reservations']:
@@ -705,7 +1143,8 @@ def get_instances_by_tag(tag_key: str = "VibeCodeArea", tag_value: Optional[str]
                     'private_ip': instance.get('PrivateIpAddress', 'N/A'),
                     'public_ip': instance.get('PublicIpAddress', 'N/A'),
                     'name': 'N/A',
-                    'area': 'N/A'
+                    'area': 'N/A',
+                    'region': region
                 }
 
                 # Extract Name and VibeCodeArea tags
@@ -718,9 +1157,26 @@ def get_instances_by_tag(tag_key: str = "VibeCodeArea", tag_value: Optional[str]
                 instances.append(instance_data)
 
         return instances
-    except Exception as e:
-        print(f"Error fetching EC2 instances: {e}")
-        return []
+
+    results, errors = fan_out_regions(describe_region)
+    for region, error in errors.items():
+        print(f"Error fetching EC2 instances in {region}: {error}")
+
+    # Remember good answers; serve the last one for regions that failed
+    for region in EC2_REGIONS:
+        key = (tag_key, tag_value, region)
+        if region in results:
+            last_good_instances[key] = results[region]
+        elif key in last_good_instances:
+            results[region] = last_good_instances[key]
+
+    if errors and not results:
+        raise UpstreamUnavailable('ec2')
+    if errors:
+        mark_stale('ec2')
+
+    # Keep configured region order
+    return [instance for region in EC2_REGIONS for instance in results.get(region, [])]
 
 def get_unique_vibecode_areas() -> list:
     """
@@ -749,19 +1205,31 @@ def get_unique_vibecode_areas() -> list:
         # Return empty list as fallback - areas are discovered dynamically
         return []
 
-def get_instance_security_groups(instance_id: str) -> list:
+# (region, instance_id) -> security groups from the last successful lookup
+last_good_security_groups = {}
+
+def get_instance_security_groups(instance_id: str, region: str = AWS_REGION) -> list:
     """
     Get detailed security group information for an EC2 instance.
 
+    A failed lookup serves the instance's last good security groups (marking
+    the request stale) rather than an empty list, which callers would read
+    as "no rules".
+
     Args:
         instance_id: EC2 instance ID (e.g., 'i-0abc123def456')
+        region: Region the instance lives in
 
     Returns:
         list: Security group details with IpPermissions
+
+    Raises:
+        UpstreamUnavailable: EC2 failed and the instance was never looked up
     """
-    try:
+    def describe() -> list:
         # Get instance details
-        response = ec2_client.describe_instances(InstanceIds=[instance_id])
+        client = get_ec2_client(region)
+        response = client.describe_instances(InstanceIds=[instance_id])
 
         if not response['Reservations']:
             return []
@@ -773,14 +1241,50 @@ def get_instance_security_groups(instance_id: str) -> list:
             return []
 
         # Get security group details with rules
-        sg_response = ec2_client.describe_security_groups(GroupIds=sg_ids)
+        sg_response = client.describe_security_groups(GroupIds=sg_ids)
         return sg_response['SecurityGroups']
 
+    key = (region, instance_id)
+    try:
+        security_groups = call_with_budget(ec2_breaker(region), describe)
     except Exception as e:
         print(f"Error fetching security groups for {instance_id}: {e}")
-        return []
+        if key in last_good_security_groups:
+            mark_stale('ec2')
+            return last_good_security_groups[key]
+        raise UpstreamUnavailable('ec2')
+
+    last_good_security_groups[key] = security_groups
+    return security_groups
+
+def security_groups_allow(security_groups: list, port: int, client_ip: str) -> bool:
+    """True if any TCP rule covering port is open to all or to exactly client_ip."""
+    for sg in security_groups:
+        for permission in sg.get('IpPermissions', []):
+            # Check if rule applies to this port
+            from_port = permission.get('FromPort', 0)
+            to_port = permission.get('ToPort', 0)
+            protocol = permission.get('IpProtocol', '')
+
+            # Skip if not TCP or port not in range
+            if protocol != 'tcp' or not (from_port <= port <= to_port):
+                continue
+
+            # Check CIDR blocks
+            for ip_range in permission.get('IpRanges', []):
+                cidr = ip_range.get('CidrIp', '')
+
+                # Open to all
+                if cidr == '0.0.0.0/0':
+                    return True
+
+                # Exact IP match (with or without /32)
+                if cidr == client_ip or cidr == f"{client_ip}/32":
+                    return True
 
-def check_port_whitelisted(instance_id: str, port: int, client_ip: str) -> bool:
+    return False
+
+def check_port_whitelisted(instance_id: str, port: int, client_ip: str, region: str = AWS_REGION) -> bool:
     """
     Check if a client IP is whitelisted for a specific port on an instance.
 
@@ -788,70 +1292,37 @@ def check_port_whitelisted(instance_id: str, port: int, client_ip: str) -> bool:
         instance_id: EC2 instance ID
         port: Port number to check (e.g., 80, 443)
         client_ip: Client IP address (e.g., '73.158.64.21')
+        region: Region the instance lives in
 
     Returns:
         bool: True if whitelisted (including 0.0.0.0/0), False otherwise
-    """
-    try:
-        security_groups = get_instance_security_groups(instance_id)
-
-        for sg in security_groups:
-            for permission in sg.get('IpPermissions', []):
-                # Check if rule applies to this port
-                from_port = permission.get('FromPort', 0)
-                to_port = permission.get('ToPort', 0)
-                protocol = permission.get('IpProtocol', '')
-
-                # Skip if not TCP or port not in range
-                if protocol != 'tcp' or not (from_port <= port <= to_port):
-                    continue
-
-                # Check CIDR blocks
-                for ip_range in permission.get('IpRanges', []):
-                    cidr = ip_range.get('CidrIp', '')
-
-                    # Open to all
-                    if cidr == '0.0.0.0/0':
-                        return True
-
-                    # Exact IP match (with or without /32)
-                    if cidr == client_ip or cidr == f"{client_ip}/32":
-                        return True
-
-        return False
-
-    except Exception as e:
-        print(f"Error checking port whitelist for {instance_id} port {port}: {e}")
-        return False
 
-def get_instance_by_area(area: str) -> Optional[dict]:
-    """Get the EC2 instance mapped to a specific area."""
-    instances = get_instances_by_tag(tag_value=area)
-    if instances and len(instances) > 0:
-        return instances[0]  # Return first matching instance
-    return None
+    Raises:
+        UpstreamUnavailable: The instance's security groups could not be read
+    """
+    return security_groups_allow(get_instance_security_groups(instance_id, region), port, client_ip)
 
-def validate_instance_exists(instance_id: str) -> bool:
+def validate_instance_exists(instance_id: str, region: str = AWS_REGION) -> bool:
     """Check if an EC2 instance exists and is accessible."""
     try:
-        response = ec2_client.describe_instances(InstanceIds=[instance_id])
+        response = get_ec2_client(region).describe_instances(InstanceIds=[instance_id])
         return len(response['Reservations']) > 0
     except Exception as e:
         print(f"Error validating instance {instance_id}: {e}")
         return False
 
-def tag_instance(instance_id: str, area: str) -> tuple:
+def tag_instance(instance_id: str, area: str, region: str = AWS_REGION) -> tuple:
     """Apply VibeCodeArea tag to an EC2 instance. Returns (success: bool, message: str)."""
     # Validate area value - must not be a system group
     if area in SYSTEM_GROUPS:
         return False, f"Invalid area. Cannot use system group '{area}' as an area tag"
 
     # Validate instance exists
-    if not validate_instance_exists(instance_id):
+    if not validate_instance_exists(instance_id, region):
         return False, f"Instance {instance_id} not found or not accessible"
 
     try:
-        ec2_client.create_tags(
+        get_ec2_client(region).create_tags(
             Resources=[instance_id],
             Tags=[{'Key': 'VibeCodeArea', 'Value': area}]
         )
@@ -859,9 +1330,9 @@ def tag_instance(instance_id: str, area: str) -> tuple:
     except Exception as e:
         return False, f"Error tagging instance: {str(e)}"
 
-def build_ssm_url(instance_id: str) -> str:
+def build_ssm_url(instance_id: str, region: str = AWS_REGION) -> str:
     """Generate AWS Systems Manager Session Manager URL for an instance."""
-    return f"https://console.aws.amazon.com/systems-manager/session-manager/{instance_id}?region={AWS_REGION}"
+    return f"https://console.aws.amazon.com/systems-manager/session-manager/{instance_id}?region={region}"
 
 # ============================================================================
 # IP WHITELIST MANAGEMENT
@@ -873,8 +1344,8 @@ def get_user_whitelisted_ip(email: str) -> Optional[str]:
     """
     Get currently whitelisted IP for a user by scanning security group rule descriptions.
 
-    Searches the vibecode-launched-instances security group for rules with
-    descriptions containing the user's email address.
+    Searches the vibecode-launched-instances security group in every configured
+    region (concurrently) for rules with descriptions containing the user's email.
 
     Args:
         email: User's email address
@@ -882,9 +1353,9 @@ def get_user_whitelisted_ip(email: str) -> Optional[str]:
     Returns:
         Current whitelisted IP or None if not found
     """
-    try:
+    def find_in_region(region: str) -> Optional[str]:
         # Get the vibecode-launched-instances security group
-        response = ec2_client.describe_security_groups(
+        response = get_ec2_client(region).describe_security_groups(
             Filters=[
                 {'Name': 'group-name', 'Values': ['vibecode-launched-instances']}
             ]
@@ -911,12 +1382,14 @@ def get_user_whitelisted_ip(email: str) -> Optional[str]:
 
         return None
 
-    except Exception as e:
-        print(f"Error getting whitelisted IP for {email}: {e}")
-        return None
+    results, errors = fan_out_regions(find_in_region)
+    for region, error in errors.items():
+        print(f"Error getting whitelisted IP for {email} in {region}: {error}")
+
+    return next((results[r] for r in EC2_REGIONS if results.get(r)), None)
 
 
-def add_ip_to_security_group(sg_id: str, port: int, ip: str, description: str) -> bool:
+def add_ip_to_security_group(sg_id: str, port: int, ip: str, description: str, region: str = AWS_REGION) -> bool:
     """
     Add IP whitelist rule to security group.
     Idempotent - handles duplicate rule errors gracefully.
@@ -926,12 +1399,13 @@ def add_ip_to_security_group(sg_id: str, port: int, ip: str, description: str) -
         port: Port number (80 or 443)
         ip: IP address to whitelist
         description: Rule description containing user metadata
+        region: Region of the security group
 
     Returns:
         True if rule added or already exists, False on error
     """
     try:
-        ec2_client.authorize_security_group_ingress(
+        get_ec2_client(region).authorize_security_group_ingress(
             GroupId=sg_id,
             IpPermissions=[{
                 'IpProtocol': 'tcp',
@@ -943,6 +1417,7 @@ def add_ip_to_security_group(sg_id: str, port: int, ip: str, description: str) -
                 }]
             }]
         )
+        access_manifests.invalidate_inventory()
         return True
     except Exception as e:
         error_msg = str(e).lower()
@@ -952,7 +1427,7 @@ def add_ip_to_security_group(sg_id: str, port: int, ip: str, description: str) -
         return False
 
 
-def remove_ip_from_security_group(sg_id: str, port: int, ip: str) -> bool:
+def remove_ip_from_security_group(sg_id: str, port: int, ip: str, region: str = AWS_REGION) -> bool:
     """
     Remove IP whitelist rule from security group.
     Idempotent - handles non-existent rule errors gracefully.
@@ -961,12 +1436,13 @@ def remove_ip_from_security_group(sg_id: str, port: int, ip: str) -> bool:
         sg_id: Security group ID
         port: Port number (80 or 443)
         ip: IP address to remove
+        region: Region of the security group
 
     Returns:
         True if rule removed or doesn't exist, False on error
     """
     try:
-        ec2_client.revoke_security_group_ingress(
+        get_ec2_client(region).revoke_security_group_ingress(
             GroupId=sg_id,
             IpPermissions=[{
                 'IpProtocol': 'tcp',
@@ -977,6 +1453,7 @@ def remove_ip_from_security_group(sg_id: str, port: int, ip: str) -> bool:
                 }]
             }]
         )
+        access_manifests.invalidate_inventory()
         return True
     except Exception as e:
         error_msg = str(e).lower()
@@ -1031,9 +1508,9 @@ def get_instances_user_is_whitelisted_on(email: str, user_ip: str) -> list:
         user_ip: User's IP address to check
 
     Returns:
-        list: Instance IDs where user's IP is whitelisted
+        dict: {instance_id: region} for instances where user's IP is whitelisted
     """
-    whitelisted_instances = []
+    whitelisted_instances = {}
 
     try:
         # Get all instances with VibeCodeArea tag
@@ -1041,10 +1518,11 @@ def get_instances_user_is_whitelisted_on(email: str, user_ip: str) -> list:
 
         for instance in all_instances:
             instance_id = instance['instance_id']
+            region = instance['region']
 
             try:
                 # Get instance security groups
-                security_groups = get_instance_security_groups(instance_id)
+                security_groups = get_instance_security_groups(instance_id, region)
 
                 if not security_groups:
                     continue
@@ -1057,7 +1535,7 @@ def get_instances_user_is_whitelisted_on(email: str, user_ip: str) -> list:
                     sg_id = sg['GroupId']
 
                     # Get security group rules
-                    sg_details = ec2_client.describe_security_groups(GroupIds=[sg_id])
+                    sg_details = get_ec2_client(region).describe_security_groups(GroupIds=[sg_id])
 
                     if not sg_details['SecurityGroups']:
                         continue
@@ -1070,7 +1548,7 @@ def get_instances_user_is_whitelisted_on(email: str, user_ip: str) -> list:
 
                             # Check if this rule belongs to the user
                             if email in description and f"{user_ip}/32" == cidr:
-                                whitelisted_instances.append(instance_id)
+                                whitelisted_instances[instance_id] = region
                                 break
 
             except Exception as e:
@@ -1080,7 +1558,7 @@ def get_instances_user_is_whitelisted_on(email: str, user_ip: str) -> list:
     except Exception as e:
         print(f"Error in get_instances_user_is_whitelisted_on: {e}")
 
-    return list(set(whitelisted_instances))  # Remove duplicates
+    return whitelisted_instances
 
 
 def whitelist_user_ip_on_instances(email: str, groups: list, client_ip: str) -> dict:
@@ -1134,7 +1612,8 @@ def whitelist_user_ip_on_instances(email: str, groups: list, client_ip: str) ->
         current_access_ids = {inst['instance_id'] for inst in current_access_instances}
 
         # Step 3: Get instances user IS currently whitelisted on
-        whitelisted_instance_ids = set(get_instances_user_is_whitelisted_on(email, check_ip))
+        whitelisted_instances = get_instances_user_is_whitelisted_on(email, check_ip)
+        whitelisted_instance_ids = set(whitelisted_instances)
 
         # Step 4: Calculate lost access (whitelisted but no longer in matching group)
         lost_access_ids = whitelisted_instance_ids - current_access_ids
@@ -1144,9 +1623,10 @@ def whitelist_user_ip_on_instances(email: str, groups: list, client_ip: str) ->
             print(f"[IP-REVOKE] User {email} lost access to instances: {list(lost_access_ids)}")
 
             for instance_id in lost_access_ids:
+                region = whitelisted_instances[instance_id]
                 try:
                     # Get instance security groups
-                    security_groups = get_instance_security_groups(instance_id)
+                    security_groups = get_instance_security_groups(instance_id, region)
 
                     if not security_groups:
                         result['errors'].append(f"{instance_id}: No security groups for revocation")
@@ -1166,7 +1646,7 @@ def whitelist_user_ip_on_instances(email: str, groups: list, client_ip: str) ->
                     # Remove IP from ports 80 and 443
                     revoke_success = 0
                     for port in [80, 443]:
-                        if remove_ip_from_security_group(sg_id, port, check_ip):
+                        if remove_ip_from_security_group(sg_id, port, check_ip, region):
                             revoke_success += 1
 
                     if revoke_success > 0:
@@ -1185,10 +1665,11 @@ def whitelist_user_ip_on_instances(email: str, groups: list, client_ip: str) ->
         for instance in current_access_instances:
             instance_id = instance['instance_id']
             area = instance.get('area', 'unknown')
+            region = instance['region']
 
             try:
                 # Get instance security groups
-                security_groups = get_instance_security_groups(instance_id)
+                security_groups = get_instance_security_groups(instance_id, region)
 
                 if not security_groups:
                     result['instances_failed'].append(instance_id)
@@ -1210,7 +1691,7 @@ def whitelist_user_ip_on_instances(email: str, groups: list, client_ip: str) ->
                 # Remove old IP rules if IP changed
                 if ip_changed:
                     for port in [80, 443]:
-                        remove_ip_from_security_group(sg_id, port, old_ip)
+                        remove_ip_from_security_group(sg_id, port, old_ip, region)
 
                 # Add new IP rules for ports 80 and 443
                 timestamp = datetime.utcnow().isoformat()
@@ -1218,7 +1699,7 @@ def whitelist_user_ip_on_instances(email: str, groups: list, client_ip: str) ->
 
                 for port in [80, 443]:
                     description = f"User={email}, IP={client_ip}, Port={port}, Added={timestamp}"
-                    if add_ip_to_security_group(sg_id, port, client_ip, description):
+                    if add_ip_to_security_group(sg_id, port, client_ip, description, region):
                         success_count += 1
                     else:
                         result['errors'].append(f"{instance_id}: Failed to add rule for port {port}")
@@ -1273,11 +1754,15 @@ def remove_user_ip_from_instances(email: str, instance_ids: list) -> dict:
             result['errors'].append(f"No whitelisted IP found for {email}")
             return result
 
+        # Regions of the given instances (unknown IDs default to the portal region)
+        region_of = {i['instance_id']: i['region'] for i in get_instances_by_tag()}
+
         # Process each instance
         for instance_id in instance_ids:
+            region = region_of.get(instance_id, AWS_REGION)
             try:
                 # Get instance security groups
-                security_groups = get_instance_security_groups(instance_id)
+                security_groups = get_instance_security_groups(instance_id, region)
 
                 if not security_groups:
                     result['instances_failed'].append(instance_id)
@@ -1299,7 +1784,7 @@ def remove_user_ip_from_instances(email: str, instance_ids: list) -> dict:
                 # Remove IP rules for ports 80 and 443
                 success_count = 0
                 for port in [80, 443]:
-                    if remove_ip_from_security_group(sg_id, port, user_ip):
+                    if remove_ip_from_security_group(sg_id, port, user_ip, region):
                         success_count += 1
 
                 # Consider success if at least one port was removed
@@ -1360,33 +1845,36 @@ def revoke_user_ip_from_all_instances(email: str) -> dict:
 
         result['user_ip'] = user_ip
 
-        # Step 2: Find the vibecode-launched-instances security group
-        try:
-            response = ec2_client.describe_security_groups(
+        # Step 2: Remove IP from ports 80 and 443 on the vibecode-launched-instances
+        # security group in every region (concurrently)
+        def revoke_in_region(region: str) -> Optional[list]:
+            response = get_ec2_client(region).describe_security_groups(
                 Filters=[
                     {'Name': 'group-name', 'Values': ['vibecode-launched-instances']}
                 ]
             )
 
             if not response['SecurityGroups']:
-                result['errors'].append('vibecode-launched-instances security group not found')
-                return result
+                return None
 
             sg_id = response['SecurityGroups'][0]['GroupId']
+            revoked = []
+            for port in [80, 443]:
+                if remove_ip_from_security_group(sg_id, port, user_ip, region):
+                    revoked.append(port)
+                else:
+                    result['errors'].append(f"{region}: Failed to remove IP from port {port}")
+            return revoked
 
-        except Exception as e:
-            result['errors'].append(f"Failed to query security group: {str(e)}")
+        results, errors = fan_out_regions(revoke_in_region)
+        for region, error in errors.items():
+            result['errors'].append(f"{region}: Failed to query security group: {error}")
+
+        if not errors and all(ports is None for ports in results.values()):
+            result['errors'].append('vibecode-launched-instances security group not found')
             return result
 
-        # Step 3: Remove IP from ports 80 and 443
-        for port in [80, 443]:
-            try:
-                if remove_ip_from_security_group(sg_id, port, user_ip):
-                    result['ports_revoked'].append(port)
-                else:
-                    result['errors'].append(f"Failed to remove IP from port {port}")
-            except Exception as e:
-                result['errors'].append(f"Error removing IP from port {port}: {str(e)}")
+        result['ports_revoked'] = sorted({port for ports in results.values() if ports for port in ports})
 
         # Success if at least one port was revoked
         result['success'] = len(result['ports_revoked']) > 0
@@ -1403,57 +1891,80 @@ def revoke_user_ip_from_all_instances(email: str) -> dict:
 # Functions for listing, creating, and deleting Cognito users.
 # These are used by the admin interface at /admin.
 
-def list_cognito_users() -> list:
+# Cognito returns at most this many users per list_users page
+COGNITO_LIST_USERS_MAX = 60
+
+def search_cognito_users_by_prefix(prefix: str, limit: int) -> list:
     """
-    List all users from Cognito user pool with their groups and last login.
+    Cold-path directory lookup using Cognito's server-side filter.
 
-    Queries Cognito for all users, fetches their groups, and attempts to determine
-    last login time from auth events or user modification date.
+    Used only until the membership model has loaded, so it makes exactly one
+    list_users call. Groups come from the legacy group_cache when present
+    (even if expired) and are None otherwise - they fill in once the index
+    has loaded, instead of costing an admin_list_groups_for_user per row.
+
+    Args:
+        prefix: Email prefix (characters outside an email charset are dropped)
+        limit: Max results (capped at COGNITO_LIST_USERS_MAX)
 
     Returns:
-        list: List of dict with keys: username, email, status, enabled, groups, last_login
+        list: dicts with keys email, status, groups (None if unknown), last_login
     """
-    try:
-        users = []
-        paginator = cognito_client.get_paginator('list_users')
-
-        for page in paginator.paginate(UserPoolId=USER_POOL_ID):
-            for user in page['Users']:
-                email = next((attr['Value'] for attr in user['Attributes'] if attr['Name'] == 'email'), 'N/A')
+    prefix = re.sub(r'[^A-Za-z0-9@._+-]', '', prefix)
+    kwargs = {
+        'UserPoolId': USER_POOL_ID,
+        'AttributesToGet': ['email'],
+        'Limit': min(limit, COGNITO_LIST_USERS_MAX)
+    }
+    if prefix:
+        kwargs['Filter'] = f'email ^= "{prefix}"'
+
+    response = cognito_client.list_users(**kwargs)
+
+    results = []
+    for user in response.get('Users', [])[:limit]:
+        email = next((a['Value'] for a in user.get('Attributes', []) if a['Name'] == 'email'), user['Username'])
+        modified = user.get('UserLastModifiedDate')
+        cached = group_cache.get(user['Username'])
+        results.append({
+            'email': email,
+            'status': user.get('UserStatus', 'UNKNOWN'),
+            'groups': cached[0] if cached else None,
+            'last_login': modified.strftime('%Y-%m-%d %H:%M UTC') if modified else 'Never'
+        })
+    return results
 
-                # Get user's groups
-                groups = get_user_groups(user['Username'])
 
-                # Get last login from auth events
-                last_login = 'Never'
-                try:
-                    auth_events = cognito_client.admin_list_user_auth_events(
-                        UserPoolId=USER_POOL_ID,
-                        Username=user['Username'],
-                        MaxResults=1
-                    )
-                    if auth_events.get('AuthEvents'):
-                        event = auth_events['AuthEvents'][0]
-                        if event['EventType'] == 'SignIn' and event['EventResponse'] == 'Pass':
-                            last_login = event['CreationDate'].strftime('%Y-%m-%d %H:%M UTC')
-                except Exception as e:
-                    # If auth events not available, use UserLastModifiedDate
-                    if 'UserLastModifiedDate' in user:
-                        last_login = user['UserLastModifiedDate'].strftime('%Y-%m-%d %H:%M UTC')
-
-                users.append({
-                    'username': user['Username'],
-                    'email': email,
-                    'status': user['UserStatus'],
-                    'enabled': user['Enabled'],
-                    'groups': ', '.join(groups) if groups else 'none',
-                    'last_login': last_login
-                })
+def admin_create_passwordless_user(email: str) -> str:
+    """
+    admin_create_user for a normalized email, with a random temporary password
+    that is never sent (see create_cognito_user). Raises on Cognito errors.
 
-        return users
-    except Exception as e:
-        print(f"Error listing Cognito users: {e}")
-        return []
+    Returns:
+        str: The new user's Cognito username. The pool signs users in by email,
+             so Cognito assigns a UUID username rather than using the email.
+    """
+    # Generate a temporary password (satisfies Cognito requirements, but never sent to user)
+    import secrets
+    import string
+    temp_password = ''.join(secrets.choice(string.ascii_letters + string.digits + '!@#$%') for _ in range(12))
+    temp_password = temp_password[:10] + 'Aa1!' + temp_password[10:]  # Ensure complexity
+
+    # Create user with MessageAction='SUPPRESS' to prevent temporary password email
+    # This ensures users ONLY receive 6-digit codes at login, not password emails
+    response = call_with_budget(
+        cognito_breaker,
+        cognito_client.admin_create_user,
+        UserPoolId=USER_POOL_ID,
+        Username=email,
+        UserAttributes=[
+            {'Name': 'email', 'Value': email},
+            {'Name': 'email_verified', 'Value': 'true'}
+        ],
+        TemporaryPassword=temp_password,
+        MessageAction='SUPPRESS'  # CRITICAL: Prevents temp password email
+    )
+    return response['User']['Username']
 
 def create_cognito_user(email: str, groups: list = None) -> tuple:
     """
@@ -1467,7 +1978,7 @@ def create_cognito_user(email: str, groups: list = None) -> tuple:
     to satisfy password requirements, but the user will never use it directly.
 
     Args:
-        email: User's email address (used as username in Cognito)
+        email: User's email address (the sign-in alias; Cognito assigns the username)
         groups: Optional list of Cognito group names to add user to (e.g., ['admins'])
 
     Returns:
@@ -1479,34 +1990,16 @@ def create_cognito_user(email: str, groups: list = None) -> tuple:
         # Normalize email to lowercase to prevent case sensitivity issues
         email = email.lower().strip()
 
-        # Generate a temporary password (satisfies Cognito requirements, but never sent to user)
-        import secrets
-        import string
-        temp_password = ''.join(secrets.choice(string.ascii_letters + string.digits + '!@#$%') for _ in range(12))
-        temp_password = temp_password[:10] + 'Aa1!' + temp_password[10:]  # Ensure complexity
-
-        # Create user with MessageAction='SUPPRESS' to prevent temporary password email
-        # This ensures users ONLY receive 6-digit codes at login, not password emails
-        cognito_client.admin_create_user(
-            UserPoolId=USER_POOL_ID,
-            Username=email,
-            UserAttributes=[
-                {'Name': 'email', 'Value': email},
-                {'Name': 'email_verified', 'Value': 'true'}
-            ],
-            TemporaryPassword=temp_password,
-            MessageAction='SUPPRESS'  # CRITICAL: Prevents temp password email
-        )
+        username = admin_create_passwordless_user(email)
+        membership.add_user(username, email)
 
         # Add user to groups if specified
         if groups:
             for group in groups:
                 try:
-                    cognito_client.admin_add_user_to_group(
-                        UserPoolId=USER_POOL_ID,
-                        Username=email,
-                        GroupName=group
-                    )
+                    call_with_budget(cognito_breaker, cognito_client.admin_add_user_to_group,
+                                     UserPoolId=USER_POOL_ID, Username=username, GroupName=group)
+                    membership.add_to_group(username, group)
                 except Exception as e:
                     print(f"Error adding user to group {group}: {e}")
 
@@ -1517,51 +2010,2329 @@ def create_cognito_user(email: str, groups: list = None) -> tuple:
 def delete_cognito_user(email: str) -> tuple:
     """Delete a user from Cognito. Returns (success: bool, message: str)."""
     try:
-        cognito_client.admin_delete_user(
-            UserPoolId=USER_POOL_ID,
-            Username=email
-        )
+        username = membership.find_username(email) or email
+        call_with_budget(cognito_breaker, cognito_client.admin_delete_user,
+                         UserPoolId=USER_POOL_ID, Username=username)
+        membership.remove_user(username)
         return True, f"User {email} deleted successfully."
     except Exception as e:
         return False, f"Error deleting user: {str(e)}"
 
-def validate_token(token: str) -> dict:
-    """Validate JWT token from cookie."""
-    try:
-        # Decode without verification (Cognito signed it, we trust it)
-        payload = jwt.decode(
-            token,
-            "",  # Empty key since we're not verifying signature
-            options={
-                "verify_signature": False,
-                "verify_aud": False,  # Skip audience validation
-                "verify_exp": True    # Still check expiration
-            }
-        )
-        return payload
-    except JWTError as e:
-        print(f"JWT decode error: {e}")
-        return None
+# ============================================================================
+# MEMBERSHIP MODEL
+# ============================================================================
+# In-memory view of the user pool shared by /admin, /directory and group lookups.
+# Loaded with one list_users scan plus one list_users_in_group scan per group,
+# then updated IN PLACE by the admin mutation routes after each Cognito call
+# succeeds - an admin editing groups never triggers a full rescan.
+# A full reload still happens every MEMBERSHIP_REFRESH_SECONDS to pick up
+# changes made outside the portal (AWS console, CLI).
 
-@app.middleware("http")
-async def auth_middleware(request: Request, call_next):
-    """Authentication middleware - checks JWT token in cookie."""
-    # Public paths - no auth required
-    public_paths = ["/login", "/verify-code", "/health", "/logged-out"]
+MEMBERSHIP_REFRESH_SECONDS = int(os.environ.get('MEMBERSHIP_REFRESH_SECONDS', '900'))
 
-    if request.url.path in public_paths:
-        response = await call_next(request)
-        return response
+# Sort keys supported by the admin users table API
+USER_TABLE_SORT_KEYS = ('email', 'status', 'last_login', 'groups')
+USER_TABLE_MAX_LIMIT = 200
 
-    # Check for auth cookie
-    token = request.cookies.get("auth_token")
-    if not token:
-        return RedirectResponse(url="/login", status_code=302)
 
-    # Validate token
-    user_data = validate_token(token)
-    if not user_data:
-        return RedirectResponse(url="/login", status_code=302)
+class MembershipModel:
+    """
+    Users, user -> groups, group -> users and the group list for the user pool.
+
+    All reads and writes go through a lock; readers get copies so templates
+    never see a half-applied mutation.
+
+    Keyed by Cognito username. The pool signs users in by email, so usernames
+    are UUIDs in production; callers that only have an email (logins, bulk
+    rows, whitelist rules) resolve it with find_username() first.
+
+    email_index is a sorted list of (lowercase email, username) kept up to date
+    incrementally with bisect, so prefix search is two binary searches and
+    email-ordered pages are slices. Other sort orders are built lazily and
+    cached until something they sort on changes (sort_versions): user and
+    group changes move every order, a login only moves last_login.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()  # one full load at a time
+        self.users = {}        # username -> {username, email, status, enabled, last_login}
+        self.user_groups = {}  # username -> set of group names
+        self.group_users = {}  # group name -> set of usernames
+        self.groups = {}       # group name -> description
+        self.email_index = []  # sorted [(email.lower(), username)]
+        self._sorted_keys = {}  # sort key -> (sort version, sorted key tuples)
+        self.loaded_at = None
+        self.version = 0       # bumped on every change
+        self.sort_versions = dict.fromkeys(USER_TABLE_SORT_KEYS, 0)  # bumped when that order can move
+        self._changes_during_load = None  # changes made while load() scans, replayed on its result
+
+    def _bump(self, *sorts) -> None:
+        """Record a change (call with the lock held); sorts defaults to every order."""
+        self.version += 1
+        for sort in sorts or USER_TABLE_SORT_KEYS:
+            self.sort_versions[sort] += 1
+
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def is_fresh(self) -> bool:
+        return self.loaded_at is not None and time.time() - self.loaded_at <= MEMBERSHIP_REFRESH_SECONDS
+
+    def ensure_loaded(self) -> None:
+        """Load from Cognito if never loaded or older than MEMBERSHIP_REFRESH_SECONDS."""
+        if self.is_fresh():
+            return
+        with self._load_lock:
+            if not self.is_fresh():  # another thread may have just loaded
+                self.load()
+
+    def load_in_background(self) -> None:
+        """Start ensure_loaded() in a daemon thread unless a load is already running."""
+        if not self.is_fresh() and not self._load_lock.locked():
+            threading.Thread(target=self.ensure_loaded, daemon=True).start()
+
+    def load(self) -> None:
+        """
+        Full reload from Cognito. Raises on error so callers never cache an empty pool.
+
+        The scan runs without the lock, so in-place changes made meanwhile
+        (admin routes, bulk rows) are logged and replayed onto the new maps
+        before they are swapped in; otherwise they would be lost until the
+        next reload.
+        """
+        with self._lock:
+            self._changes_during_load = []
+        try:
+            self._load()
+        finally:
+            with self._lock:
+                self._changes_during_load = None
+
+    def _load(self) -> None:
+        users = {}
+        user_groups = {}
+        group_users = {}
+        groups = {}
+
+        # Only the email attribute is needed - keeps list_users pages small
+        user_pages = cognito_client.get_paginator('list_users').paginate(
+            UserPoolId=USER_POOL_ID,
+            AttributesToGet=['email']
+        )
+        for page in user_pages:
+            for user in page['Users']:
+                record = self._record_from_cognito(user)
+                users[record['username']] = record
+                user_groups[record['username']] = set()
+
+        for page in cognito_client.get_paginator('list_groups').paginate(UserPoolId=USER_POOL_ID):
+            for group in page['Groups']:
+                groups[group['GroupName']] = group.get('Description', '')
+                group_users[group['GroupName']] = set()
+
+        member_paginator = cognito_client.get_paginator('list_users_in_group')
+        for group_name in groups:
+            for page in member_paginator.paginate(UserPoolId=USER_POOL_ID, GroupName=group_name):
+                for user in page['Users']:
+                    username = user['Username']
+                    if username not in users:
+                        users[username] = self._record_from_cognito(user)
+                        user_groups[username] = set()
+                    user_groups[username].add(group_name)
+                    group_users[group_name].add(username)
+
+        with self._lock:
+            # Keep last logins already learned (portal logins / auth events)
+            for username, record in users.items():
+                previous = self.users.get(username)
+                if previous and previous.get('last_login_source') != 'modified':
+                    record['last_login'] = previous['last_login']
+                    record['last_login_source'] = previous['last_login_source']
+
+            self.users = users
+            self.user_groups = user_groups
+            self.group_users = group_users
+            self.groups = groups
+            self.email_index = sorted((r['email'].lower(), u) for u, r in users.items())
+            replay, self._changes_during_load = self._changes_during_load, None
+            self._apply_locked(replay)
+            self.loaded_at = time.time()
+            self._bump()
+
+        print(f"[MEMBERSHIP] Loaded {len(users)} users, {len(groups)} groups")
+
+        pending = [u for u, r in users.items() if r['last_login_source'] == 'modified']
+        if pending:
+            threading.Thread(target=self._backfill_last_logins, args=(pending,), daemon=True).start()
+
+    @staticmethod
+    def _record_from_cognito(user: dict) -> dict:
+        email = next((a['Value'] for a in user.get('Attributes', []) if a['Name'] == 'email'), None)
+        modified = user.get('UserLastModifiedDate')
+        return {
+            'username': user['Username'],
+            'email': email or user['Username'],
+            'status': user.get('UserStatus', 'UNKNOWN'),
+            'enabled': user.get('Enabled', True),
+            'last_login': modified.strftime('%Y-%m-%d %H:%M UTC') if modified else 'Never',
+            'last_login_source': 'modified'
+        }
+
+    def _backfill_last_logins(self, usernames: list) -> None:
+        """
+        Fill last_login from Cognito auth events off the request path.
+
+        Results are applied in one update at the end, so last_login cursors
+        go stale once per backfill rather than once per user.
+        """
+        checked = {}  # username -> last sign-in, or None if it has none
+        for username in usernames:
+            try:
+                auth_events = cognito_client.admin_list_user_auth_events(
+                    UserPoolId=USER_POOL_ID,
+                    Username=username,
+                    MaxResults=1
+                )
+            except Exception as e:
+                # Auth events unavailable (e.g. advanced security off) - keep fallback dates
+                print(f"[MEMBERSHIP] Auth events unavailable, keeping modified dates: {e}")
+                break
+            events = auth_events.get('AuthEvents', [])
+            signed_in = events and events[0]['EventType'] == 'SignIn' and events[0]['EventResponse'] == 'Pass'
+            checked[username] = events[0]['CreationDate'].strftime('%Y-%m-%d %H:%M UTC') if signed_in else None
+
+        # Mark users as checked even without a sign-in event so later
+        # reloads don't repeat the lookup
+        with self._lock:
+            changed = False
+            for username, last_login in checked.items():
+                record = self.users.get(username)
+                if record and record['last_login_source'] == 'modified':
+                    if last_login:
+                        record['last_login'] = last_login
+                        changed = True
+                    record['last_login_source'] = 'auth_events'
+            if changed:
+                self._bump('last_login')
+
+    # -- reads ---------------------------------------------------------------
+
+    def get_user(self, username: str) -> Optional[dict]:
+        with self._lock:
+            record = self.users.get(username)
+            return dict(record) if record else None
+
+    def find_username(self, email: str) -> Optional[str]:
+        """Username for an email (case-insensitive) via the sorted index, or None."""
+        key = email.lower()
+        with self._lock:
+            i = bisect_left(self.email_index, (key,))
+            if i < len(self.email_index) and self.email_index[i][0] == key:
+                return self.email_index[i][1]
+        return None
+
+    def groups_for(self, username: str) -> list:
+        with self._lock:
+            return sorted(self.user_groups.get(username, ()))
+
+    def group_names(self) -> list:
+        with self._lock:
+            return sorted(self.groups)
+
+    def members_of(self, group_name: str) -> list:
+        with self._lock:
+            return sorted(self.group_users.get(group_name, ()))
+
+    def users_snapshot(self) -> list:
+        """All users (sorted by email) with their groups as a list."""
+        with self._lock:
+            return [self._user_row(username) for _, username in self.email_index]
+
+    def _user_row(self, username: str) -> dict:
+        return {**self.users[username], 'groups': sorted(self.user_groups.get(username, ()))}
+
+    def _sort_key(self, username: str, sort: str) -> tuple:
+        """Unique, totally ordered key: (sort value, email, username)."""
+        record = self.users[username]
+        email = record['email'].lower()
+        if sort == 'status':
+            value = record['status']
+        elif sort == 'last_login':
+            value = '' if record['last_login'] == 'Never' else record['last_login']
+        elif sort == 'groups':
+            value = ', '.join(sorted(self.user_groups.get(username, ())))
+        else:
+            value = email
+        return (value, email, username)
+
+    def query(self, prefix: str = '', sort: str = 'email', descending: bool = False,
+              cursor: Optional[tuple] = None, limit: int = 50) -> tuple:
+        """
+        One page of users matching an email prefix, in keyset (cursor) order.
+
+        Args:
+            prefix: Case-insensitive email prefix ('' for everyone)
+            sort: One of USER_TABLE_SORT_KEYS
+            descending: Reverse the sort order
+            cursor: Sort key of the last row of the previous page, or None
+            limit: Page size
+
+        Returns:
+            tuple: (rows, next_cursor or None, total matching users)
+        """
+        with self._lock:
+            if prefix:
+                prefix = prefix.lower()
+                lo = bisect_left(self.email_index, (prefix,))
+                hi = bisect_left(self.email_index, (prefix + '\uffff',))
+                matches = self.email_index[lo:hi]
+            else:
+                matches = self.email_index
+
+            if sort == 'email':
+                keys = [(email, email, username) for email, username in matches]
+            elif prefix:
+                keys = sorted(self._sort_key(username, sort) for _, username in matches)
+            else:
+                cached = self._sorted_keys.get(sort)
+                if not cached or cached[0] != self.sort_versions[sort]:
+                    cached = (self.sort_versions[sort], sorted(self._sort_key(u, sort) for _, u in self.email_index))
+                    self._sorted_keys[sort] = cached
+                keys = cached[1]
+
+            if descending:
+                end = bisect_left(keys, cursor) if cursor else len(keys)
+                start = max(0, end - limit)
+                page = keys[start:end][::-1]
+                has_more = start > 0
+            else:
+                start = bisect_right(keys, cursor) if cursor else 0
+                page = keys[start:start + limit]
+                has_more = start + limit < len(keys)
+
+            rows = [self._user_row(key[2]) for key in page]
+            next_cursor = page[-1] if page and has_more else None
+            return rows, next_cursor, len(keys)
+
+    def search(self, prefix: str = '', limit: int = 25, offset: int = 0) -> tuple:
+        """
+        Directory search: email-ordered prefix match with limit/offset.
+
+        O(log n + limit) - two binary searches on email_index plus one slice.
+
+        Returns:
+            tuple: (rows of {email, status, groups, last_login}, total matches)
+        """
+        with self._lock:
+            if prefix:
+                prefix = prefix.lower()
+                lo = bisect_left(self.email_index, (prefix,))
+                hi = bisect_left(self.email_index, (prefix + '\uffff',))
+            else:
+                lo, hi = 0, len(self.email_index)
+
+            rows = []
+            for _, username in self.email_index[lo + offset:min(hi, lo + offset + limit)]:
+                record = self.users[username]
+                rows.append({
+                    'email': record['email'],
+                    'status': record['status'],
+                    'groups': sorted(self.user_groups.get(username, ())),
+                    'last_login': record['last_login']
+                })
+            return rows, hi - lo
+
+    # -- in-place updates (call only after the Cognito call succeeded) ------
+    # Each also drops the user's entry from the legacy group_cache.
+
+    def add_user(self, username: str, email: str, status: str = 'FORCE_CHANGE_PASSWORD') -> None:
+        self.apply_changes([('add_user', username, email, status)])
+
+    def remove_user(self, username: str) -> None:
+        self.apply_changes([('remove_user', username)])
+
+    def add_to_group(self, username: str, group_name: str) -> None:
+        self.apply_changes([('add_to_group', username, group_name)])
+
+    def remove_from_group(self, username: str, group_name: str) -> None:
+        self.apply_changes([('remove_from_group', username, group_name)])
+
+    def apply_changes(self, changes: list) -> None:
+        """
+        Apply several writes under one lock with a single version bump.
+
+        Args:
+            changes: tuples of
+                ('add_user', username, email[, status])
+                ('remove_user', username)
+                ('add_to_group', username, group_name)
+                ('remove_from_group', username, group_name)
+        """
+        if not changes:
+            return
+        for change in changes:
+            if change[0] != 'add_user':
+                group_cache.pop(change[1], None)
+
+        with self._lock:
+            self._apply_locked(changes)
+            self._bump()
+
+    def _apply_locked(self, changes: list) -> None:
+        """Apply change tuples to the maps (lock held), logging them if a load is scanning."""
+        if self._changes_during_load is not None:
+            self._changes_during_load.extend(changes)
+        for kind, username, *args in changes:
+            if kind == 'add_user':
+                if username not in self.users:
+                    email = args[0]
+                    self.users[username] = {
+                        'username': username,
+                        'email': email,
+                        'status': args[1] if len(args) > 1 else 'FORCE_CHANGE_PASSWORD',
+                        'enabled': True,
+                        'last_login': 'Never',
+                        'last_login_source': 'portal'
+                    }
+                    self.user_groups[username] = set()
+                    insort(self.email_index, (email.lower(), username))
+            elif kind == 'remove_user':
+                record = self.users.pop(username, None)
+                if record:
+                    key = (record['email'].lower(), username)
+                    i = bisect_left(self.email_index, key)
+                    if i < len(self.email_index) and self.email_index[i] == key:
+                        del self.email_index[i]
+                for group_name in self.user_groups.pop(username, ()):
+                    self.group_users.get(group_name, set()).discard(username)
+            elif kind == 'add_to_group':
+                self.user_groups.setdefault(username, set()).add(args[0])
+                self.group_users.setdefault(args[0], set()).add(username)
+                self.groups.setdefault(args[0], '')
+            elif kind == 'remove_from_group':
+                self.user_groups.get(username, set()).discard(args[0])
+                self.group_users.get(args[0], set()).discard(username)
+            elif kind == 'add_group':
+                # username is the group name here (see add_group)
+                self.groups[username] = args[0]
+                self.group_users.setdefault(username, set())
+            else:
+                raise ValueError(f"Unknown membership change: {kind}")
+
+    def add_group(self, group_name: str, description: str = '') -> None:
+        with self._lock:
+            self._apply_locked([('add_group', group_name, description)])
+            self.version += 1
+
+    def record_login(self, email: str) -> None:
+        """Set last_login to now for the user with this email (a login only knows the email)."""
+        username = self.find_username(email)
+        with self._lock:
+            record = self.users.get(username)
+            if record:
+                record['last_login'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')
+                record['last_login_source'] = 'portal'
+                self._bump('last_login')
+
+
+membership = MembershipModel()
+
+
+# ============================================================================
+# WHITELIST RECONCILER
+# ============================================================================
+# Periodic fleet-wide desired-state reconciliation for IP whitelisting.
+# Each cycle computes the complete desired rule set from
+#   Cognito group membership x VibeCodeArea inventory x last known user IP,
+# takes ONE snapshot of the vibecode-launched-instances security group rules
+# per region (all EC2_REGIONS concurrently), diffs them in memory and applies
+# minimal authorize/revoke batches.
+# Only rules whose description names a user (User=... / User: ...) are managed;
+# SSH and any hand-made rules are never touched.
+
+WHITELIST_SG_NAME = 'vibecode-launched-instances'
+WHITELIST_PORTS = [80, 443]
+RECONCILER_BATCH_SIZE = 50  # IpRanges per authorize/revoke call
+
+# Last known client IP per user email. Updated on every login and seeded
+# from existing rule descriptions so a portal restart loses nothing.
+last_known_ips = {}
+# Written on the event loop at login, read by the reconciler's worker thread
+last_known_ips_lock = threading.Lock()
+
+# Metrics for the most recent reconcile cycles (newest last)
+reconciler_history = deque(maxlen=20)
+reconciler_lock = threading.Lock()
+reconciler_wakeup = None  # asyncio.Event, created on startup
+reconciler_loop = None    # event loop reconciler_wakeup belongs to
+
+
+def parse_whitelist_rule_owner(description: str) -> Optional[tuple]:
+    """
+    Extract (email, ip) from a managed rule description.
+
+    Handles both formats written by the portal:
+    - "User=email@capsule.com, IP=73.158.64.21, Port=80, Added=..."
+    - "User: email@capsule.com | IP: 73.158.64.21 | Port: 80 | Added: ..."
+
+    Returns:
+        tuple: (email, ip) or None if the rule is not portal-managed
+    """
+    match = re.match(r'User[=:]\s*([^,|\s]+)\s*[,|]\s*IP[=:]\s*([0-9.]+)', description or '')
+    if not match:
+        return None
+    return match.group(1), match.group(2)
+
+
+def describe_vibecode_inventory(region: str = AWS_REGION) -> list:
+    """
+    List all live instances with a VibeCodeArea tag in a region, including their whitelist SGs.
+
+    Unlike get_instances_by_tag() this raises on error - the reconciler must
+    never mistake an API failure for an empty fleet and revoke everything.
+
+    Returns:
+        list: dicts with keys instance_id, area, state, sg_ids
+    """
+    inventory = []
+    paginator = get_ec2_client(region).get_paginator('describe_instances')
+    pages = paginator.paginate(Filters=[
+        {'Name': 'tag:VibeCodeArea', 'Values': ['*']},
+        {'Name': 'instance-state-name', 'Values': ['pending', 'running', 'stopping', 'stopped']}
+    ])
+
+    for page in pages:
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                area = next((t['Value'] for t in instance.get('Tags', []) if t['Key'] == 'VibeCodeArea'), None)
+                inventory.append({
+                    'instance_id': instance['InstanceId'],
+                    'area': area,
+                    'state': instance['State']['Name'],
+                    'sg_ids': [sg['GroupId'] for sg in instance.get('SecurityGroups', [])
+                               if sg.get('GroupName') == WHITELIST_SG_NAME]
+                })
+
+    return inventory
+
+
+def describe_whitelist_security_groups(region: str = AWS_REGION) -> list:
+    """Snapshot every vibecode-launched-instances security group in a region (raises on error)."""
+    response = get_ec2_client(region).describe_security_groups(
+        Filters=[{'Name': 'group-name', 'Values': [WHITELIST_SG_NAME]}]
+    )
+    return response['SecurityGroups']
+
+
+def fetch_area_group_members() -> dict:
+    """
+    Get email membership for every area group (one list_users_in_group scan per group).
+
+    Returns:
+        dict: {group_name: set of user emails} for all non-system groups
+    """
+    members = {}
+    group_paginator = cognito_client.get_paginator('list_groups')
+    for page in group_paginator.paginate(UserPoolId=USER_POOL_ID):
+        for group in page['Groups']:
+            group_name = group['GroupName']
+            if group_name in SYSTEM_GROUPS:
+                continue
+
+            members[group_name] = set()
+            user_paginator = cognito_client.get_paginator('list_users_in_group')
+            for user_page in user_paginator.paginate(UserPoolId=USER_POOL_ID, GroupName=group_name):
+                for user in user_page['Users']:
+                    email = next((a['Value'] for a in user.get('Attributes', []) if a['Name'] == 'email'), user['Username'])
+                    members[group_name].add(email.lower())
+
+    return members
+
+
+def snapshot_whitelist_rules(security_groups: list) -> dict:
+    """
+    Flatten security group snapshots into a rule map.
+
+    Returns:
+        dict: {(sg_id, port, cidr): owner_email or None}
+              owner is None for rules not managed by the portal
+    """
+    rules = {}
+    for sg in security_groups:
+        for permission in sg.get('IpPermissions', []):
+            if permission.get('IpProtocol') != 'tcp':
+                continue
+            from_port = permission.get('FromPort')
+            if from_port != permission.get('ToPort'):
+                continue
+
+            for ip_range in permission.get('IpRanges', []):
+                owner = parse_whitelist_rule_owner(ip_range.get('Description', ''))
+                rules[(sg['GroupId'], from_port, ip_range.get('CidrIp', ''))] = owner[0] if owner else None
+
+    return rules
+
+
+def compute_desired_whitelist_rules(inventory: list, group_members: dict, user_ips: dict) -> dict:
+    """
+    Compute the complete desired rule set for the fleet.
+
+    Args:
+        inventory: Output of describe_vibecode_inventory()
+        group_members: Output of fetch_area_group_members()
+        user_ips: {email: ip} last known IP per user
+
+    Returns:
+        dict: {(sg_id, port, cidr): owner_email}
+    """
+    sgs_by_area = {}
+    for instance in inventory:
+        if instance.get('area'):
+            sgs_by_area.setdefault(instance['area'], set()).update(instance['sg_ids'])
+
+    desired = {}
+    for group_name, emails in group_members.items():
+        for sg_id in sgs_by_area.get(group_name, ()):
+            for email in emails:
+                ip = user_ips.get(email)
+                if not ip:
+                    continue
+                for port in WHITELIST_PORTS:
+                    desired.setdefault((sg_id, port, f"{ip}/32"), email)
+
+    return desired
+
+
+def diff_whitelist_rules(desired: dict, current: dict) -> tuple:
+    """
+    Diff desired against current rules.
+
+    Returns:
+        tuple: (to_authorize, to_revoke) - dicts of {(sg_id, port, cidr): email}.
+               Only portal-managed rules are ever revoked.
+    """
+    to_authorize = {key: email for key, email in desired.items() if key not in current}
+    to_revoke = {key: email for key, email in current.items() if email and key not in desired}
+    return to_authorize, to_revoke
+
+
+def _batch_rules(rules: dict) -> list:
+    """Group rules into (sg_id, IpPermissions) batches of at most RECONCILER_BATCH_SIZE ranges."""
+    by_sg_port = {}
+    for (sg_id, port, cidr), email in sorted(rules.items()):
+        by_sg_port.setdefault((sg_id, port), []).append((cidr, email))
+
+    batches = []
+    for (sg_id, port), ranges in by_sg_port.items():
+        for i in range(0, len(ranges), RECONCILER_BATCH_SIZE):
+            batches.append((sg_id, port, ranges[i:i + RECONCILER_BATCH_SIZE]))
+    return batches
+
+
+def apply_whitelist_diff(to_authorize: dict, to_revoke: dict, metrics: dict, region: str = AWS_REGION) -> None:
+    """
+    Apply authorize/revoke batches in one region. Falls back to per-rule calls
+    if a batch fails (e.g. one duplicate rule rejects the whole authorize call).
+    """
+    client = get_ec2_client(region)
+    timestamp = datetime.utcnow().isoformat()
+
+    for sg_id, port, ranges in _batch_rules(to_authorize):
+        ip_ranges = [{
+            'CidrIp': cidr,
+            'Description': f"User={email}, IP={cidr.replace('/32', '')}, Port={port}, Added={timestamp}"
+        } for cidr, email in ranges]
+        try:
+            metrics['api_calls'] += 1
+            client.authorize_security_group_ingress(
+                GroupId=sg_id,
+                IpPermissions=[{'IpProtocol': 'tcp', 'FromPort': port, 'ToPort': port, 'IpRanges': ip_ranges}]
+            )
+            metrics['authorized'] += len(ranges)
+            access_manifests.invalidate_inventory()
+        except Exception as e:
+            print(f"[RECONCILE] Batch authorize on {region} {sg_id} port {port} failed ({e}), retrying per rule")
+            for ip_range in ip_ranges:
+                metrics['api_calls'] += 1
+                if add_ip_to_security_group(sg_id, port, ip_range['CidrIp'].replace('/32', ''), ip_range['Description'], region):
+                    metrics['authorized'] += 1
+                else:
+                    metrics['errors'].append(f"authorize {region} {sg_id} {port} {ip_range['CidrIp']}")
+
+    for sg_id, port, ranges in _batch_rules(to_revoke):
+        try:
+            metrics['api_calls'] += 1
+            client.revoke_security_group_ingress(
+                GroupId=sg_id,
+                IpPermissions=[{'IpProtocol': 'tcp', 'FromPort': port, 'ToPort': port,
+                                'IpRanges': [{'CidrIp': cidr} for cidr, _ in ranges]}]
+            )
+            metrics['revoked'] += len(ranges)
+            access_manifests.invalidate_inventory()
+        except Exception as e:
+            print(f"[RECONCILE] Batch revoke on {region} {sg_id} port {port} failed ({e}), retrying per rule")
+            for cidr, _ in ranges:
+                metrics['api_calls'] += 1
+                if remove_ip_from_security_group(sg_id, port, cidr.replace('/32', ''), region):
+                    metrics['revoked'] += 1
+                else:
+                    metrics['errors'].append(f"revoke {region} {sg_id} {port} {cidr}")
+
+
+def run_whitelist_reconcile_cycle(dry_run: bool = RECONCILER_DRY_RUN) -> dict:
+    """
+    Run one full reconcile cycle.
+
+    Args:
+        dry_run: If True, compute and report the diff without changing any rules
+
+    Returns:
+        dict: Cycle metrics plus the planned 'authorize'/'revoke' rule lists
+    """
+    with reconciler_lock:
+        started = time.time()
+        metrics = {
+            'started_at': datetime.utcnow().isoformat(),
+            'dry_run': dry_run,
+            'success': False,
+            'instances': 0,
+            'area_groups': 0,
+            'users_with_ip': 0,
+            'desired_rules': 0,
+            'current_rules': 0,
+            'to_authorize': 0,
+            'to_revoke': 0,
+            'authorized': 0,
+            'revoked': 0,
+            'api_calls': 0,
+            'errors': [],
+            'duration_ms': 0
+        }
+        plan = {'authorize': [], 'revoke': []}
+
+        try:
+            group_members = fetch_area_group_members()
+
+            # Describe every region concurrently. A region that fails is skipped
+            # for this cycle - never treated as an empty fleet.
+            snapshots, region_errors = fan_out_regions(
+                lambda region: (describe_vibecode_inventory(region), describe_whitelist_security_groups(region))
+            )
+            for region, error in sorted(region_errors.items()):
+                metrics['errors'].append(f"{region}: describe failed, region skipped: {error}")
+            if not snapshots:
+                raise RuntimeError("no region could be described")
+            metrics['api_calls'] += 2 * len(snapshots) + len(group_members) + 1
+
+            # Seed IPs from rule descriptions in any region, but logins always win
+            user_ips = {}
+            for _, security_groups in snapshots.values():
+                for sg in security_groups:
+                    for permission in sg.get('IpPermissions', []):
+                        for ip_range in permission.get('IpRanges', []):
+                            owner = parse_whitelist_rule_owner(ip_range.get('Description', ''))
+                            if owner:
+                                user_ips.setdefault(owner[0], owner[1])
+            with last_known_ips_lock:
+                user_ips.update(last_known_ips)
+
+            # Security groups are regional, so each region is diffed on its own
+            region_diffs = {}
+            for region in EC2_REGIONS:
+                if region not in snapshots:
+                    continue
+                inventory, security_groups = snapshots[region]
+                current = snapshot_whitelist_rules(security_groups)
+                desired = compute_desired_whitelist_rules(inventory, group_members, user_ips)
+                to_authorize, to_revoke = diff_whitelist_rules(desired, current)
+                region_diffs[region] = (to_authorize, to_revoke)
+
+                metrics['instances'] += len(inventory)
+                metrics['desired_rules'] += len(desired)
+                metrics['current_rules'] += sum(1 for owner in current.values() if owner)
+                metrics['to_authorize'] += len(to_authorize)
+                metrics['to_revoke'] += len(to_revoke)
+                plan['authorize'] += [{'region': region, 'sg_id': k[0], 'port': k[1], 'cidr': k[2], 'email': v} for k, v in sorted(to_authorize.items())]
+                plan['revoke'] += [{'region': region, 'sg_id': k[0], 'port': k[1], 'cidr': k[2], 'email': v} for k, v in sorted(to_revoke.items())]
+
+            metrics['area_groups'] = len(group_members)
+            metrics['users_with_ip'] = len(user_ips)
+
+            if not dry_run:
+                def apply_region(region: str) -> dict:
+                    region_metrics = {'api_calls': 0, 'authorized': 0, 'revoked': 0, 'errors': []}
+                    apply_whitelist_diff(*region_diffs[region], region_metrics, region)
+                    return region_metrics
+
+                applied, apply_errors = fan_out_regions(apply_region, regions=list(region_diffs), timeout=None)
+                for region_metrics in applied.values():
+                    for key in ('api_calls', 'authorized', 'revoked'):
+                        metrics[key] += region_metrics[key]
+                    metrics['errors'] += region_metrics['errors']
+                for region, error in sorted(apply_errors.items()):
+                    metrics['errors'].append(f"{region}: apply failed: {error}")
+
+            metrics['success'] = not metrics['errors']
+
+        except Exception as e:
+            metrics['errors'].append(f"Reconcile aborted: {str(e)}")
+
+        metrics['duration_ms'] = int((time.time() - started) * 1000)
+        reconciler_history.append(dict(metrics))
+
+        print(f"[RECONCILE] {metrics['started_at']} | DRY_RUN: {dry_run} | DESIRED: {metrics['desired_rules']} | "
+              f"CURRENT: {metrics['current_rules']} | +{metrics['to_authorize']} -{metrics['to_revoke']} | "
+              f"APPLIED: +{metrics['authorized']} -{metrics['revoked']} | ERRORS: {len(metrics['errors'])} | {metrics['duration_ms']}ms")
+
+        return {**metrics, **plan}
+
+
+async def whitelist_reconciler_loop():
+    """Background task: reconcile every RECONCILER_INTERVAL seconds, or sooner when woken."""
+    while True:
+        try:
+            await asyncio.wait_for(reconciler_wakeup.wait(), timeout=RECONCILER_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        reconciler_wakeup.clear()
+
+        try:
+            await asyncio.to_thread(run_whitelist_reconcile_cycle)
+        except Exception as e:
+            print(f"[RECONCILE] Cycle crashed: {e}")
+
+
+@app.on_event("startup")
+async def start_whitelist_reconciler():
+    """Start the background reconciler (runs the first cycle immediately)."""
+    global reconciler_wakeup, reconciler_loop
+    reconciler_wakeup = asyncio.Event()
+    reconciler_loop = asyncio.get_running_loop()
+
+    if RECONCILER_ENABLED:
+        reconciler_wakeup.set()
+        asyncio.create_task(whitelist_reconciler_loop())
+        print(f"[RECONCILE] Started (interval={RECONCILER_INTERVAL}s, dry_run={RECONCILER_DRY_RUN})")
+
+
+def request_whitelist_reconcile():
+    """
+    Wake the reconciler so a pending change is applied without waiting a full interval.
+
+    Safe to call from worker threads (bulk streams, executor callbacks):
+    asyncio.Event is not thread-safe, so off-loop callers hand the set() to
+    the reconciler's loop.
+    """
+    if reconciler_wakeup is None or reconciler_loop.is_closed():
+        return
+    try:
+        on_loop = asyncio.get_running_loop() is reconciler_loop
+    except RuntimeError:
+        on_loop = False
+    if on_loop:
+        reconciler_wakeup.set()
+    else:
+        reconciler_loop.call_soon_threadsafe(reconciler_wakeup.set)
+
+
+# ============================================================================
+# NDJSON EXPORTS
+# ============================================================================
+# Streaming variants of the whitelist audit and the user list. Each is a
+# generator yielding one JSON record per line as AWS pages arrive, ending
+# with a {"type": "summary"} record (or {"type": "error"} if the scan failed
+# part-way). Nothing is accumulated per request, so memory stays flat no
+# matter how large the security group or user pool is.
+# Sync generators: StreamingResponse iterates them in the threadpool, so
+# the blocking boto3 calls never run on the event loop.
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def ndjson_line(record: dict) -> str:
+    return json.dumps(record, default=str) + '\n'
+
+
+def whitelist_rule_orphan_reason(rule_email: str) -> Optional[str]:
+    """
+    Why a whitelist rule owned by rule_email should not exist, or None if valid.
+
+    Uses the membership model (loaded by the caller) - O(log n) per rule.
+    """
+    username = membership.find_username(rule_email)
+    if username is None:
+        return 'User not found in Cognito'
+    if not [g for g in membership.groups_for(username) if g not in SYSTEM_GROUPS]:
+        return 'User has no area group memberships'
+    return None
+
+
+def parse_whitelist_audit_rule(description: str, cidr: str, from_port: int) -> dict:
+    """
+    Parse a user rule description ("User: ..." or the login's "User=...") into an audit record.
+
+    Returns:
+        dict: email, ip, port, cidr, added, description ('Unknown' where unparseable)
+    """
+    if 'User:' not in description:
+        owner = parse_whitelist_rule_owner(description)
+        if owner:
+            added = re.search(r'Added=(\S+)', description)
+            return {
+                'email': owner[0],
+                'ip': owner[1],
+                'port': str(from_port),
+                'cidr': cidr,
+                'added': added.group(1) if added else 'Unknown',
+                'description': description
+            }
+    try:
+        # Format: "User: email@capsule.com | IP: 73.158.64.21 | Port: 80 | Added: 2026-01-28T10:30:00Z"
+        return {
+            'email': description.split('User:')[1].split('|')[0].strip(),
+            'ip': description.split('IP:')[1].split('|')[0].strip(),
+            'port': description.split('Port:')[1].split('|')[0].strip(),
+            'cidr': cidr,
+            'added': description.split('Added:')[1].strip() if 'Added:' in description else 'Unknown',
+            'description': description
+        }
+    except Exception:
+        # Unparseable description - include as-is
+        return {
+            'email': 'Unknown',
+            'ip': cidr.replace('/32', ''),
+            'port': str(from_port),
+            'cidr': cidr,
+            'added': 'Unknown',
+            'description': description
+        }
+
+
+def collect_whitelist_audit_rules() -> tuple:
+    """
+    Every user rule on the whitelist security groups in all EC2_REGIONS (blocking).
+
+    Regions are described concurrently. A region that fails is reported in
+    errors, never read as having no rules.
+
+    Returns:
+        tuple: (rules, security_groups, errors)
+            rules: parse_whitelist_audit_rule() records plus region and security_group_id
+            security_groups: [{region, security_group_id}]
+            errors: {region: message}
+    """
+    snapshots, errors = fan_out_regions(describe_whitelist_security_groups)
+    rules = []
+    security_groups = []
+    for region in EC2_REGIONS:
+        for sg in snapshots.get(region, []):
+            security_groups.append({'region': region, 'security_group_id': sg['GroupId']})
+            for permission in sg.get('IpPermissions', []):
+                for ip_range in permission.get('IpRanges', []):
+                    description = ip_range.get('Description', '')
+                    if 'User:' not in description and parse_whitelist_rule_owner(description) is None:
+                        continue
+                    rule = parse_whitelist_audit_rule(description, ip_range.get('CidrIp', ''), permission.get('FromPort', 0))
+                    rules.append({'region': region, 'security_group_id': sg['GroupId'], **rule})
+    return rules, security_groups, errors
+
+
+def remove_whitelist_audit_rules(rules: list) -> tuple:
+    """
+    Revoke audit rules, each in its own region (blocking). The rule's CIDR
+    is revoked, not the IP from its description.
+
+    Returns:
+        tuple: (removed rules, error messages)
+    """
+    removed = []
+    errors = []
+    for rule in rules:
+        try:
+            ip = rule['cidr'].replace('/32', '')
+            if remove_ip_from_security_group(rule['security_group_id'], int(rule['port']), ip, rule['region']):
+                removed.append(rule)
+            else:
+                errors.append(f"Failed to remove {rule['ip']}:{rule['port']} in {rule['region']}")
+        except Exception as e:
+            errors.append(f"Error removing {rule.get('email', 'unknown')} in {rule['region']}: {e}")
+    return removed, errors
+
+
+def stream_whitelist_audit():
+    """
+    Yield NDJSON audit records for every user rule on the whitelist security
+    groups in every region.
+
+    Records:
+        {"type": "rule", "region", "security_group_id", "email", "ip", "port",
+         "cidr", "added", "description", "status": "valid"|"orphaned", "orphan_reason"}
+        {"type": "summary", "security_group_ids", "security_groups", "region_errors",
+         "total_rules", "valid_rules", "orphaned_rules", "took_ms"}
+    """
+    started = time.time()
+    counts = {'total': 0, 'valid': 0, 'orphaned': 0}
+
+    try:
+        membership.ensure_loaded()
+        rules, security_groups, region_errors = collect_whitelist_audit_rules()
+        if region_errors and not security_groups:
+            raise RuntimeError('; '.join(f"{region}: {error}" for region, error in sorted(region_errors.items())))
+
+        for rule in rules:
+            reason = whitelist_rule_orphan_reason(rule['email'])
+            counts['total'] += 1
+            counts['orphaned' if reason else 'valid'] += 1
+            yield ndjson_line({
+                'type': 'rule',
+                **rule,
+                'status': 'orphaned' if reason else 'valid',
+                'orphan_reason': reason
+            })
+    except Exception as e:
+        print(f"[AUDIT] Streaming audit failed after {counts['total']} rules: {e}")
+        yield ndjson_line({'type': 'error', 'error': str(e), 'rules_sent': counts['total']})
+        return
+
+    yield ndjson_line({
+        'type': 'summary',
+        'security_group_ids': [sg['security_group_id'] for sg in security_groups],
+        'security_groups': security_groups,
+        'region_errors': region_errors,
+        'total_rules': counts['total'],
+        'valid_rules': counts['valid'],
+        'orphaned_rules': counts['orphaned'],
+        'took_ms': round((time.time() - started) * 1000, 1)
+    })
+
+
+def stream_cognito_users(prefix: str = ''):
+    """
+    Yield NDJSON user records straight from list_users pages.
+
+    Groups and last login come from the membership model (loaded once up
+    front - never a per-user group lookup). If the model can't be loaded, or
+    a user isn't in it yet, that user's groups are null and last_login is the
+    modification date; the export itself carries on.
+
+    Args:
+        prefix: Optional email prefix (Cognito server-side filter)
+
+    Records:
+        {"type": "user", "username", "email", "status", "enabled", "groups", "last_login"}
+        {"type": "summary", "total_users", "took_ms"}
+    """
+    started = time.time()
+    total = 0
+
+    kwargs = {'UserPoolId': USER_POOL_ID, 'AttributesToGet': ['email']}
+    prefix = re.sub(r'[^A-Za-z0-9@._+-]', '', prefix)
+    if prefix:
+        kwargs['Filter'] = f'email ^= "{prefix}"'
+
+    try:
+        membership.ensure_loaded()
+    except Exception as e:
+        print(f"[USERS] Membership unavailable, exporting users without groups: {e}")
+
+    try:
+        for page in cognito_client.get_paginator('list_users').paginate(**kwargs):
+            for user in page['Users']:
+                record = MembershipModel._record_from_cognito(user)
+                known = membership.get_user(record['username'])
+                total += 1
+                yield ndjson_line({
+                    'type': 'user',
+                    'username': record['username'],
+                    'email': record['email'],
+                    'status': record['status'],
+                    'enabled': record['enabled'],
+                    'groups': membership.groups_for(record['username']) if known else None,
+                    'last_login': known['last_login'] if known else record['last_login']
+                })
+    except Exception as e:
+        print(f"[USERS] Streaming user export failed after {total} users: {e}")
+        yield ndjson_line({'type': 'error', 'error': str(e), 'users_sent': total})
+        return
+
+    yield ndjson_line({
+        'type': 'summary',
+        'total_users': total,
+        'took_ms': round((time.time() - started) * 1000, 1)
+    })
+
+
+# ============================================================================
+# BULK USER PROVISIONING
+# ============================================================================
+# /api/users/bulk creates, deletes or regroups a whole batch of users. The
+# batch is validated completely before any Cognito call; rows then run on a
+# bounded worker pool whose Cognito calls share a token-bucket rate limit
+# (Cognito's admin APIs throttle per account). Per-row results stream back as
+# NDJSON; the membership model is updated once, after the last row.
+
+BULK_ACTIONS = ('create', 'delete', 'reassign')
+BULK_MAX_ROWS = int(os.environ.get('BULK_MAX_ROWS', '1000'))
+BULK_WORKERS = int(os.environ.get('BULK_WORKERS', '8'))
+BULK_CALLS_PER_SECOND = float(os.environ.get('BULK_CALLS_PER_SECOND', '10'))
+EMAIL_PATTERN = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+bulk_executor = ThreadPoolExecutor(max_workers=BULK_WORKERS, thread_name_prefix='bulk-users')
+
+
+class RateLimiter:
+    """Token bucket shared by worker threads: acquire() blocks until a call is allowed."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+def parse_bulk_rows(body: bytes, content_type: str, action: Optional[str]) -> tuple:
+    """
+    Parse a bulk request body.
+
+    CSV (text/csv): header row with 'email' and optional 'groups' columns;
+    groups within a cell are separated by ';' or '|'. The action comes from
+    the ?action= query parameter.
+    JSON: {"action": "...", "users": [{"email": ..., "groups": [...]}]} or a
+    bare list of user objects.
+
+    Returns:
+        tuple: (action, [{'row': n, 'email': str, 'groups': list}])
+
+    Raises:
+        ValueError: Unreadable body or missing email column
+    """
+    if content_type.startswith('text/csv'):
+        reader = csv.DictReader(io.StringIO(body.decode('utf-8-sig')))
+        fields = {name.strip().lower(): name for name in (reader.fieldnames or [])}
+        if 'email' not in fields:
+            raise ValueError("CSV needs a header row with an 'email' column")
+        rows = []
+        for record in reader:
+            cell = record.get(fields['groups'], '') if 'groups' in fields else ''
+            rows.append({
+                'email': (record.get(fields['email']) or '').strip(),
+                'groups': [g.strip() for g in re.split(r'[;|]', cell or '') if g.strip()]
+            })
+    else:
+        try:
+            data = json.loads(body or b'null')
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if isinstance(data, dict):
+            action = data.get('action', action)
+            data = data.get('users')
+        if not isinstance(data, list):
+            raise ValueError("Expected a list of users")
+        rows = []
+        for record in data:
+            record = record if isinstance(record, dict) else {'email': record}
+            groups = record.get('groups') or []
+            rows.append({
+                'email': str(record.get('email') or '').strip(),
+                'groups': [str(g).strip() for g in (groups if isinstance(groups, list) else [groups]) if str(g).strip()]
+            })
+
+    for number, row in enumerate(rows, start=1):
+        row['row'] = number
+        row['email'] = row['email'].lower()
+    return action or 'create', rows
+
+
+def validate_bulk_rows(action: str, rows: list, admin_email: str) -> list:
+    """
+    Check a whole batch against the membership model before touching Cognito.
+
+    Returns:
+        list: [{'row', 'email', 'error'}] - empty when the batch is valid
+    """
+    if action not in BULK_ACTIONS:
+        return [{'row': None, 'email': None, 'error': f"action must be one of {', '.join(BULK_ACTIONS)}"}]
+    if not rows:
+        return [{'row': None, 'email': None, 'error': 'Batch is empty'}]
+    if len(rows) > BULK_MAX_ROWS:
+        return [{'row': None, 'email': None, 'error': f"Batch has {len(rows)} rows (max {BULK_MAX_ROWS})"}]
+
+    known_groups = set(membership.group_names())
+    seen = set()
+    errors = []
+    for row in rows:
+        email = row['email']
+        problem = None
+        if not EMAIL_PATTERN.fullmatch(email):
+            problem = 'Invalid email format'
+        elif email in seen:
+            problem = 'Duplicate email in batch'
+        elif action == 'create' and membership.find_username(email):
+            problem = 'User already exists'
+        elif action != 'create' and not membership.find_username(email):
+            problem = 'User not found'
+        elif action == 'delete' and email == admin_email.lower():
+            problem = 'Cannot delete your own account'
+        elif action == 'reassign' and email == admin_email.lower() and 'admins' not in row['groups']:
+            problem = 'Cannot remove your own admins membership'
+        elif action != 'delete' and set(row['groups']) - known_groups:
+            problem = f"Unknown groups: {', '.join(sorted(set(row['groups']) - known_groups))}"
+        seen.add(email)
+        if problem:
+            errors.append({'row': row['row'], 'email': email, 'error': problem})
+    return errors
+
+
+def run_bulk_row(action: str, row: dict, limiter: RateLimiter) -> tuple:
+    """
+    Apply one validated row in Cognito.
+
+    Returns:
+        tuple: (result record, membership changes for the calls that succeeded)
+    """
+    email = row['email']
+    username = membership.find_username(email) or email
+    result = {'type': 'row', 'row': row['row'], 'email': email, 'action': action, 'ok': True}
+    changes = []
+
+    try:
+        if action == 'delete':
+            limiter.acquire()
+            call_with_budget(cognito_breaker, cognito_client.admin_delete_user,
+                             UserPoolId=USER_POOL_ID, Username=username)
+            changes.append(('remove_user', username))
+            return result, changes
+
+        if action == 'create':
+            limiter.acquire()
+            username = admin_create_passwordless_user(email)
+            changes.append(('add_user', username, email))
+            to_add, to_remove = row['groups'], []
+        else:
+            current = set(membership.groups_for(username))
+            to_add = sorted(set(row['groups']) - current)
+            to_remove = sorted(current - set(row['groups']))
+
+        for group_name in to_add:
+            limiter.acquire()
+            call_with_budget(cognito_breaker, cognito_client.admin_add_user_to_group,
+                             UserPoolId=USER_POOL_ID, Username=username, GroupName=group_name)
+            changes.append(('add_to_group', username, group_name))
+        for group_name in to_remove:
+            limiter.acquire()
+            call_with_budget(cognito_breaker, cognito_client.admin_remove_user_from_group,
+                             UserPoolId=USER_POOL_ID, Username=username, GroupName=group_name)
+            changes.append(('remove_from_group', username, group_name))
+        result['groups_added'] = to_add
+        result['groups_removed'] = to_remove
+    except Exception as e:
+        result.update({'ok': False, 'error': str(e)})
+    return result, changes
+
+
+def apply_late_bulk_row(future) -> None:
+    """Done-callback: apply a bulk row that finished after its stream was closed."""
+    try:
+        result, row_changes = future.result()
+    except Exception as e:
+        print(f"[BULK-USERS] Row failed after the stream closed: {e}")
+        return
+    membership.apply_changes(row_changes)
+    if row_changes:
+        request_whitelist_reconcile()
+
+
+def stream_bulk_results(action: str, rows: list, admin_email: str):
+    """
+    Run a validated batch and yield NDJSON: one record per row as it
+    finishes (completion order), then a summary.
+
+    Membership changes from every row are applied in one batch at the end,
+    followed by a single reconciler wake-up. If the client disconnects,
+    rows not started yet are cancelled; rows already running still finish in
+    Cognito, so their changes are applied as each completes (without
+    blocking whichever thread closes the stream).
+    """
+    started = time.time()
+    limiter = RateLimiter(BULK_CALLS_PER_SECOND)
+    futures = [bulk_executor.submit(run_bulk_row, action, row, limiter) for row in rows]
+
+    changes = []
+    collected = set()
+    failed = 0
+    try:
+        for future in as_completed(futures):
+            result, row_changes = future.result()
+            collected.add(future)
+            changes.extend(row_changes)
+            failed += 0 if result['ok'] else 1
+            yield ndjson_line(result)
+    finally:
+        # Also runs if the client disconnects - Cognito already has these changes
+        late = [future for future in futures if future not in collected and not future.cancel()]
+        membership.apply_changes(changes)
+        if changes:
+            request_whitelist_reconcile()
+        for future in late:
+            future.add_done_callback(apply_late_bulk_row)
+        print(f"[BULK-USERS] {datetime.utcnow().isoformat()} | ACTION: {action} | ADMIN: {admin_email} | ROWS: {len(rows)} | FAILED: {failed} | LATE: {len(late)}")
+
+    yield ndjson_line({
+        'type': 'summary',
+        'action': action,
+        'total_rows': len(rows),
+        'succeeded': len(rows) - failed,
+        'failed': failed,
+        'took_ms': round((time.time() - started) * 1000, 1)
+    })
+
+
+# ============================================================================
+# EC2 INVENTORY FEED
+# ============================================================================
+# Shared source for /api/ec2/stream (server-sent events). ONE background
+# poller scans the VibeCodeArea fleet in every EC2_REGIONS region concurrently
+# (per region: a describe_instances scan plus a single describe_security_groups
+# call for every attached group), diffs the result against the previous scan
+# and fans the changes out to per-connection asyncio queues. Instances are
+# keyed by (region, instance_id). Whitelist status is per viewer IP, so the
+# feed carries each instance's open CIDRs per port and every connection
+# derives its own port_80/port_443 flags locally. AWS load is the same for one
+# open tab or fifty, and the poller stops when nobody is connected.
+
+EC2_STREAM_POLL_SECONDS = int(os.environ.get('EC2_STREAM_POLL_SECONDS', '15'))
+EC2_STREAM_KEEPALIVE_SECONDS = 20
+EC2_STREAM_QUEUE_SIZE = 100
+
+
+def scan_ec2_region(region: str) -> dict:
+    """
+    Describe all VibeCodeArea instances in a region and the web ports open on each.
+
+    Raises on error so the feed never reports a failed scan as an empty fleet.
+
+    Returns:
+        dict: {(region, instance_id): {instance_id, instance_type, state, private_ip,
+               public_ip, name, area, region, open_cidrs: {port: sorted CIDRs}}}
+    """
+    client = get_ec2_client(region)
+    instances = {}
+    instance_sgs = {}
+    pages = client.get_paginator('describe_instances').paginate(
+        Filters=[{'Name': 'tag:VibeCodeArea', 'Values': ['*']}]
+    )
+    for page in pages:
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                tags = {t['Key']: t['Value'] for t in instance.get('Tags', [])}
+                instance_id = instance['InstanceId']
+                instances[(region, instance_id)] = {
+                    'instance_id': instance_id,
+                    'instance_type': instance['InstanceType'],
+                    'state': instance['State']['Name'],
+                    'private_ip': instance.get('PrivateIpAddress', 'N/A'),
+                    'public_ip': instance.get('PublicIpAddress', 'N/A'),
+                    'name': tags.get('Name', 'N/A'),
+                    'area': tags.get('VibeCodeArea', 'N/A'),
+                    'region': region
+                }
+                instance_sgs[(region, instance_id)] = [sg['GroupId'] for sg in instance.get('SecurityGroups', [])]
+
+    sg_ids = sorted({sg_id for ids in instance_sgs.values() for sg_id in ids})
+    security_groups = {}
+    if sg_ids:
+        for sg in client.describe_security_groups(GroupIds=sg_ids)['SecurityGroups']:
+            security_groups[sg['GroupId']] = sg
+
+    for key, record in instances.items():
+        open_cidrs = {port: set() for port in WHITELIST_PORTS}
+        for sg_id in instance_sgs[key]:
+            for permission in security_groups.get(sg_id, {}).get('IpPermissions', []):
+                if permission.get('IpProtocol') != 'tcp':
+                    continue
+                for port in WHITELIST_PORTS:
+                    if permission.get('FromPort', 0) <= port <= permission.get('ToPort', 0):
+                        open_cidrs[port].update(r['CidrIp'] for r in permission.get('IpRanges', []))
+        record['open_cidrs'] = {port: sorted(cidrs) for port, cidrs in open_cidrs.items()}
+
+    return instances
+
+
+def scan_ec2_inventory() -> tuple:
+    """
+    Scan every configured region concurrently (EC2_REGION_TIMEOUT per region).
+
+    Returns:
+        tuple: (instances {(region, instance_id): record}, errors {region: message})
+    """
+    results, errors = fan_out_regions(scan_ec2_region)
+    instances = {}
+    for region in EC2_REGIONS:
+        instances.update(results.get(region, {}))
+    return instances, errors
+
+
+def ec2_instance_view(record: dict, client_ip: str) -> dict:
+    """Shape a feed record like /api/ec2/instances does for one viewer IP."""
+    view = {k: v for k, v in record.items() if k != 'open_cidrs'}
+    for port in WHITELIST_PORTS:
+        cidrs = record['open_cidrs'].get(port, [])
+        # Same rule as security_groups_allow(): open to all or exact IP match
+        view[f'port_{port}_whitelisted'] = '0.0.0.0/0' in cidrs or client_ip in cidrs or f"{client_ip}/32" in cidrs
+    return view
+
+
+class Ec2InventoryFeed:
+    """
+    Background EC2 poller with diff fan-out to SSE subscribers.
+
+    Runs entirely on the event loop; only scan_ec2_inventory() runs in a
+    worker thread. self.instances is keyed by (region, instance_id).
+    Queue items are events:
+        {'type': 'snapshot'}                      - send the full state
+        {'type': 'upsert', 'instance': record}
+        {'type': 'remove', 'region': region, 'instance_id': id}
+        {'type': 'error', 'error': message}
+    """
+
+    def __init__(self):
+        self.instances = {}
+        self.loaded_at = None
+        self.subscribers = set()
+        self.scans = 0
+        self._task = None
+        self._wakeup = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=EC2_STREAM_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self.loaded_at is not None:
+            queue.put_nowait({'type': 'snapshot'})
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.discard(queue)
+
+    def poke(self) -> None:
+        """Rescan now instead of waiting for the next poll (after launch/tag)."""
+        access_manifests.invalidate_inventory()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def announce_launch(self, result_data: dict) -> None:
+        """Push a just-launched instance before EC2 lists it, then rescan."""
+        record = {
+            'instance_id': result_data['instance_id'],
+            'instance_type': result_data.get('type', 'N/A'),
+            'state': 'pending',
+            'private_ip': result_data.get('private_ip', 'N/A'),
+            'public_ip': 'N/A',
+            'name': result_data.get('name', 'N/A'),
+            'area': result_data.get('area', 'N/A'),
+            'region': AWS_REGION,  # launches always go to the portal's region
+            'open_cidrs': {port: [] for port in WHITELIST_PORTS}
+        }
+        key = (AWS_REGION, record['instance_id'])
+        if self.loaded_at is not None and key not in self.instances:
+            self.instances[key] = record
+            self._publish({'type': 'upsert', 'instance': record})
+        self.poke()
+
+    def _publish(self, event: dict) -> None:
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow client - drop its backlog and resend the full state
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({'type': 'snapshot'})
+
+    async def refresh(self) -> None:
+        """
+        Scan once and publish the differences.
+
+        Raises:
+            RuntimeError: No region could be scanned (the last state is kept)
+        """
+        current, errors = await asyncio.to_thread(scan_ec2_inventory)
+        self.scans += 1
+
+        # A failed or slow region keeps its last known instances
+        for region, error in sorted(errors.items()):
+            print(f"[EC2-FEED] Scan failed in {region}: {error}")
+            self._publish({'type': 'error', 'error': f"{region}: {error}"})
+            current.update({key: record for key, record in self.instances.items() if key[0] == region})
+
+        if len(errors) == len(EC2_REGIONS):
+            raise RuntimeError(f"EC2 scan failed in every region ({'; '.join(f'{r}: {e}' for r, e in sorted(errors.items()))})")
+
+        if self.loaded_at is None:
+            self.instances = current
+            self.loaded_at = time.time()
+            self._publish({'type': 'snapshot'})
+            return
+
+        previous = self.instances
+        self.instances = current
+        self.loaded_at = time.time()
+        for key, record in current.items():
+            if previous.get(key) != record:
+                self._publish({'type': 'upsert', 'instance': record})
+        for region, instance_id in previous.keys() - current.keys():
+            self._publish({'type': 'remove', 'region': region, 'instance_id': instance_id})
+
+    async def _run(self) -> None:
+        print(f"[EC2-FEED] Poller started (every {EC2_STREAM_POLL_SECONDS}s)")
+        try:
+            while self.subscribers:
+                self._wakeup.clear()
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    # Region errors were already published; keep polling
+                    print(f"[EC2-FEED] {e}")
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=EC2_STREAM_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Nobody watching - drop state so the next viewer starts from a fresh scan
+            self._task = None
+            self.loaded_at = None
+            self.instances = {}
+            print("[EC2-FEED] Poller stopped (no subscribers)")
+
+
+ec2_feed = Ec2InventoryFeed()
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+# ============================================================================
+# ACCESS MANIFEST
+# ============================================================================
+# One precomputed answer to "what can this user reach from this IP":
+# - the user's area groups
+# - the area pages, each with the instance it opens
+# - every VibeCodeArea instance, with per-port whitelist status for the IP
+#   and an SSM URL when the user's groups reach it
+# home, /areas/*, /ec2-resources and /api/me/access all read it, so a page
+# navigation is one cache lookup once the manifest is built.
+#
+# Manifests are cached per (email, client IP). Each carries a stamp of the
+# user's groups (token and membership model) and the inventory version, and is
+# rebuilt when any of those change - other users' membership changes leave it
+# alone. The inventory uses the same per-region scan as the EC2 feed
+# (describe_instances plus one describe_security_groups per region). It is
+# rescanned every ACCESS_INVENTORY_TTL seconds, and as soon as the portal
+# itself changes whitelist rules or launches or tags an instance. Rescans run
+# in a background thread while requests keep getting the previous snapshot;
+# only the very first scan is waited for. The inventory version moves only
+# when the scan result differs.
+
+ACCESS_INVENTORY_TTL = int(os.environ.get('ACCESS_INVENTORY_TTL', '30'))
+ACCESS_MANIFEST_MAX = 5000
+
+# Area pages: group -> (title, description, redirect to the area's instance via SSM)
+AREA_PAGES = {
+    'engineering': ('Engineering', 'Welcome to the Engineering area. Access to technical resources and documentation.', True),
+    'hr': ('Human Resources', 'Welcome to the HR area. Access to employee resources and policies.', True),
+    'automation': ('Automation', 'Welcome to the Automation area. Access to automation tools and scripts.', False),
+    'product': ('Product', 'Welcome to the Product area. Access to product roadmaps and specifications.', True),
+}
+
+
+def build_access_manifest(email: str, groups: list, client_ip: str, inventory: dict, inventory_version: int, inventory_stale: bool) -> dict:
+    """
+    Build a user's access manifest from an inventory snapshot (no AWS calls).
+
+    Args:
+        email: User email
+        groups: User's Cognito groups
+        client_ip: Client IP the whitelist status is computed for
+        inventory: {(region, instance_id): feed record with open_cidrs}
+        inventory_version: Version of that snapshot
+        inventory_stale: True if some region could not be scanned
+
+    Returns:
+        dict: {email, client_ip, groups, area_groups, areas, instances,
+               inventory_version, inventory_stale, generated_at}
+    """
+    instances = []
+    for record in inventory.values():
+        view = ec2_instance_view(record, client_ip)
+        view['reachable'] = record['area'] in groups
+        view['ssm_url'] = build_ssm_url(record['instance_id'], record['region']) if view['reachable'] else None
+        instances.append(view)
+
+    areas = []
+    for group in groups:
+        if group not in AREA_PAGES:
+            continue
+        instance = next((i for i in instances if i['area'] == group), None)
+        areas.append({
+            'name': group.title(),
+            'group': group,
+            'url': f"/areas/{group}",
+            'instance': {k: instance[k] for k in ('instance_id', 'state', 'region', 'ssm_url')} if instance else None
+        })
+
+    return {
+        'email': email,
+        'client_ip': client_ip,
+        'groups': list(groups),
+        'area_groups': sorted(g for g in groups if g not in SYSTEM_GROUPS),
+        'areas': areas,
+        'instances': instances,
+        'inventory_version': inventory_version,
+        'inventory_stale': inventory_stale,
+        'generated_at': datetime.utcnow().isoformat()
+    }
+
+
+class AccessManifestService:
+    """
+    Cached access manifests over a shared EC2 inventory snapshot.
+
+    lookup() is the fast path - an up-to-date cached manifest or None, with
+    no I/O. get() builds the manifest, so call it from a worker thread: it
+    blocks on AWS only for the first inventory scan. Both start a background
+    rescan when the inventory is due and answer from the current snapshot.
+    """
+
+    def __init__(self):
+        # (version, {(region, instance_id): record}, stale) - replaced as a whole
+        self.snapshot = (0, {}, False)
+        self.loaded_at = None       # time.monotonic() of the last scan
+        self.dirty = False
+        self.manifests = OrderedDict()   # (email, client_ip) -> (stamp, manifest)
+        self.scans = 0
+        self.builds = 0
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+
+    def invalidate_inventory(self) -> None:
+        """Rescan on next use (the portal changed rules or instances)."""
+        self.dirty = True
+
+    def inventory_due(self) -> bool:
+        return self.loaded_at is None or self.dirty or time.monotonic() - self.loaded_at >= ACCESS_INVENTORY_TTL
+
+    def refresh_in_background(self) -> None:
+        """Start refresh_inventory() in a daemon thread if due and no scan is running."""
+        if self.inventory_due() and not self._scan_lock.locked():
+            threading.Thread(target=self.refresh_inventory, daemon=True).start()
+
+    def refresh_inventory(self) -> None:
+        """Scan every region once; concurrent callers wait for the same scan."""
+        with self._scan_lock:
+            if not self.inventory_due():
+                return
+            self.dirty = False
+            current, errors = scan_ec2_inventory()
+            self.scans += 1
+
+            version, previous, _ = self.snapshot
+            for region, error in sorted(errors.items()):
+                print(f"[ACCESS] Inventory scan failed in {region}: {error}")
+                # A failed region keeps its last known instances
+                current.update({key: record for key, record in previous.items() if key[0] == region})
+            if errors and len(errors) == len(EC2_REGIONS) and self.loaded_at is None:
+                return
+
+            stale = bool(errors)
+            if current != previous or stale != self.snapshot[2]:
+                self.snapshot = (version + 1, current, stale)
+            self.loaded_at = time.monotonic()
+
+    def _stamp(self, email: str, groups: list) -> tuple:
+        username = membership.find_username(email)
+        model_groups = tuple(membership.groups_for(username)) if username else ()
+        return (tuple(sorted(groups)), model_groups, self.snapshot[0])
+
+    def lookup(self, email: str, groups: list, client_ip: str) -> Optional[dict]:
+        """Cached manifest if nothing it depends on has changed, else None."""
+        if self.loaded_at is None:
+            return None
+        self.refresh_in_background()
+        key = (email, client_ip)
+        stamp = self._stamp(email, groups)
+        with self._lock:
+            entry = self.manifests.get(key)
+            if entry is None or entry[0] != stamp:
+                return None
+            self.manifests.move_to_end(key)
+            return entry[1]
+
+    def get(self, email: str, groups: list, client_ip: str) -> dict:
+        """
+        Cached or freshly built manifest.
+
+        If no scan has ever succeeded, the manifest has no instances, is
+        marked stale and is not cached, so pages still render from groups.
+        """
+        if self.loaded_at is None:
+            # Nothing to serve yet - wait for the first scan
+            self.refresh_inventory()
+            if self.loaded_at is None:
+                return build_access_manifest(email, groups, client_ip, {}, 0, True)
+
+        cached = self.lookup(email, groups, client_ip)
+        if cached is not None:
+            return cached
+
+        stamp = self._stamp(email, groups)
+        version, inventory, stale = self.snapshot
+        manifest = build_access_manifest(email, groups, client_ip, inventory, version, stale)
+        with self._lock:
+            self.manifests[(email, client_ip)] = (stamp, manifest)
+            self.manifests.move_to_end((email, client_ip))
+            while len(self.manifests) > ACCESS_MANIFEST_MAX:
+                self.manifests.popitem(last=False)
+            self.builds += 1
+        return manifest
+
+
+access_manifests = AccessManifestService()
+
+
+async def get_access_manifest(request: Request) -> dict:
+    """
+    The requesting user's access manifest (auth_middleware must have run).
+
+    A cache hit is answered on the event loop; a miss is built in a worker thread.
+    """
+    email, groups = require_auth(request)
+    client_ip = get_client_ip(request)
+    manifest = access_manifests.lookup(email, groups, client_ip)
+    if manifest is None:
+        manifest = await asyncio.to_thread(access_manifests.get, email, groups, client_ip)
+    if manifest['inventory_stale']:
+        mark_stale('ec2')
+    return manifest
+
+
+# ============================================================================
+# STARTUP WARM-UP AND READINESS
+# ============================================================================
+# On startup a background task fills what the first requests would otherwise
+# fetch cold: AWS credentials and pooled connections, the membership model,
+# the EC2 inventory (stale-fallback cache), the inventory feed's snapshot with
+# security-group rules, and the portal host's instance metadata. The ALB
+# health check targets /ready, which answers 503 until the warm-up finishes.
+# /health stays a cheap liveness check.
+#
+# Failed steps are retried with exponential backoff: until they succeed for
+# required components (so a credentials error at boot doesn't hold /ready at
+# 503 forever), and up to WARMUP_RETRY_ATTEMPTS passes for the others.
+
+WARMUP_ON_STARTUP = os.environ.get('WARMUP_ON_STARTUP', 'true').lower() == 'true'
+WARMUP_TIMEOUT = float(os.environ.get('WARMUP_TIMEOUT', '30'))  # seconds, per component
+# Components that must succeed for /ready - the rest are reported but have
+# their own request-path fallbacks, so a failure doesn't hold traffic back
+REQUIRED_WARMUP_COMPONENTS = ('credentials',)
+WARMUP_RETRY_SECONDS = float(os.environ.get('WARMUP_RETRY_SECONDS', '2'))  # first retry delay, doubles
+WARMUP_RETRY_MAX_SECONDS = 60.0
+WARMUP_RETRY_ATTEMPTS = 5  # passes before giving up on optional components
+
+# state: pending -> warming -> ready | failed
+readiness = {'state': 'pending', 'started_at': None, 'finished_at': None, 'took_ms': None, 'components': {}}
+
+
+def aws_warmup_checks() -> dict:
+    """One cheap call per client the request path uses (Cognito and EC2 per region)."""
+    checks = {'cognito': lambda: cognito_client.list_groups(UserPoolId=USER_POOL_ID, Limit=1)}
+    for region in EC2_REGIONS:
+        checks[f'ec2:{region}'] = lambda region=region: get_ec2_client(region).describe_instances(
+            Filters=[{'Name': 'tag-key', 'Values': ['VibeCodeArea']}], MaxResults=5
+        )
+    return checks
+
+
+def require_instance_metadata() -> None:
+    if not get_current_instance_info():
+        raise RuntimeError('instance metadata unavailable')
+
+
+async def warm_component(name: str, coro) -> None:
+    """Await one warm-up step, recording its outcome and timing in readiness."""
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(coro, timeout=WARMUP_TIMEOUT)
+        result = {'ok': True}
+    except asyncio.TimeoutError:
+        result = {'ok': False, 'error': f"timed out after {WARMUP_TIMEOUT}s"}
+    except Exception as e:
+        result = {'ok': False, 'error': str(e)}
+    result['ms'] = round((time.perf_counter() - started) * 1000, 1)
+    readiness['components'][name] = result
+
+
+def warmup_steps() -> dict:
+    """Step name -> callable returning a fresh awaitable, for the steps after the AWS clients."""
+    return {
+        'memberships': lambda: asyncio.to_thread(membership.ensure_loaded),
+        'ec2_inventory': lambda: asyncio.to_thread(get_instances_by_tag),
+        'security_groups': ec2_feed.refresh,
+        'instance_metadata': lambda: asyncio.to_thread(require_instance_metadata),
+    }
+
+
+async def run_startup_warmup(only: Optional[set] = None) -> set:
+    """
+    Warm every component (or only the steps named in only), then mark the
+    process ready (or failed).
+
+    AWS clients go first - as the 'aws_clients' step, which reports the
+    credentials and one component per client - so the other steps reuse
+    resolved credentials and open connections; the remaining steps run
+    concurrently.
+
+    Returns:
+        set: Names of the steps that failed (for warm_up_until_ready to retry)
+    """
+    started = time.perf_counter()
+    if only is None:
+        readiness.update({'state': 'warming', 'started_at': datetime.utcnow().isoformat(), 'components': {}})
+    steps = warmup_steps()
+
+    if only is None or 'aws_clients' in only:
+        try:
+            clients = await asyncio.wait_for(asyncio.to_thread(warm_up, aws_warmup_checks()), timeout=WARMUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            clients = {'credentials': {'ok': False, 'error': f"timed out after {WARMUP_TIMEOUT}s"}}
+        readiness['components'].update(clients)
+        client_names = set(clients)
+    else:
+        client_names = set()
+
+    await asyncio.gather(*(
+        warm_component(name, step()) for name, step in steps.items() if only is None or name in only
+    ))
+
+    components = readiness['components']
+    failed = {name for name in steps if not components.get(name, {}).get('ok')}
+    if any(not components[name]['ok'] for name in client_names):
+        failed.add('aws_clients')
+
+    ready = all(components.get(name, {}).get('ok') for name in REQUIRED_WARMUP_COMPONENTS)
+    readiness.update({
+        'state': 'ready' if ready else 'failed',
+        'finished_at': datetime.utcnow().isoformat(),
+        'took_ms': round((time.perf_counter() - started) * 1000, 1)
+    })
+    summary = ', '.join(f"{name}={r['ms']}ms{'' if r['ok'] else ' FAILED'}" for name, r in components.items())
+    print(f"[WARMUP] {readiness['state']} in {readiness['took_ms']}ms ({summary})")
+    return failed
+
+
+async def warm_up_until_ready() -> None:
+    """
+    Run the warm-up, then retry the failed steps with exponential backoff
+    (WARMUP_RETRY_SECONDS doubling up to WARMUP_RETRY_MAX_SECONDS).
+
+    Retries continue while a required component is failing; once the process
+    is ready, optional steps get up to WARMUP_RETRY_ATTEMPTS passes in total.
+    """
+    failed = await run_startup_warmup()
+    delay = WARMUP_RETRY_SECONDS
+    attempts = 1
+    while failed:
+        if readiness['state'] == 'ready' and attempts >= WARMUP_RETRY_ATTEMPTS:
+            print(f"[WARMUP] Giving up on {', '.join(sorted(failed))} after {attempts} attempts")
+            return
+        print(f"[WARMUP] Retrying {', '.join(sorted(failed))} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+        attempts += 1
+        failed = await run_startup_warmup(only=failed)
+
+
+@app.on_event("startup")
+async def start_warmup():
+    """Start the warm-up in the background so /health answers while it runs."""
+    if WARMUP_ON_STARTUP:
+        app.state.warmup_task = asyncio.create_task(warm_up_until_ready())
+    else:
+        readiness.update({'state': 'ready', 'finished_at': datetime.utcnow().isoformat()})
+
+
+# ============================================================================
+# REQUEST PROFILER
+# ============================================================================
+# Opt-in sampling profiler for diagnosing slow routes in production. An
+# admin adds "X-Profile: 1" (or ?profile=1) to a request; PROFILE_SAMPLE_RATE
+# additionally profiles that fraction of all requests. While a profiled
+# request runs, a sampler thread records the stacks of the event loop thread
+# and of busy worker threads (to_thread, AWS calls) every
+# PROFILE_INTERVAL_MS. Stacks are written in collapsed ("folded") format -
+# one "frame;frame;frame count" line per stack - which flamegraph.pl and
+# speedscope read directly. The newest PROFILE_MAX_FILES profiles are kept
+# in PROFILE_DIR and listed at /admin/profiles.
+#
+# With no flag and a zero sample rate no sampler thread exists; the only
+# cost is the flag check for admin requests. Other requests in flight at the
+# same time also show up in a profile, so profile on a quiet instance when
+# the numbers matter.
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/opt/employee-portal/profiles')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))  # 0.0 - 1.0
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', '50'))
+PROFILE_MAX_DEPTH = 128
+PROFILE_ID_PATTERN = re.compile(r'[0-9T]+-[0-9a-f]{6}')
+# Never sampled - the ALB calls these every few seconds
+PROFILE_EXCLUDED_PATHS = ('/health', '/ready')
+
+# Innermost frames of a thread that is parked waiting for work
+PROFILE_IDLE_FRAMES = {
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+}
+
+profile_files_lock = threading.Lock()
+
+
+class RequestProfiler:
+    """
+    Samples thread stacks from a background thread until stopped.
+
+    stacks maps a collapsed stack ("thread;outer;...;inner") to its sample
+    count. Samples where the event loop is waiting are recorded as
+    "loop;(idle)" so awaited I/O still shows up as time; idle worker
+    threads are skipped.
+    """
+
+    def __init__(self, loop_thread_id: int, interval: float):
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = self._collapse(frame)
+                if thread_id == self.loop_thread_id:
+                    root = 'loop'
+                elif stack is None:
+                    continue
+                else:
+                    root = names.get(thread_id, 'thread').rstrip('0123456789_-') or 'thread'
+                key = root + ';' + (stack or '(idle)')
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    @staticmethod
+    def _collapse(frame) -> Optional[str]:
+        """Frame chain as "outer;...;inner", or None if the thread is idle."""
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in PROFILE_IDLE_FRAMES:
+            return None
+        frames = []
+        while frame is not None and len(frames) < PROFILE_MAX_DEPTH:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(frames))
+
+
+def profile_trigger(request: Request, groups: list) -> Optional[str]:
+    """
+    Decide whether to profile this request.
+
+    Returns:
+        str: 'requested' (admin flag), 'sampled' (PROFILE_SAMPLE_RATE) or None
+    """
+    if 'admins' in groups and (request.headers.get('X-Profile') == '1' or request.query_params.get('profile') == '1'):
+        return 'requested'
+    if PROFILE_SAMPLE_RATE and request.url.path not in PROFILE_EXCLUDED_PATHS and random.random() < PROFILE_SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+
+def save_profile(profile_id: str, stacks: dict, meta: dict) -> None:
+    """Write <id>.folded and <id>.json to PROFILE_DIR, dropping the oldest beyond PROFILE_MAX_FILES."""
+    with profile_files_lock:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, profile_id + '.folded'), 'w') as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(PROFILE_DIR, profile_id + '.json'), 'w') as f:
+            json.dump(meta, f)
+
+        # IDs start with a UTC timestamp, so name order is age order
+        ids = sorted(name[:-len('.json')] for name in os.listdir(PROFILE_DIR) if name.endswith('.json'))
+        for old_id in ids[:-PROFILE_MAX_FILES] if PROFILE_MAX_FILES > 0 else ids:
+            for suffix in ('.folded', '.json'):
+                try:
+                    os.remove(os.path.join(PROFILE_DIR, old_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+
+def list_profiles() -> list:
+    """Metadata of the stored profiles, newest first."""
+    profiles = []
+    with profile_files_lock:
+        if not os.path.isdir(PROFILE_DIR):
+            return profiles
+        for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(PROFILE_DIR, name)) as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+    return profiles
+
+
+async def call_next_profiled(request: Request, call_next, trigger: str):
+    """Run the rest of the request under a RequestProfiler and store the result."""
+    profiler = RequestProfiler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+    started = time.perf_counter()
+    profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        # stop() joins the sampler thread, which may be mid-sample - not on the loop
+        await asyncio.to_thread(profiler.stop)
+    duration_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    profile_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:6]}"
+    meta = {
+        'id': profile_id,
+        'created_at': datetime.utcnow().isoformat(),
+        'method': request.method,
+        'path': request.url.path,
+        'status': response.status_code,
+        'duration_ms': duration_ms,
+        'samples': profiler.samples,
+        'interval_ms': PROFILE_INTERVAL_MS,
+        'trigger': trigger,
+        'user': getattr(request.state, 'email', None)
+    }
+    try:
+        await asyncio.to_thread(save_profile, profile_id, profiler.stacks, meta)
+        response.headers['X-Profile-Id'] = profile_id
+        print(f"[PROFILER] {profile_id} | {request.method} {request.url.path} | {duration_ms}ms | {profiler.samples} samples | {trigger}")
+    except OSError as e:
+        print(f"[PROFILER] Could not save profile for {request.url.path}: {e}")
+    return response
+
+
+# ============================================================================
+# SESSIONS (REFRESH TOKENS)
+# ============================================================================
+# The ID token cookie (auth_token) lives one hour. The Cognito refresh token
+# is kept in a second HttpOnly cookie, Fernet-encrypted with a key derived
+# from CLIENT_SECRET, so auth_middleware can renew the ID token with
+# REFRESH_TOKEN_AUTH instead of sending the user back through the emailed
+# code flow (initiate_auth, three Lambdas, DynamoDB, SES).
+
+REFRESH_COOKIE = 'refresh_session'
+# Renew when the ID token has less than this many seconds left
+SESSION_REFRESH_WINDOW = int(os.environ.get('SESSION_REFRESH_WINDOW', '300'))
+# Match the app client's refresh token validity (Cognito default: 30 days)
+REFRESH_COOKIE_MAX_AGE = int(os.environ.get('REFRESH_COOKIE_DAYS', '30')) * 86400
+# Parallel requests near expiry reuse one refresh instead of each calling Cognito
+REFRESH_REUSE_SECONDS = 60
+
+session_cipher = Fernet(base64.urlsafe_b64encode(
+    hashlib.sha256(('refresh-session:' + CLIENT_SECRET).encode()).digest()
+))
+
+# sha256(refresh cookie) -> (id_token, new refresh cookie or None, refreshed_at)
+recent_refreshes = {}
+
+# email -> (ip, sorted groups) last applied by update_session_whitelist()
+session_whitelist_state = {}
+
+
+def seal_refresh_session(username: str, refresh_token: str) -> str:
+    """Encrypt the Cognito username and refresh token into a cookie value."""
+    return session_cipher.encrypt(json.dumps({'u': username, 'rt': refresh_token}).encode()).decode()
+
+
+def open_refresh_session(cookie: str) -> Optional[tuple]:
+    """
+    Decrypt a refresh cookie.
+
+    Returns:
+        tuple: (username, refresh_token) or None if tampered, foreign or too old
+    """
+    try:
+        data = json.loads(session_cipher.decrypt(cookie.encode(), ttl=REFRESH_COOKIE_MAX_AGE))
+        return data['u'], data['rt']
+    except (InvalidToken, ValueError, KeyError, TypeError):
+        return None
+
+
+def refresh_session(cookie: str) -> Optional[tuple]:
+    """
+    Get a fresh ID token for a refresh cookie via REFRESH_TOKEN_AUTH.
+
+    Returns:
+        tuple: (id_token, new refresh cookie or None) or None if the refresh failed
+    """
+    key = hashlib.sha256(cookie.encode()).hexdigest()
+    now = time.time()
+    cached = recent_refreshes.get(key)
+    if cached and now - cached[2] < REFRESH_REUSE_SECONDS:
+        return cached[0], cached[1]
+
+    session = open_refresh_session(cookie)
+    if not session:
+        return None
+    username, refresh_token = session
+
+    try:
+        response = cognito_client.initiate_auth(
+            AuthFlow='REFRESH_TOKEN_AUTH',
+            ClientId=CLIENT_ID,
+            AuthParameters={
+                'REFRESH_TOKEN': refresh_token,
+                'SECRET_HASH': get_secret_hash(username)
+            }
+        )
+    except Exception as e:
+        print(f"[SESSION] Refresh failed for {username}: {e}")
+        return None
+
+    result = response['AuthenticationResult']
+    # Only present when refresh token rotation is enabled on the app client
+    new_cookie = seal_refresh_session(username, result['RefreshToken']) if result.get('RefreshToken') else None
+
+    if len(recent_refreshes) > 1000:
+        for stale in [k for k, v in recent_refreshes.items() if now - v[2] >= REFRESH_REUSE_SECONDS]:
+            del recent_refreshes[stale]
+    recent_refreshes[key] = (result['IdToken'], new_cookie, now)
+
+    print(f"[SESSION] Refreshed ID token for {username}")
+    return result['IdToken'], new_cookie
+
+
+def set_session_cookies(response: Response, id_token: str, refresh_cookie: Optional[str] = None) -> None:
+    """Set the ID token cookie and, when given, the encrypted refresh cookie."""
+    response.set_cookie(
+        key="auth_token",
+        value=id_token,
+        httponly=True,
+        secure=True,
+        samesite="lax",
+        max_age=3600
+    )
+    if refresh_cookie:
+        response.set_cookie(
+            key=REFRESH_COOKIE,
+            value=refresh_cookie,
+            httponly=True,
+            secure=True,
+            samesite="lax",
+            max_age=REFRESH_COOKIE_MAX_AGE
+        )
+
+
+def forget_refresh_session(cookie: str) -> None:
+    """
+    Drop cached refresh results for a cookie so a replayed copy can't be
+    served a cached ID token. Also drops the entry that handed this cookie
+    out as a rotated replacement.
+    """
+    key = hashlib.sha256(cookie.encode()).hexdigest()
+    recent_refreshes.pop(key, None)
+    for previous in [k for k, v in list(recent_refreshes.items()) if v[1] == cookie]:
+        recent_refreshes.pop(previous, None)
+
+
+def revoke_refresh_session(cookie: str) -> None:
+    """Best-effort revoke of the refresh token behind a cookie (logout)."""
+    forget_refresh_session(cookie)
+    session = open_refresh_session(cookie)
+    if not session:
+        return
+    try:
+        cognito_client.revoke_token(Token=session[1], ClientId=CLIENT_ID, ClientSecret=CLIENT_SECRET)
+    except Exception as e:
+        print(f"[SESSION] Refresh token revoke failed for {session[0]}: {e}")
+
+
+def apply_login_whitelist(email: str, user_groups: list, client_ip: str) -> bool:
+    """
+    Add or revoke the user's IP based on their area groups.
+
+    Returns:
+        bool: True if the whitelist calls ran (even with partial failures), False on error
+    """
+    try:
+        # Filter out system groups to get area groups (groups that grant instance access)
+        area_groups = [g for g in user_groups if g not in SYSTEM_GROUPS]
+
+        if not area_groups:
+            # User has NO area groups (only system groups like 'admins')
+            # Revoke all instance access by removing IP from security group
+            print(f"[IP-REVOKE] {datetime.utcnow().isoformat()} | USER: {email} | REASON: no_area_groups | USER_GROUPS: {user_groups}")
+
+            revoke_result = revoke_user_ip_from_all_instances(email)
+
+            if revoke_result['success']:
+                if revoke_result['user_ip']:
+                    print(f"[IP-REVOKE] {datetime.utcnow().isoformat()} | USER: {email} | IP: {revoke_result['user_ip']} | PORTS: {revoke_result['ports_revoked']} | STATUS: success")
+                else:
+                    print(f"[IP-REVOKE] {datetime.utcnow().isoformat()} | USER: {email} | STATUS: no_ip_found (nothing to revoke)")
+            else:
+                print(f"[IP-REVOKE] {datetime.utcnow().isoformat()} | USER: {email} | STATUS: failed")
+                for error in revoke_result.get('errors', []):
+                    print(f"  Error: {error}")
+
+        else:
+            # User HAS area groups - whitelist IP on matching instances and revoke from lost access
+            print(f"[IP-WHITELIST] {datetime.utcnow().isoformat()} | USER: {email} | AREA_GROUPS: {area_groups}")
+
+            whitelist_result = whitelist_user_ip_on_instances(email, user_groups, client_ip)
+
+            if whitelist_result['success']:
+                print(f"[IP-WHITELIST] {datetime.utcnow().isoformat()} | USER: {email} | IP: {client_ip} | INSTANCES_ADDED: {len(whitelist_result['instances_updated'])} | INSTANCES_REVOKED: {len(whitelist_result.get('instances_revoked', []))} | STATUS: success")
+                if whitelist_result.get('old_ip_removed'):
+                    print(f"  Replaced old IP: {whitelist_result['old_ip_removed']}")
+                if whitelist_result.get('instances_revoked'):
+                    print(f"  Revoked access from: {whitelist_result['instances_revoked']}")
+            else:
+                print(f"[IP-WHITELIST] {datetime.utcnow().isoformat()} | USER: {email} | IP: {client_ip} | STATUS: partial_failure")
+                print(f"  Updated: {len(whitelist_result['instances_updated'])}, Revoked: {len(whitelist_result.get('instances_revoked', []))}, Failed: {len(whitelist_result['instances_failed'])}")
+                for error in whitelist_result.get('errors', []):
+                    print(f"  Error: {error}")
+
+        return True
+
+    except Exception as e:
+        # Don't fail login on whitelist/revoke errors - log and continue
+        print(f"[IP-WHITELIST] {datetime.utcnow().isoformat()} | USER: {email} | IP: {client_ip} | STATUS: error | ERROR: {e}")
+        print("WARNING: User can login but IP whitelist/revocation may not be applied correctly. Admin review needed.")
+        return False
+
+
+async def update_session_whitelist(email: str, user_groups: list, client_ip: str, force: bool = False) -> None:
+    """
+    Whitelist a user's IP for a new or refreshed session.
+
+    Skipped when the IP and groups match what was last applied for this user,
+    so an hourly token refresh from the same network makes no EC2 calls.
+    force=True (full login) always re-applies, picking up new instances.
+    """
+    state = (client_ip, tuple(sorted(user_groups)))
+    if not force and session_whitelist_state.get(email) == state:
+        return
+
+    # Remember the IP for the background reconciler
+    with last_known_ips_lock:
+        last_known_ips[email] = client_ip
+
+    if not WHITELIST_ON_LOGIN and RECONCILER_ENABLED:
+        # The reconciler owns whitelisting - it just gets woken up
+        print(f"[IP-WHITELIST] {datetime.utcnow().isoformat()} | USER: {email} | IP: {client_ip} | STATUS: deferred_to_reconciler")
+        request_whitelist_reconcile()
+        session_whitelist_state[email] = state
+    elif await asyncio.to_thread(apply_login_whitelist, email, user_groups, client_ip):
+        session_whitelist_state[email] = state
+
+
+def validate_token(token: str) -> dict:
+    """Validate JWT token from cookie."""
+    try:
+        # Decode without verification (Cognito signed it, we trust it)
+        payload = jwt.decode(
+            token,
+            "",  # Empty key since we're not verifying signature
+            options={
+                "verify_signature": False,
+                "verify_aud": False,  # Skip audience validation
+                "verify_exp": True    # Still check expiration
+            }
+        )
+        return payload
+    except JWTError as e:
+        print(f"JWT decode error: {e}")
+        return None
+
+@app.middleware("http")
+async def auth_middleware(request: Request, call_next):
+    """Authentication middleware - checks JWT token in cookie."""
+    # Start the route's latency budget; collect stale fallbacks for the response header
+    budget = route_budget(request.url.path)
+    request_deadline.set(time.monotonic() + budget if budget is not None else None)
+    stale = set()
+    stale_dependencies.set(stale)
+
+    # Public paths - no auth required
+    public_paths = ["/login", "/verify-code", "/health", "/ready", "/logged-out"]
+
+    if request.url.path in public_paths:
+        trigger = profile_trigger(request, [])
+        response = await (call_next_profiled(request, call_next, trigger) if trigger else call_next(request))
+        if stale:
+            response.headers['X-Served-Stale'] = ','.join(sorted(stale))
+        return response
+
+    # Check for auth cookie
+    token = request.cookies.get("auth_token")
+    refresh_cookie = request.cookies.get(REFRESH_COOKIE)
+    if not token and not refresh_cookie:
+        return RedirectResponse(url="/login", status_code=302)
+
+    # Validate token
+    user_data = validate_token(token) if token else None
+
+    # Silently renew a missing, expired or nearly expired ID token
+    renewed = None
+    if refresh_cookie and (not user_data or user_data.get('exp', 0) - time.time() < SESSION_REFRESH_WINDOW):
+        renewed = await asyncio.to_thread(refresh_session, refresh_cookie)
+        if renewed:
+            user_data = validate_token(renewed[0])
+            if user_data:
+                await update_session_whitelist(
+                    user_data.get('email'),
+                    user_data.get('cognito:groups', []),
+                    get_client_ip(request)
+                )
+
+    if not user_data:
+        return RedirectResponse(url="/login", status_code=302)
 
     # Attach user data to request state
     request.state.user = user_data
@@ -1571,7 +4342,12 @@ async def auth_middleware(request: Request, call_next):
     # Extract and store client IP for whitelisting/audit purposes
     request.state.client_ip = get_client_ip(request)
 
-    response = await call_next(request)
+    trigger = profile_trigger(request, request.state.groups)
+    response = await (call_next_profiled(request, call_next, trigger) if trigger else call_next(request))
+    if renewed:
+        set_session_cookies(response, renewed[0], renewed[1])
+    if stale:
+        response.headers['X-Served-Stale'] = ','.join(sorted(stale))
     return response
 
 # ============================================================================
@@ -1580,9 +4356,29 @@ async def auth_middleware(request: Request, call_next):
 
 @app.get("/health")
 async def health():
-    """Health check endpoint (no auth required)."""
+    """Liveness check (no auth required) - never touches AWS or the caches."""
     return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness check for the ALB (no auth required).
+
+    Returns:
+        JSON: {status, started_at, finished_at, took_ms, components, circuits}
+              200 once the startup warm-up finished with every required
+              component ok, 503 while warming or if a required one failed
+    """
+    body = {
+        'status': readiness['state'],
+        'started_at': readiness['started_at'],
+        'finished_at': readiness['finished_at'],
+        'took_ms': readiness['took_ms'],
+        'components': readiness['components'],
+        'circuits': {b.name: b.state for b in [cognito_breaker, *ec2_breakers.values()]}
+    }
+    return JSONResponse(body, status_code=200 if readiness['state'] == 'ready' else 503)
+
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
     """Display passwordless login page (no auth required)."""
@@ -1652,68 +4448,20 @@ async def verify_code(
         client_ip = get_client_ip(request)
         print(f"Successful login: {email} from IP {client_ip} at {datetime.utcnow().isoformat()}")
 
-        # IP Whitelisting: Add or revoke user's IP based on group membership
-        try:
-            # Decode JWT to get groups
-            user_data = jwt.decode(
-                id_token, "",
-                options={"verify_signature": False, "verify_aud": False, "verify_exp": True}
-            )
-            user_groups = user_data.get('cognito:groups', [])
-
-            # Filter out system groups to get area groups (groups that grant instance access)
-            area_groups = [g for g in user_groups if g not in SYSTEM_GROUPS]
-
-            if not area_groups:
-                # User has NO area groups (only system groups like 'admins')
-                # Revoke all instance access by removing IP from security group
-                print(f"[IP-REVOKE] {datetime.utcnow().isoformat()} | USER: {email} | REASON: no_area_groups | USER_GROUPS: {user_groups}")
-
-                revoke_result = revoke_user_ip_from_all_instances(email)
-
-                if revoke_result['success']:
-                    if revoke_result['user_ip']:
-                        print(f"[IP-REVOKE] {datetime.utcnow().isoformat()} | USER: {email} | IP: {revoke_result['user_ip']} | PORTS: {revoke_result['ports_revoked']} | STATUS: success")
-                    else:
-                        print(f"[IP-REVOKE] {datetime.utcnow().isoformat()} | USER: {email} | STATUS: no_ip_found (nothing to revoke)")
-                else:
-                    print(f"[IP-REVOKE] {datetime.utcnow().isoformat()} | USER: {email} | STATUS: failed")
-                    for error in revoke_result.get('errors', []):
-                        print(f"  Error: {error}")
-
-            else:
-                # User HAS area groups - whitelist IP on matching instances and revoke from lost access
-                print(f"[IP-WHITELIST] {datetime.utcnow().isoformat()} | USER: {email} | AREA_GROUPS: {area_groups}")
-
-                whitelist_result = whitelist_user_ip_on_instances(email, user_groups, client_ip)
-
-                if whitelist_result['success']:
-                    print(f"[IP-WHITELIST] {datetime.utcnow().isoformat()} | USER: {email} | IP: {client_ip} | INSTANCES_ADDED: {len(whitelist_result['instances_updated'])} | INSTANCES_REVOKED: {len(whitelist_result.get('instances_revoked', []))} | STATUS: success")
-                    if whitelist_result.get('old_ip_removed'):
-                        print(f"  Replaced old IP: {whitelist_result['old_ip_removed']}")
-                    if whitelist_result.get('instances_revoked'):
-                        print(f"  Revoked access from: {whitelist_result['instances_revoked']}")
-                else:
-                    print(f"[IP-WHITELIST] {datetime.utcnow().isoformat()} | USER: {email} | IP: {client_ip} | STATUS: partial_failure")
-                    print(f"  Updated: {len(whitelist_result['instances_updated'])}, Revoked: {len(whitelist_result.get('instances_revoked', []))}, Failed: {len(whitelist_result['instances_failed'])}")
-                    for error in whitelist_result.get('errors', []):
-                        print(f"  Error: {error}")
+        membership.record_login(email)
 
-        except Exception as e:
-            # Don't fail login on whitelist/revoke errors - log and continue
-            print(f"[IP-WHITELIST] {datetime.utcnow().isoformat()} | USER: {email} | IP: {client_ip} | STATUS: error | ERROR: {e}")
-            print("WARNING: User can login but IP whitelist/revocation may not be applied correctly. Admin review needed.")
+        # Whitelist the login IP (or hand it to the reconciler)
+        user_data = validate_token(id_token) or {}
+        await update_session_whitelist(email, user_data.get('cognito:groups', []), client_ip, force=True)
 
-        # Create response and set secure cookie
+        # Create response and set secure cookies (ID token + encrypted refresh token)
         response = RedirectResponse(url="/", status_code=303)
-        response.set_cookie(
-            key="auth_token",
-            value=id_token,
-            httponly=True,
-            secure=True,
-            samesite="lax",
-            max_age=3600
-        )
+        refresh_token = auth_response['AuthenticationResult'].get('RefreshToken')
+        refresh_cookie = None
+        if refresh_token:
+            # SECRET_HASH for REFRESH_TOKEN_AUTH uses the Cognito username
+            refresh_cookie = seal_refresh_session(user_data.get('cognito:username', email), refresh_token)
+        set_session_cookies(response, id_token, refresh_cookie)
 
         return response
 
@@ -1728,16 +4476,22 @@ async def verify_code(
         })
 
 @app.get("/logout")
-async def logout():
-    """Logout endpoint that clears auth cookie."""
+async def logout(request: Request):
+    """Logout endpoint that clears auth cookies and revokes the refresh token."""
+    refresh_cookie = request.cookies.get(REFRESH_COOKIE)
+    if refresh_cookie:
+        await asyncio.to_thread(revoke_refresh_session, refresh_cookie)
+
     response = RedirectResponse(url="/logged-out", status_code=302)
     response.delete_cookie("auth_token")
+    response.delete_cookie(REFRESH_COOKIE)
     return response
 
 @app.get("/logout-and-reset")
 async def logout_and_reset(response: Response):
     """Logout endpoint (password reset removed - system is fully passwordless)."""
     response.delete_cookie("auth_token")
+    response.delete_cookie(REFRESH_COOKIE)
     return RedirectResponse(url="/logout", status_code=302)
 
 @app.get("/logged-out", response_class=HTMLResponse)
@@ -1800,157 +4554,155 @@ async def home(request: Request):
     """Home page showing logged-in user info."""
     email, groups = require_auth(request)
 
-    # Determine allowed areas based on groups
-    allowed_areas = []
-    area_map = {
-        "engineering": "/areas/engineering",
-        "hr": "/areas/hr",
-        "automation": "/areas/automation",
-        "product": "/areas/product"
-    }
-
-    for group in groups:
-        if group in area_map:
-            allowed_areas.append({"name": group.title(), "url": area_map[group]})
-
-    # Get client IP from request state (set by middleware)
-    client_ip = getattr(request.state, 'client_ip', 'unknown')
+    # Allowed areas and client IP come from the user's access manifest
+    manifest = await get_access_manifest(request)
 
     return templates.TemplateResponse("home.html", {
         "request": request,
         "email": email,
         "groups": groups,
-        "allowed_areas": allowed_areas,
-        "client_ip": client_ip
+        "allowed_areas": manifest['areas'],
+        "client_ip": manifest['client_ip']
     })
 
+@app.get("/api/me/access")
+async def my_access_api(request: Request):
+    """
+    The caller's access manifest.
+
+    Returns:
+        JSON: {email, client_ip, groups, area_groups,
+               areas: [{name, group, url, instance: {instance_id, state, region, ssm_url} or null}],
+               instances: [{instance_id, ..., area, region, port_80_whitelisted,
+                            port_443_whitelisted, reachable, ssm_url}],
+               inventory_version, inventory_stale, generated_at}
+    """
+    return JSONResponse(await get_access_manifest(request))
+
 @app.get("/directory", response_class=HTMLResponse)
 async def directory(request: Request):
-    """Directory page showing all Cognito users."""
+    """Directory page - rows are fetched from /api/directory/search by the page."""
     email, groups = require_auth(request)
 
-    # Fetch users from Cognito
-    cognito_users = list_cognito_users()
+    # Warm the index so the page's first search is answered locally
+    membership.load_in_background()
 
     return templates.TemplateResponse("directory.html", {
         "request": request,
         "email": email,
         "groups": groups,
-        "users": cognito_users,
         "is_admin": 'admins' in groups
     })
 
-@app.get("/areas/engineering", response_class=HTMLResponse)
-async def area_engineering(request: Request):
-    """Engineering area page - redirects to SSM if instance is mapped."""
-    email, groups = require_group(request, "engineering")
+@app.get("/api/directory/search")
+async def directory_search_api(request: Request):
+    """
+    Search the user directory by email prefix.
 
-    if not email:
-        return RedirectResponse(url="/denied")
+    Answered from the in-memory membership index; before it has loaded,
+    falls back to Cognito's server-side 'email ^= ...' filter (groups may
+    be null in that case). That filter returns a single page, so a request
+    reaching past COGNITO_LIST_USERS_MAX waits for the index instead of
+    returning a short page.
 
-    # Check for mapped EC2 instance
-    instance = get_instance_by_area("engineering")
-    if instance and instance['state'] == 'running':
-        ssm_url = build_ssm_url(instance['instance_id'])
-        return RedirectResponse(url=ssm_url, status_code=302)
-    elif instance and instance['state'] != 'running':
-        # Instance exists but not running
-        return templates.TemplateResponse("area.html", {
-            "request": request,
-            "email": email,
-            "groups": groups,
-            "area_name": "Engineering",
-            "area_description": f"EC2 instance is {instance['state']}. Please start it first or contact your administrator."
-        })
+    Query params:
+        q: Email prefix (optional)
+        limit: Page size (default 25, max 100)
+        offset: Results to skip (default 0)
 
-    # No mapped instance - show static page
-    return templates.TemplateResponse("area.html", {
-        "request": request,
-        "email": email,
-        "groups": groups,
-        "area_name": "Engineering",
-        "area_description": "Welcome to the Engineering area. Access to technical resources and documentation."
+    Returns:
+        JSON: {users, total, offset, limit, source, took_ms}
+    """
+    email, groups = require_auth(request)
+    started = time.perf_counter()
+
+    q = request.query_params.get('q', '').strip()
+    try:
+        limit = min(max(int(request.query_params.get('limit', 25)), 1), 100)
+        offset = max(int(request.query_params.get('offset', 0)), 0)
+    except ValueError:
+        return JSONResponse({'success': False, 'error': 'limit and offset must be integers'}, status_code=400)
+
+    # Refresh a missing/stale index off the request path
+    membership.load_in_background()
+
+    if not membership.is_loaded() and offset + limit > COGNITO_LIST_USERS_MAX:
+        try:
+            await asyncio.to_thread(membership.ensure_loaded)
+        except Exception as e:
+            return JSONResponse({'success': False, 'error': f"Directory search failed: {str(e)}"}, status_code=502)
+
+    if membership.is_loaded():
+        users, total = membership.search(q, limit=limit, offset=offset)
+        source = 'index'
+    else:
+        try:
+            matches = await asyncio.to_thread(search_cognito_users_by_prefix, q, offset + limit)
+        except Exception as e:
+            return JSONResponse({'success': False, 'error': f"Directory search failed: {str(e)}"}, status_code=502)
+        users, total = matches[offset:], None
+        source = 'cognito'
+
+    return JSONResponse({
+        'success': True,
+        'users': users,
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'source': source,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
     })
 
-@app.get("/areas/hr", response_class=HTMLResponse)
-async def area_hr(request: Request):
-    """HR area page - redirects to SSM if instance is mapped."""
-    email, groups = require_group(request, "hr")
+async def render_area_page(request: Request, group: str):
+    """
+    Area page for one group - redirects to SSM if the area's instance is running.
+
+    Uses the access manifest's entry for the area (no AWS calls on a cache hit).
+    """
+    email, groups = require_group(request, group)
 
     if not email:
         return RedirectResponse(url="/denied")
 
+    title, description, redirects = AREA_PAGES[group]
+    manifest = await get_access_manifest(request)
+    area = next((a for a in manifest['areas'] if a['group'] == group), None)
+    instance = area['instance'] if area and redirects else None
+
     # Check for mapped EC2 instance
-    instance = get_instance_by_area("hr")
     if instance and instance['state'] == 'running':
-        ssm_url = build_ssm_url(instance['instance_id'])
-        return RedirectResponse(url=ssm_url, status_code=302)
-    elif instance and instance['state'] != 'running':
+        return RedirectResponse(url=instance['ssm_url'], status_code=302)
+    elif instance:
         # Instance exists but not running
-        return templates.TemplateResponse("area.html", {
-            "request": request,
-            "email": email,
-            "groups": groups,
-            "area_name": "Human Resources",
-            "area_description": f"EC2 instance is {instance['state']}. Please start it first or contact your administrator."
-        })
+        description = f"EC2 instance is {instance['state']}. Please start it first or contact your administrator."
 
-    # No mapped instance - show static page
     return templates.TemplateResponse("area.html", {
         "request": request,
         "email": email,
         "groups": groups,
-        "area_name": "Human Resources",
-        "area_description": "Welcome to the HR area. Access to employee resources and policies."
+        "area_name": title,
+        "area_description": description
     })
 
+@app.get("/areas/engineering", response_class=HTMLResponse)
+async def area_engineering(request: Request):
+    """Engineering area page - redirects to SSM if instance is mapped."""
+    return await render_area_page(request, "engineering")
+
+@app.get("/areas/hr", response_class=HTMLResponse)
+async def area_hr(request: Request):
+    """HR area page - redirects to SSM if instance is mapped."""
+    return await render_area_page(request, "hr")
+
 @app.get("/areas/automation", response_class=HTMLResponse)
 async def area_automation(request: Request):
     """Automation area page."""
-    email, groups = require_group(request, "automation")
-
-    if not email:
-        return RedirectResponse(url="/denied")
-
-    return templates.TemplateResponse("area.html", {
-        "request": request,
-        "email": email,
-        "groups": groups,
-        "area_name": "Automation",
-        "area_description": "Welcome to the Automation area. Access to automation tools and scripts."
-    })
+    return await render_area_page(request, "automation")
 
 @app.get("/areas/product", response_class=HTMLResponse)
 async def area_product(request: Request):
     """Product area page - redirects to SSM if instance is mapped."""
-    email, groups = require_group(request, "product")
-
-    if not email:
-        return RedirectResponse(url="/denied")
-
-    # Check for mapped EC2 instance
-    instance = get_instance_by_area("product")
-    if instance and instance['state'] == 'running':
-        ssm_url = build_ssm_url(instance['instance_id'])
-        return RedirectResponse(url=ssm_url, status_code=302)
-    elif instance and instance['state'] != 'running':
-        # Instance exists but not running
-        return templates.TemplateResponse("area.html", {
-            "request": request,
-            "email": email,
-            "groups": groups,
-            "area_name": "Product",
-            "area_description": f"EC2 instance is {instance['state']}. Please start it first or contact your administrator."
-        })
-
-    # No mapped instance - show static page
-    return templates.TemplateResponse("area.html", {
-        "request": request,
-        "email": email,
-        "groups": groups,
-        "area_name": "Product",
-        "area_description": "Welcome to the Product area. Access to product roadmaps and specifications."
-    })
+    return await render_area_page(request, "product")
 
 @app.get("/denied", response_class=HTMLResponse)
 async def denied(request: Request):
@@ -1969,13 +4721,21 @@ async def denied(request: Request):
 # ADMIN ROUTES (Require 'admins' Group Membership)
 # ============================================================================
 
+def list_cognito_group_names() -> list:
+    """Every group name in the pool (one list_groups scan)."""
+    names = []
+    for page in cognito_client.get_paginator('list_groups').paginate(UserPoolId=USER_POOL_ID):
+        names.extend(group['GroupName'] for group in page['Groups'])
+    return names
+
+
 @app.get("/admin", response_class=HTMLResponse)
 async def admin_panel(request: Request):
     """
     Admin panel for managing Cognito users and group memberships.
 
     Features:
-    - List all Cognito users with their status and last login
+    - List all Cognito users (paged/searchable via /api/admin/users)
     - Create new users (passwordless - no email sent)
     - Delete users from Cognito
     - Add/remove users from groups (admins, engineering, hr, etc.)
@@ -1987,40 +4747,18 @@ async def admin_panel(request: Request):
         return RedirectResponse(url="/denied", status_code=303)
 
     try:
-        # List all users in the user pool
-        users_data = []
-        paginator = cognito_client.get_paginator('list_users')
-
-        for page in paginator.paginate(UserPoolId=USER_POOL_ID):
-            for user in page['Users']:
-                username = user['Username']
-                user_email = None
-                for attr in user.get('Attributes', []):
-                    if attr['Name'] == 'email':
-                        user_email = attr['Value']
-                        break
-
-                # Get groups for this user
-                user_groups = get_user_groups(username)
-
-                users_data.append({
-                    'username': username,
-                    'email': user_email,
-                    'groups': user_groups
-                })
-
-        # Get all available groups
-        all_groups = []
-        group_paginator = cognito_client.get_paginator('list_groups')
-        for page in group_paginator.paginate(UserPoolId=USER_POOL_ID):
-            for group in page['Groups']:
-                all_groups.append(group['GroupName'])
+        # First paint only needs the group list - user rows are loaded
+        # progressively by the page from /api/admin/users
+        if membership.is_loaded():
+            all_groups = membership.group_names()
+        else:
+            membership.load_in_background()
+            all_groups = await asyncio.to_thread(call_with_budget, cognito_breaker, list_cognito_group_names)
 
         response = templates.TemplateResponse("admin_panel.html", {
             "request": request,
             "email": email,
             "groups": groups,
-            "users": users_data,
             "all_groups": all_groups
         })
         # Prevent browser caching of admin panel
@@ -2050,14 +4788,15 @@ async def add_user_to_group(request: Request):
         username = form_data.get("username")
         group_name = form_data.get("group_name")
 
-        cognito_client.admin_add_user_to_group(
+        await asyncio.to_thread(
+            call_with_budget, cognito_breaker, cognito_client.admin_add_user_to_group,
             UserPoolId=USER_POOL_ID,
             Username=username,
             GroupName=group_name
         )
 
-        # Clear entire cache to ensure fresh data
-        group_cache.clear()
+        # Update membership model in place
+        membership.add_to_group(username, group_name)
 
         # Add timestamp to prevent browser caching
         import time as time_module
@@ -2082,14 +4821,15 @@ async def remove_user_from_group(request: Request):
         username = form_data.get("username")
         group_name = form_data.get("group_name")
 
-        cognito_client.admin_remove_user_from_group(
+        await asyncio.to_thread(
+            call_with_budget, cognito_breaker, cognito_client.admin_remove_user_from_group,
             UserPoolId=USER_POOL_ID,
             Username=username,
             GroupName=group_name
         )
 
-        # Clear entire cache to ensure fresh data
-        group_cache.clear()
+        # Update membership model in place
+        membership.remove_from_group(username, group_name)
 
         # Add timestamp to prevent browser caching
         import time as time_module
@@ -2120,7 +4860,7 @@ async def create_group_endpoint(request: Request):
                 status_code=303
             )
 
-        success, message = create_cognito_group(group_name, description)
+        success, message = await asyncio.to_thread(create_cognito_group, group_name, description)
 
         # Add timestamp to prevent browser caching
         import time as time_module
@@ -2170,7 +4910,8 @@ async def create_user(request: Request):
         temporary_password = 'Aa1!' + temporary_password
 
         # Create user
-        cognito_client.admin_create_user(
+        response = await asyncio.to_thread(
+            call_with_budget, cognito_breaker, cognito_client.admin_create_user,
             UserPoolId=USER_POOL_ID,
             Username=user_email,
             UserAttributes=[
@@ -2181,8 +4922,8 @@ async def create_user(request: Request):
             MessageAction='SUPPRESS'  # Don't send email, admin will provide password
         )
 
-        # Clear entire cache to ensure fresh data
-        group_cache.clear()
+        # Update membership model in place
+        membership.add_user(response['User']['Username'], user_email)
 
         # Add timestamp to prevent browser caching
         import time as time_module
@@ -2207,13 +4948,14 @@ async def delete_user(request: Request):
         username = form_data.get("username")
 
         # Delete user
-        cognito_client.admin_delete_user(
+        await asyncio.to_thread(
+            call_with_budget, cognito_breaker, cognito_client.admin_delete_user,
             UserPoolId=USER_POOL_ID,
             Username=username
         )
 
-        # Clear entire cache to ensure fresh data
-        group_cache.clear()
+        # Update membership model in place
+        membership.remove_user(username)
 
         # Add timestamp to prevent browser caching
         import time as time_module
@@ -2224,14 +4966,128 @@ async def delete_user(request: Request):
         timestamp = int(time_module.time())
         return RedirectResponse(url=f"/admin?error={str(e)}&t={timestamp}", status_code=303)
 
+def encode_table_cursor(key: tuple, version: int) -> str:
+    """Opaque cursor for a membership sort key, stamped with that order's sort version."""
+    return base64.urlsafe_b64encode(json.dumps([version] + list(key)).encode()).decode()
+
+
+def decode_table_cursor(cursor: str) -> Optional[tuple]:
+    """Inverse of encode_table_cursor(): (version, key), or None if malformed."""
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if (isinstance(value, list) and len(value) == 4 and isinstance(value[0], int)
+                and all(isinstance(k, str) for k in value[1:])):
+            return value[0], tuple(value[1:])
+    except Exception:
+        pass
+    return None
+
+
+@app.get("/api/admin/users")
+async def admin_users_api(request: Request):
+    """
+    Paged, searchable admin users table (admin only).
+
+    Query params:
+        q: Email prefix (case-insensitive)
+        sort: email | status | last_login | groups (default email)
+        order: asc | desc (default asc)
+        cursor: next_cursor from the previous page
+        limit: Page size (default 50, max USER_TABLE_MAX_LIMIT)
+
+    Email order pages stay consistent across membership changes. Other
+    orders move when what they sort on changes (a login only moves
+    last_login), so a cursor from an older sort version is rejected with 409
+    and the table restarts from the first page.
+
+    Returns:
+        JSON: {users, next_cursor, total, version}
+    """
+    email, groups = require_auth(request)
+    if 'admins' not in groups:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    params = request.query_params
+    sort = params.get('sort', 'email')
+    if sort not in USER_TABLE_SORT_KEYS:
+        return JSONResponse({'success': False, 'error': f"sort must be one of: {', '.join(USER_TABLE_SORT_KEYS)}"}, status_code=400)
+
+    cursor = None
+    cursor_version = None
+    if params.get('cursor'):
+        decoded = decode_table_cursor(params['cursor'])
+        if decoded is None:
+            return JSONResponse({'success': False, 'error': 'Invalid cursor'}, status_code=400)
+        cursor_version, cursor = decoded
+
+    try:
+        limit = min(max(int(params.get('limit', 50)), 1), USER_TABLE_MAX_LIMIT)
+    except ValueError:
+        return JSONResponse({'success': False, 'error': 'limit must be an integer'}, status_code=400)
+
+    try:
+        await asyncio.to_thread(membership.ensure_loaded)
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': f"Error loading users: {str(e)}"}, status_code=500)
+
+    if cursor is not None and sort != 'email' and cursor_version != membership.sort_versions[sort]:
+        return JSONResponse({'success': False, 'error': 'Users changed since the previous page', 'stale_cursor': True}, status_code=409)
+
+    version = membership.version
+    sort_version = membership.sort_versions[sort]
+    rows, next_cursor, total = membership.query(
+        prefix=params.get('q', '').strip(),
+        sort=sort,
+        descending=params.get('order') == 'desc',
+        cursor=cursor,
+        limit=limit
+    )
+
+    return JSONResponse({
+        'success': True,
+        'users': [{
+            'username': row['username'],
+            'email': row['email'],
+            'status': row['status'],
+            'enabled': row['enabled'],
+            'groups': row['groups'],
+            'last_login': row['last_login']
+        } for row in rows],
+        'next_cursor': encode_table_cursor(next_cursor, sort_version) if next_cursor else None,
+        'total': total,
+        'version': version
+    })
+
+@app.get("/api/admin/users/stream")
+async def admin_users_stream(request: Request):
+    """
+    Export every user as NDJSON (admin only), streamed page by page from Cognito.
+
+    Query params:
+        q: Optional email prefix
+
+    Returns:
+        NDJSON: one record per user, then a summary record
+    """
+    email, groups = require_auth(request)
+    if 'admins' not in groups:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return StreamingResponse(
+        stream_cognito_users(request.query_params.get('q', '').strip()),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
 # IP Whitelist Management Routes (Admin Only)
 @app.get("/admin/ip-whitelist-audit")
 async def audit_ip_whitelist(request: Request):
     """
     Audit IP whitelist rules and identify orphaned rules.
 
-    Returns all security group rules with user descriptions, cross-referenced
-    with current Cognito user group memberships.
+    Returns all security group rules with user descriptions in every
+    EC2_REGIONS region, cross-referenced with current Cognito user group
+    memberships. Regions that could not be described are listed in
+    region_errors.
 
     Returns:
         JSON with current rules, orphaned rules, users by IP
@@ -2241,101 +5097,39 @@ async def audit_ip_whitelist(request: Request):
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
-        # Get the vibecode-launched-instances security group
-        response = ec2_client.describe_security_groups(
-            Filters=[
-                {'Name': 'group-name', 'Values': ['vibecode-launched-instances']}
-            ]
-        )
+        current_rules, security_groups, region_errors = await asyncio.to_thread(collect_whitelist_audit_rules)
 
-        if not response['SecurityGroups']:
+        if not security_groups:
+            error = 'vibecode-launched-instances security group not found'
+            if region_errors:
+                error += ' (' + '; '.join(f"{region}: {e}" for region, e in sorted(region_errors.items())) + ')'
             return JSONResponse({
                 'success': False,
-                'error': 'vibecode-launched-instances security group not found'
+                'error': error
             })
 
-        sg = response['SecurityGroups'][0]
-        sg_id = sg['GroupId']
-
-        # Parse all rules to extract user information
-        current_rules = []
-        users_seen = set()
-
-        for permission in sg.get('IpPermissions', []):
-            protocol = permission.get('IpProtocol', '')
-            from_port = permission.get('FromPort', 0)
-            to_port = permission.get('ToPort', 0)
-
-            for ip_range in permission.get('IpRanges', []):
-                description = ip_range.get('Description', '')
-                cidr = ip_range.get('CidrIp', '')
+        users_seen = {rule['email'] for rule in current_rules if rule['email'] != 'Unknown'}
 
-                # Parse user email from description
-                if 'User:' in description:
-                    # Format: "User: email@capsule.com | IP: 73.158.64.21 | Port: 80 | Added: 2026-01-28T10:30:00Z"
-                    try:
-                        user_email = description.split('User:')[1].split('|')[0].strip()
-                        ip = description.split('IP:')[1].split('|')[0].strip()
-                        port = description.split('Port:')[1].split('|')[0].strip()
-                        added = description.split('Added:')[1].strip() if 'Added:' in description else 'Unknown'
-
-                        users_seen.add(user_email)
-
-                        current_rules.append({
-                            'email': user_email,
-                            'ip': ip,
-                            'port': port,
-                            'cidr': cidr,
-                            'added': added,
-                            'description': description
-                        })
-                    except Exception as parse_error:
-                        # Unparseable description - include as-is
-                        current_rules.append({
-                            'email': 'Unknown',
-                            'ip': cidr.replace('/32', ''),
-                            'port': str(from_port),
-                            'cidr': cidr,
-                            'added': 'Unknown',
-                            'description': description
-                        })
-
-        # Get current Cognito users and their groups
-        cognito_users = list_cognito_users()
+        # Cross-reference with Cognito group memberships
+        await asyncio.to_thread(membership.ensure_loaded)
 
         # Identify orphaned rules (user not in matching groups anymore)
         orphaned_rules = []
         valid_rules = []
 
         for rule in current_rules:
-            rule_email = rule['email']
-
-            # Find user in Cognito
-            user_found = None
-            for user in cognito_users:
-                if user['email'] == rule_email:
-                    user_found = user
-                    break
-
-            if not user_found:
-                # User doesn't exist in Cognito - orphaned
-                rule['orphan_reason'] = 'User not found in Cognito'
+            reason = whitelist_rule_orphan_reason(rule['email'])
+            if reason:
+                rule['orphan_reason'] = reason
                 orphaned_rules.append(rule)
             else:
-                # Check if user still has appropriate group membership
-                user_groups = user_found.get('groups', [])
-                # Filter out system groups to find area groups
-                area_groups = [g for g in user_groups if g not in SYSTEM_GROUPS]
-
-                if not area_groups:
-                    rule['orphan_reason'] = 'User has no area group memberships'
-                    orphaned_rules.append(rule)
-                else:
-                    valid_rules.append(rule)
+                valid_rules.append(rule)
 
         return JSONResponse({
             'success': True,
-            'security_group_id': sg_id,
+            'security_group_id': security_groups[0]['security_group_id'],
+            'security_groups': security_groups,
+            'region_errors': region_errors,
             'total_rules': len(current_rules),
             'valid_rules': len(valid_rules),
             'orphaned_rules': len(orphaned_rules),
@@ -2352,6 +5146,21 @@ async def audit_ip_whitelist(request: Request):
         }, status_code=500)
 
 
+@app.get("/admin/ip-whitelist-audit/stream")
+async def audit_ip_whitelist_stream(request: Request):
+    """
+    Streaming variant of /admin/ip-whitelist-audit (admin only).
+
+    Returns:
+        NDJSON: one record per user rule, then a summary record
+    """
+    email, groups = require_auth(request)
+    if 'admins' not in groups:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return StreamingResponse(stream_whitelist_audit(), media_type=NDJSON_MEDIA_TYPE)
+
+
 @app.post("/admin/cleanup-user-ip")
 async def cleanup_user_ip(request: Request):
     """
@@ -2372,52 +5181,21 @@ async def cleanup_user_ip(request: Request):
                 'error': 'Email parameter required'
             }, status_code=400)
 
-        # Get the vibecode-launched-instances security group
-        response = ec2_client.describe_security_groups(
-            Filters=[
-                {'Name': 'group-name', 'Values': ['vibecode-launched-instances']}
-            ]
-        )
+        # The user's rules in every region (login whitelists them in all EC2_REGIONS)
+        rules, security_groups, region_errors = await asyncio.to_thread(collect_whitelist_audit_rules)
 
-        if not response['SecurityGroups']:
+        if not security_groups and not region_errors:
             return JSONResponse({
                 'success': False,
                 'error': 'vibecode-launched-instances security group not found'
             })
 
-        sg = response['SecurityGroups'][0]
-        sg_id = sg['GroupId']
-
-        # Find all rules for this user
-        rules_to_remove = []
-
-        for permission in sg.get('IpPermissions', []):
-            from_port = permission.get('FromPort', 0)
-            to_port = permission.get('ToPort', 0)
-
-            for ip_range in permission.get('IpRanges', []):
-                description = ip_range.get('Description', '')
-
-                if f"User: {target_email}" in description:
-                    # Extract IP from CIDR
-                    cidr = ip_range.get('CidrIp', '')
-                    ip = cidr.replace('/32', '')
-
-                    rules_to_remove.append({
-                        'port': from_port,
-                        'ip': ip,
-                        'cidr': cidr
-                    })
+        rules_to_remove = [rule for rule in rules if rule['email'].lower() == target_email.lower()]
 
         # Remove rules
-        removed_count = 0
-        errors = []
-
-        for rule in rules_to_remove:
-            if remove_ip_from_security_group(sg_id, rule['port'], rule['ip']):
-                removed_count += 1
-            else:
-                errors.append(f"Failed to remove {rule['ip']} port {rule['port']}")
+        removed, errors = await asyncio.to_thread(remove_whitelist_audit_rules, rules_to_remove)
+        errors.extend(f"{region}: could not list rules: {error}" for region, error in sorted(region_errors.items()))
+        removed_count = len(removed)
 
         # Log cleanup action
         print(f"[IP-WHITELIST] {datetime.utcnow().isoformat()} | ACTION: admin_cleanup | ADMIN: {email} | TARGET: {target_email} | RULES_REMOVED: {removed_count}")
@@ -2426,6 +5204,7 @@ async def cleanup_user_ip(request: Request):
             'success': removed_count > 0,
             'rules_removed': removed_count,
             'rules_found': len(rules_to_remove),
+            'removed': [{'region': r['region'], 'security_group_id': r['security_group_id'], 'ip': r['ip'], 'port': r['port']} for r in removed],
             'errors': errors
         })
 
@@ -2447,57 +5226,36 @@ async def cleanup_orphaned_ips(request: Request):
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
-        # First, run audit to identify orphaned rules
-        audit_response = await audit_ip_whitelist(request)
-        audit_data = json.loads(audit_response.body.decode())
+        # First, audit every region to identify orphaned rules
+        rules, security_groups, region_errors = await asyncio.to_thread(collect_whitelist_audit_rules)
 
-        if not audit_data.get('success'):
+        if not security_groups:
             return JSONResponse({
                 'success': False,
                 'error': 'Failed to audit IP whitelist'
             })
 
-        orphaned_rules = audit_data.get('orphaned', [])
-
-        if not orphaned_rules:
-            return JSONResponse({
-                'success': True,
-                'message': 'No orphaned rules found',
-                'rules_removed': 0
-            })
-
-        # Get security group
-        response = ec2_client.describe_security_groups(
-            Filters=[
-                {'Name': 'group-name', 'Values': ['vibecode-launched-instances']}
-            ]
-        )
-
-        if not response['SecurityGroups']:
-            return JSONResponse({
-                'success': False,
-                'error': 'vibecode-launched-instances security group not found'
-            })
-
-        sg_id = response['SecurityGroups'][0]['GroupId']
-
-        # Remove each orphaned rule
-        removed_count = 0
-        errors = []
-
-        for rule in orphaned_rules:
-            try:
-                ip = rule['ip']
-                port = int(rule['port'])
+        await asyncio.to_thread(membership.ensure_loaded)
+        orphaned_rules = []
+        for rule in rules:
+            reason = whitelist_rule_orphan_reason(rule['email'])
+            if reason:
+                orphaned_rules.append({**rule, 'orphan_reason': reason})
+        region_notes = [f"{region}: could not list rules: {error}" for region, error in sorted(region_errors.items())]
 
-                if remove_ip_from_security_group(sg_id, port, ip):
-                    removed_count += 1
-                    print(f"  Removed {rule['email']} - {ip}:{port} - {rule.get('orphan_reason', 'unknown reason')}")
-                else:
-                    errors.append(f"Failed to remove {ip}:{port}")
+        if not orphaned_rules:
+            return JSONResponse({
+                'success': True,
+                'message': 'No orphaned rules found',
+                'rules_removed': 0,
+                'errors': region_notes
+            })
 
-            except Exception as rule_error:
-                errors.append(f"Error removing {rule.get('email', 'unknown')}: {str(rule_error)}")
+        # Remove each orphaned rule in its own region
+        removed, errors = await asyncio.to_thread(remove_whitelist_audit_rules, orphaned_rules)
+        for rule in removed:
+            print(f"  Removed {rule['email']} - {rule['ip']}:{rule['port']} in {rule['region']} - {rule['orphan_reason']}")
+        removed_count = len(removed)
 
         # Log cleanup action
         print(f"[IP-WHITELIST] {datetime.utcnow().isoformat()} | ACTION: cleanup_orphaned | ADMIN: {email} | RULES_REMOVED: {removed_count} | RULES_FOUND: {len(orphaned_rules)}")
@@ -2506,7 +5264,8 @@ async def cleanup_orphaned_ips(request: Request):
             'success': removed_count > 0,
             'rules_removed': removed_count,
             'orphaned_found': len(orphaned_rules),
-            'errors': errors
+            'removed': [{'region': r['region'], 'security_group_id': r['security_group_id'], 'ip': r['ip'], 'port': r['port']} for r in removed],
+            'errors': errors + region_notes
         })
 
     except Exception as e:
@@ -2515,16 +5274,98 @@ async def cleanup_orphaned_ips(request: Request):
             'error': str(e)
         }, status_code=500)
 
+@app.get("/admin/reconciler/status")
+async def reconciler_status(request: Request):
+    """Whitelist reconciler configuration and per-cycle metrics (admin only)."""
+    email, groups = require_auth(request)
+    if 'admins' not in groups:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return JSONResponse({
+        'enabled': RECONCILER_ENABLED,
+        'interval_seconds': RECONCILER_INTERVAL,
+        'dry_run': RECONCILER_DRY_RUN,
+        'whitelist_on_login': WHITELIST_ON_LOGIN,
+        'tracked_user_ips': len(last_known_ips),
+        'cycles': list(reconciler_history)
+    })
+
+
+@app.post("/admin/reconciler/run")
+async def reconciler_run(request: Request):
+    """
+    Run one reconcile cycle now (admin only).
+
+    Body (optional JSON): {"dry_run": true} to only report planned changes.
+    """
+    email, groups = require_auth(request)
+    if 'admins' not in groups:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    try:
+        data = await request.json()
+    except Exception:
+        data = {}
+    dry_run = bool(data.get('dry_run', RECONCILER_DRY_RUN))
+
+    result = await asyncio.to_thread(run_whitelist_reconcile_cycle, dry_run)
+    print(f"[IP-WHITELIST] {datetime.utcnow().isoformat()} | ACTION: reconcile | ADMIN: {email} | DRY_RUN: {dry_run} | AUTHORIZED: {result['authorized']} | REVOKED: {result['revoked']}")
+
+    return JSONResponse(result, status_code=200 if result['success'] else 500)
+
+
+@app.get("/admin/profiles")
+async def profiles_list(request: Request):
+    """
+    Stored request profiles, newest first (admin only).
+
+    Returns:
+        JSON: {sample_rate, interval_ms, max_files, profiles: [{id, created_at,
+               method, path, status, duration_ms, samples, trigger, user}, ...]}
+    """
+    email, groups = require_auth(request)
+    if 'admins' not in groups:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return JSONResponse({
+        'sample_rate': PROFILE_SAMPLE_RATE,
+        'interval_ms': PROFILE_INTERVAL_MS,
+        'max_files': PROFILE_MAX_FILES,
+        'profiles': await asyncio.to_thread(list_profiles)
+    })
+
+
+@app.get("/admin/profiles/{profile_id}")
+async def profile_download(request: Request, profile_id: str):
+    """
+    Collapsed stacks of one profile, for flamegraph.pl or speedscope (admin only).
+
+    Served with FileResponse, which reads the file off the event loop.
+    """
+    email, groups = require_auth(request)
+    if 'admins' not in groups:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    path = os.path.join(PROFILE_DIR, profile_id + '.folded')
+    if not PROFILE_ID_PATTERN.fullmatch(profile_id) or not await asyncio.to_thread(os.path.isfile, path):
+        return JSONResponse({'success': False, 'error': 'Profile not found'}, status_code=404)
+
+    return FileResponse(path, media_type='text/plain', filename=f'{profile_id}.folded')
+
 # EC2 Resources Management Routes
 @app.get("/ec2-resources", response_class=HTMLResponse)
 async def ec2_resources_page(request: Request):
     """EC2 Resources management page (available to all authenticated users)."""
     email, groups = require_auth(request)
 
+    # Rendered with the access manifest so the table shows before the stream connects
+    manifest = await get_access_manifest(request)
+
     return templates.TemplateResponse("ec2_resources.html", {
         "request": request,
         "email": email,
-        "groups": groups
+        "groups": groups,
+        "access": {'client_ip': manifest['client_ip'], 'instances': manifest['instances']}
     })
 
 @app.get("/api/ec2/instances")
@@ -2535,21 +5376,70 @@ async def get_ec2_instances_api(request: Request):
     # Get client IP
     client_ip = get_client_ip(request)
 
-    # Get ALL instances with VibeCodeArea tag (not filtered by user groups)
-    # The whitelist indicators will show which ones the user actually has access to
-    instances = get_instances_by_tag()
+    def describe_with_whitelist() -> list:
+        # Get ALL instances with VibeCodeArea tag (not filtered by user groups)
+        # The whitelist indicators will show which ones the user actually has access to
+        instances = get_instances_by_tag()
+
+        # Enhance each instance with whitelist status (one security group lookup per instance)
+        for instance in instances:
+            security_groups = get_instance_security_groups(instance['instance_id'], instance['region'])
+            instance['port_80_whitelisted'] = security_groups_allow(security_groups, 80, client_ip)
+            instance['port_443_whitelisted'] = security_groups_allow(security_groups, 443, client_ip)
+        return instances
 
-    # Enhance each instance with whitelist status
-    for instance in instances:
-        instance_id = instance['instance_id']
-        instance['port_80_whitelisted'] = check_port_whitelisted(instance_id, 80, client_ip)
-        instance['port_443_whitelisted'] = check_port_whitelisted(instance_id, 443, client_ip)
+    # Budgeted AWS calls block - keep them off the event loop
+    instances = await asyncio.to_thread(describe_with_whitelist)
 
     return {
         "client_ip": client_ip,
-        "instances": instances
+        "instances": instances,
+        "stale": served_stale()
     }
 
+@app.get("/api/ec2/stream")
+async def ec2_stream_api(request: Request):
+    """
+    Server-sent events version of /api/ec2/instances.
+
+    Events:
+        snapshot: {client_ip, instances} - full list (on connect and after resyncs)
+        upsert: one instance that appeared or changed
+        remove: {region, instance_id}
+        error: {error} - a background scan failed; last state stays valid
+    """
+    email, groups = require_auth(request)
+    client_ip = get_client_ip(request)
+    queue = ec2_feed.subscribe()
+
+    async def events():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EC2_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                if event['type'] == 'snapshot':
+                    yield sse_event('snapshot', {
+                        'client_ip': client_ip,
+                        'instances': [ec2_instance_view(r, client_ip) for r in ec2_feed.instances.values()]
+                    })
+                elif event['type'] == 'upsert':
+                    yield sse_event('upsert', ec2_instance_view(event['instance'], client_ip))
+                elif event['type'] == 'remove':
+                    yield sse_event('remove', {'region': event['region'], 'instance_id': event['instance_id']})
+                else:
+                    yield sse_event('error', {'error': event['error']})
+        finally:
+            ec2_feed.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.get("/api/ec2/areas")
 async def get_ec2_areas_api(request: Request):
     """
@@ -2563,8 +5453,8 @@ async def get_ec2_areas_api(request: Request):
         # Require authentication (any logged-in user can see areas)
         email, groups = require_auth(request)
 
-        # Get unique areas
-        areas = get_unique_vibecode_areas()
+        # Get unique areas (blocking EC2 scan - off the event loop)
+        areas = await asyncio.to_thread(get_unique_vibecode_areas)
 
         return JSONResponse({
             "success": True,
@@ -2595,18 +5485,31 @@ async def tag_ec2_instance_api(request: Request):
         data = await request.json()
         instance_id = data.get("instance_id")
         area = data.get("area")
+        region = data.get("region", AWS_REGION)
 
         if not instance_id or not area:
             return {"success": False, "message": "Missing instance_id or area"}
 
-        success, message = tag_instance(instance_id, area)
+        if region not in EC2_REGIONS and region != AWS_REGION:
+            return {"success": False, "message": f"Unknown region: {region}"}
+
+        success, message = tag_instance(instance_id, area, region)
+        if success:
+            ec2_feed.poke()
         return {"success": success, "message": message}
     except Exception as e:
         return {"success": False, "message": f"Error: {str(e)}"}
 
 @app.post("/api/ec2/launch-instance")
 async def launch_ec2_instance_api(request: Request):
-    """API endpoint to launch a new EC2 instance (admin only)."""
+    """
+    Start an EC2 instance launch job (admin only).
+
+    Returns immediately; poll /api/ec2/jobs/{job_id} for progress.
+
+    Returns:
+        JSON (202): {"success": true, "job_id": ..., "job": {...}}
+    """
     email, groups = require_auth(request)
 
     # Check if user is admin
@@ -2621,19 +5524,43 @@ async def launch_ec2_instance_api(request: Request):
         if not instance_type:
             return {"success": False, "message": "Missing instance_type"}
 
-        if not area:
+        if instance_type not in VALID_INSTANCE_TYPES:
+            return {"success": False, "message": f"Invalid instance type. Must be one of: {', '.join(VALID_INSTANCE_TYPES)}"}
+
+        if not area or not area.strip():
             return {"success": False, "message": "Missing area"}
 
-        success, message, result_data = launch_ec2_instance(instance_type, area)
+        job = create_launch_job(instance_type, area.strip(), email)
+        if not job:
+            return JSONResponse({"success": False, "message": "Too many launches in progress - try again shortly"}, status_code=429)
 
-        if success:
-            return {"success": True, "message": message, "instance": result_data}
-        else:
-            return {"success": False, "message": message}
+        launch_executor.submit(run_launch_job, job['job_id'], instance_type, area.strip(), asyncio.get_running_loop())
+        print(f"[LAUNCH-JOB] {job['job_id']} | ADMIN: {email} | TYPE: {instance_type} | AREA: {area.strip()} | STATUS: queued")
+
+        return JSONResponse({"success": True, "message": "Launch started", "job_id": job['job_id'], "job": job}, status_code=202)
 
     except Exception as e:
         return {"success": False, "message": f"Error: {str(e)}"}
 
+@app.get("/api/ec2/jobs/{job_id}")
+async def get_launch_job_api(request: Request, job_id: str):
+    """
+    Launch job status (admin only).
+
+    Returns:
+        JSON: {"success": true, "job": {job_id, stage, message, instance, error, ...}}
+              stage is one of pending, resolving-ami, creating, running, failed
+    """
+    email, groups = require_auth(request)
+    if 'admins' not in groups:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    job = get_launch_job(job_id)
+    if not job:
+        return JSONResponse({"success": False, "error": "Job not found (unknown or expired)"}, status_code=404)
+
+    return {"success": True, "job": job}
+
 @app.post("/api/users/create")
 async def create_user_api(request: Request):
     """API endpoint to create a new Cognito user (admin only)."""
@@ -2656,7 +5583,7 @@ async def create_user_api(request: Request):
         if not re.match(r"[^@]+@[^@]+\.[^@]+", user_email):
             return {"success": False, "message": "Invalid email format"}
 
-        success, message = create_cognito_user(user_email, user_groups)
+        success, message = await asyncio.to_thread(create_cognito_user, user_email, user_groups)
         return {"success": success, "message": message}
     except Exception as e:
         return {"success": False, "message": f"Error: {str(e)}"}
@@ -2681,11 +5608,54 @@ async def delete_user_api(request: Request):
         if user_email == email:
             return {"success": False, "message": "Cannot delete your own account"}
 
-        success, message = delete_cognito_user(user_email)
+        success, message = await asyncio.to_thread(delete_cognito_user, user_email)
         return {"success": success, "message": message}
     except Exception as e:
         return {"success": False, "message": f"Error: {str(e)}"}
 
+@app.post("/api/users/bulk")
+async def bulk_users_api(request: Request):
+    """
+    Create, delete or regroup a batch of Cognito users (admin only).
+
+    Body: text/csv with 'email' and optional 'groups' columns (action from
+    ?action=), or JSON {"action": ..., "users": [{"email", "groups"}]}.
+    Actions: create (default), delete, reassign (set exactly these groups).
+
+    Returns:
+        400 JSON {success: false, error, errors: [{row, email, error}]} if any
+        row is invalid (nothing is changed), otherwise an NDJSON stream of
+        {"type": "row"} records followed by a {"type": "summary"} record.
+    """
+    email, groups = require_auth(request)
+    if 'admins' not in groups:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    try:
+        action, rows = parse_bulk_rows(
+            await request.body(),
+            request.headers.get('content-type', ''),
+            request.query_params.get('action')
+        )
+    except ValueError as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=400)
+
+    # Validation needs every existing user and group
+    await asyncio.to_thread(membership.ensure_loaded)
+    errors = validate_bulk_rows(action, rows, email)
+    if errors:
+        return JSONResponse({
+            'success': False,
+            'error': f"Batch rejected: {len(errors)} invalid row(s), nothing was changed",
+            'errors': errors
+        }, status_code=400)
+
+    return StreamingResponse(
+        stream_bulk_results(action, rows, email),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={'Cache-Control': 'no-store'}
+    )
+
 # ============================================================================
 # PASSWORD RESET CUSTOM FLOW
 # ============================================================================
@@ -3293,6 +6263,12 @@ cat > /opt/employee-portal/templates/directory.html << 'EOFDIRECTORY'
 
     <div id="status-message" style="display: none; padding: 1rem; margin-bottom: 1rem; border-radius: 4px;"></div>
 
+    <div style="display: flex; gap: 1rem; align-items: center; margin-bottom: 1rem;">
+        <input type="text" id="directory-search" placeholder="Search by email prefix..." oninput="onDirectorySearch()"
+               style="flex: 1; background: rgba(0, 0, 0, 0.5); border: 1px solid #00ff00; color: #00ff00; padding: 0.6rem; font-family: 'Source Code Pro', monospace;">
+        <span id="directory-count" style="opacity: 0.7; font-size: 0.85rem;"></span>
+    </div>
+
     <table>
         <thead>
             <tr>
@@ -3304,28 +6280,102 @@ cat > /opt/employee-portal/templates/directory.html << 'EOFDIRECTORY'
                 {% endif %}
             </tr>
         </thead>
-        <tbody>
-            {% for user in users %}
-            <tr>
-                <td>{{ user.email }}</td>
-                <td class="timestamp-cell" data-utc="{{ user.last_login }}" style="color: {% if user.last_login == 'Never' %}#ffaa00{% else %}#00ff00{% endif %};">
-                    {{ user.last_login }}
-                </td>
-                <td>{{ user.groups }}</td>
-                {% if is_admin %}
-                <td>
-                    <button onclick="confirmDelete('{{ user.email }}')"
-                            style="background: rgba(255, 0, 0, 0.2); border: 1px solid #ff0000; color: #ff0000; padding: 0.4rem 0.8rem; cursor: pointer; font-family: 'Source Code Pro', monospace; font-size: 0.85rem; text-transform: uppercase;">
-                        DELETE
-                    </button>
-                </td>
-                {% endif %}
-            </tr>
-            {% endfor %}
+        <tbody id="directory-tbody">
         </tbody>
     </table>
+    <div style="text-align: center; margin-top: 1rem;">
+        <button id="directory-more" onclick="loadDirectoryPage()" style="display: none; background: rgba(0, 255, 0, 0.1); border: 1px solid #00ff00; color: #00ff00; padding: 0.6rem 1.2rem; cursor: pointer; font-family: 'Source Code Pro', monospace; text-transform: uppercase;">
+            Load more
+        </button>
+    </div>
 </div>
 
+<script>
+const IS_ADMIN = {{ 'true' if is_admin else 'false' }};
+const DIRECTORY_PAGE_SIZE = 25;
+const directoryState = { q: '', offset: 0, generation: 0 };
+let directorySearchTimer = null;
+
+function renderDirectoryRow(user) {
+    const row = document.createElement('tr');
+
+    const emailCell = document.createElement('td');
+    emailCell.textContent = user.email;
+    row.appendChild(emailCell);
+
+    const loginCell = document.createElement('td');
+    loginCell.className = 'timestamp-cell';
+    loginCell.setAttribute('data-utc', user.last_login);
+    loginCell.style.color = user.last_login === 'Never' ? '#ffaa00' : '#00ff00';
+    loginCell.textContent = user.last_login;
+    row.appendChild(loginCell);
+
+    const groupsCell = document.createElement('td');
+    // groups is null while the directory index is still loading
+    groupsCell.textContent = user.groups === null ? 'loading...' : (user.groups.length > 0 ? user.groups.join(', ') : 'none');
+    row.appendChild(groupsCell);
+
+    if (IS_ADMIN) {
+        const actionsCell = document.createElement('td');
+        const btn = document.createElement('button');
+        btn.style.cssText = "background: rgba(255, 0, 0, 0.2); border: 1px solid #ff0000; color: #ff0000; padding: 0.4rem 0.8rem; cursor: pointer; font-family: 'Source Code Pro', monospace; font-size: 0.85rem; text-transform: uppercase;";
+        btn.textContent = 'DELETE';
+        btn.addEventListener('click', () => confirmDelete(user.email));
+        actionsCell.appendChild(btn);
+        row.appendChild(actionsCell);
+    }
+
+    return row;
+}
+
+async function loadDirectoryPage() {
+    const generation = directoryState.generation;
+    const params = new URLSearchParams({ q: directoryState.q, limit: String(DIRECTORY_PAGE_SIZE), offset: String(directoryState.offset) });
+    const moreBtn = document.getElementById('directory-more');
+
+    try {
+        const response = await fetch('/api/directory/search?' + params.toString());
+        const data = await response.json();
+        if (generation !== directoryState.generation) return;  // superseded by a newer search
+
+        const tbody = document.getElementById('directory-tbody');
+        if (!data.success) {
+            document.getElementById('directory-count').textContent = 'Error: ' + data.error;
+            return;
+        }
+
+        data.users.forEach(user => tbody.appendChild(renderDirectoryRow(user)));
+        directoryState.offset += data.users.length;
+
+        const shown = tbody.children.length;
+        document.getElementById('directory-count').textContent = data.total === null ? shown + ' users' : shown + ' of ' + data.total + ' users';
+        const hasMore = data.total === null ? data.users.length === DIRECTORY_PAGE_SIZE : shown < data.total;
+        moreBtn.style.display = hasMore ? 'inline-block' : 'none';
+
+        if (typeof convertTimestamps === 'function') convertTimestamps();
+    } catch (error) {
+        document.getElementById('directory-count').textContent = 'Error: ' + error.message;
+    }
+}
+
+function resetDirectory() {
+    directoryState.generation += 1;
+    directoryState.offset = 0;
+    document.getElementById('directory-tbody').innerHTML = '';
+    loadDirectoryPage();
+}
+
+function onDirectorySearch() {
+    clearTimeout(directorySearchTimer);
+    directorySearchTimer = setTimeout(() => {
+        directoryState.q = document.getElementById('directory-search').value.trim();
+        resetDirectory();
+    }, 150);
+}
+
+document.addEventListener('DOMContentLoaded', resetDirectory);
+</script>
+
 {% if is_admin %}
 <!-- Add User Modal -->
 <div id="add-user-modal" style="display: none; position: fixed; top: 0; left: 0; width: 100%; height: 100%; background: rgba(0, 0, 0, 0.9); z-index: 1000; justify-content: center; align-items: center;">
@@ -3478,6 +6528,10 @@ async function deleteUser(email) {
     }
 }
 
+</script>
+{% endif %}
+
+<script>
 // Timezone conversion functionality
 function convertTimestamps() {
     const timezone = document.getElementById('timezone-selector').value;
@@ -3553,7 +6607,6 @@ document.addEventListener('DOMContentLoaded', () => {
     convertTimestamps();
 });
 </script>
-{% endif %}
 
 {% endblock %}
 EOFDIRECTORY
@@ -3925,47 +6978,25 @@ cat > /opt/employee-portal/templates/admin_panel.html << 'EOFADMIN'
             </button>
         </div>
 
+        <div style="display: flex; gap: 1rem; align-items: center; margin-bottom: 0.5rem;">
+            <input type="text" id="user-search" placeholder="Search by email prefix..." oninput="onUserSearch()"
+                   style="flex: 1; background: rgba(0, 0, 0, 0.5); border: 1px solid #00ff00; color: #00ff00; padding: 0.6rem; font-family: 'Source Code Pro', monospace;">
+            <span id="user-count" style="opacity: 0.7; font-size: 0.85rem;"></span>
+        </div>
+
         <table style="width: 100%; margin-top: 1rem;">
             <thead>
                 <tr>
-                    <th>EMAIL</th>
-                    <th>CURRENT GROUPS</th>
+                    <th class="sortable" data-sort="email" onclick="sortUsers('email')" style="cursor: pointer;">EMAIL</th>
+                    <th class="sortable" data-sort="groups" onclick="sortUsers('groups')" style="cursor: pointer;">CURRENT GROUPS</th>
+                    <th class="sortable" data-sort="last_login" onclick="sortUsers('last_login')" style="cursor: pointer;">LAST LOGIN</th>
                     <th>ACTIONS</th>
                 </tr>
             </thead>
-            <tbody>
-                {% for user in users %}
-                <tr>
-                    <td>{{ user.email }}</td>
-                    <td>
-                        {% if user.groups %}
-                            {% for group in user.groups %}
-                            <span class="badge" style="font-size: 0.75rem; padding: 0.2rem 0.6rem;">{{ group }}</span>
-                            {% endfor %}
-                        {% else %}
-                            <span style="opacity: 0.5;">No groups</span>
-                        {% endif %}
-                    </td>
-                    <td>
-                        <button onclick="showAddGroupModal('{{ user.username }}', '{{ user.email }}')"
-                                style="background: rgba(0, 255, 0, 0.1); border: 1px solid #00ff00; color: #00ff00; padding: 0.4rem 0.8rem; cursor: pointer; margin-right: 0.5rem; font-family: 'Source Code Pro', monospace; font-size: 0.75rem;">
-                            + ADD GROUP
-                        </button>
-                        {% if user.groups %}
-                        <button onclick='showRemoveGroupModal("{{ user.username }}", "{{ user.email }}", {{ user.groups|tojson }})'
-                                style="background: rgba(255, 0, 0, 0.1); border: 1px solid #ff0000; color: #ff0000; padding: 0.4rem 0.8rem; cursor: pointer; margin-right: 0.5rem; font-family: 'Source Code Pro', monospace; font-size: 0.75rem;">
-                            - REMOVE GROUP
-                        </button>
-                        {% endif %}
-                        <button onclick="showDeleteUserModal('{{ user.username }}', '{{ user.email }}')"
-                                style="background: rgba(255, 0, 0, 0.2); border: 1px solid #ff0000; color: #ff0000; padding: 0.4rem 0.8rem; cursor: pointer; font-family: 'Source Code Pro', monospace; font-size: 0.75rem;">
-                            🗑 DELETE USER
-                        </button>
-                    </td>
-                </tr>
-                {% endfor %}
+            <tbody id="users-tbody">
             </tbody>
         </table>
+        <div id="users-sentinel" style="padding: 1rem; text-align: center; opacity: 0.6;">Loading users...</div>
 
         <!-- IP Whitelist Management Section -->
         <div style="margin-top: 3rem; padding-top: 2rem; border-top: 2px solid rgba(0, 255, 0, 0.3);">
@@ -3984,6 +7015,11 @@ cat > /opt/employee-portal/templates/admin_panel.html << 'EOFADMIN'
                         style="background: rgba(255, 100, 0, 0.2); border: 2px solid #ff6600; color: #ff6600; padding: 0.8rem 1.5rem; cursor: pointer; font-family: 'Source Code Pro', monospace; font-size: 0.85rem; font-weight: 700; text-transform: uppercase;">
                     🧹 CLEANUP ORPHANED IPS
                 </button>
+
+                <button onclick="runReconciler(true)"
+                        style="background: rgba(0, 255, 0, 0.2); border: 2px solid #00ff00; color: #00ff00; padding: 0.8rem 1.5rem; cursor: pointer; font-family: 'Source Code Pro', monospace; font-size: 0.85rem; font-weight: 700; text-transform: uppercase;">
+                    🔄 RECONCILE (DRY RUN)
+                </button>
             </div>
 
             <div id="whitelist-audit-results" style="display: none; margin-top: 1rem; padding: 1rem; background: rgba(0, 0, 0, 0.5); border: 1px solid #444;">
@@ -4325,7 +7361,7 @@ function createRulesTable(rules, showOrphanReason) {
     const thead = document.createElement('thead');
     const headerRow = document.createElement('tr');
 
-    const headers = ['USER', 'IP', 'PORT'];
+    const headers = ['USER', 'REGION', 'IP', 'PORT'];
     if (showOrphanReason) headers.push('REASON');
     headers.push('ADDED');
 
@@ -4347,6 +7383,10 @@ function createRulesTable(rules, showOrphanReason) {
         emailCell.textContent = rule.email;
         row.appendChild(emailCell);
 
+        const regionCell = document.createElement('td');
+        regionCell.textContent = rule.region;
+        row.appendChild(regionCell);
+
         const ipCell = document.createElement('td');
         ipCell.style.fontFamily = 'monospace';
         ipCell.textContent = rule.ip;
@@ -4444,6 +7484,205 @@ async function cleanupOrphanedIPs() {
         resultsDiv.textContent = 'Error: ' + error.message;
     }
 }
+
+async function runReconciler(dryRun) {
+    const resultsDiv = document.getElementById('whitelist-audit-results');
+    resultsDiv.style.display = 'block';
+    resultsDiv.textContent = dryRun ? 'Computing desired whitelist state...' : 'Reconciling whitelist rules...';
+
+    try {
+        const response = await fetch('/admin/reconciler/run', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ dry_run: dryRun })
+        });
+        const data = await response.json();
+
+        resultsDiv.innerHTML = '';
+
+        const title = document.createElement('h4');
+        title.style.cssText = 'color: #00ff00; margin-bottom: 1rem;';
+        title.textContent = (dryRun ? 'RECONCILER DRY RUN' : 'RECONCILER RUN') + ' (' + data.duration_ms + 'ms, ' + data.api_calls + ' API calls)';
+        resultsDiv.appendChild(title);
+
+        const summary = document.createElement('p');
+        summary.textContent = 'Desired rules: ' + data.desired_rules + ' | Current rules: ' + data.current_rules +
+            ' | To authorize: ' + data.to_authorize + ' | To revoke: ' + data.to_revoke;
+        resultsDiv.appendChild(summary);
+
+        const changes = [];
+        (data.authorize || []).forEach(r => changes.push({ email: r.email, ip: '+ ' + r.cidr, port: r.port, added: r.sg_id }));
+        (data.revoke || []).forEach(r => changes.push({ email: r.email, ip: '- ' + r.cidr, port: r.port, added: r.sg_id }));
+        if (changes.length > 0) {
+            resultsDiv.appendChild(createRulesTable(changes, false));
+        }
+
+        (data.errors || []).forEach(err => {
+            const errorMsg = document.createElement('p');
+            errorMsg.style.color = '#ff0000';
+            errorMsg.textContent = 'Error: ' + err;
+            resultsDiv.appendChild(errorMsg);
+        });
+
+        if (dryRun && changes.length > 0) {
+            const applyBtn = document.createElement('button');
+            applyBtn.style.cssText = 'margin-top: 1rem; background: rgba(255, 100, 0, 0.2); border: 2px solid #ff6600; color: #ff6600; padding: 0.6rem 1.2rem; cursor: pointer; font-family: monospace; font-weight: 700;';
+            applyBtn.textContent = 'APPLY ' + changes.length + ' CHANGES';
+            applyBtn.onclick = () => runReconciler(false);
+            resultsDiv.appendChild(applyBtn);
+        }
+
+    } catch (error) {
+        resultsDiv.textContent = 'Error: ' + error.message;
+    }
+}
+
+// Admin users table - rows are loaded progressively from /api/admin/users
+const userTable = { q: '', sort: 'email', order: 'asc', cursor: null, done: false, loading: false, generation: 0, restarted: false };
+let userSearchTimer = null;
+
+function makeButton(label, style, onClick) {
+    const btn = document.createElement('button');
+    btn.style.cssText = style;
+    btn.textContent = label;
+    btn.addEventListener('click', onClick);
+    return btn;
+}
+
+function renderUserRow(user) {
+    const row = document.createElement('tr');
+
+    const emailCell = document.createElement('td');
+    emailCell.textContent = user.email;
+    row.appendChild(emailCell);
+
+    const groupsCell = document.createElement('td');
+    if (user.groups.length > 0) {
+        user.groups.forEach(group => {
+            const badge = document.createElement('span');
+            badge.className = 'badge';
+            badge.style.cssText = 'font-size: 0.75rem; padding: 0.2rem 0.6rem;';
+            badge.textContent = group;
+            groupsCell.appendChild(badge);
+            groupsCell.appendChild(document.createTextNode(' '));
+        });
+    } else {
+        const none = document.createElement('span');
+        none.style.opacity = '0.5';
+        none.textContent = 'No groups';
+        groupsCell.appendChild(none);
+    }
+    row.appendChild(groupsCell);
+
+    const loginCell = document.createElement('td');
+    loginCell.style.cssText = 'font-size: 0.8rem; opacity: 0.8;';
+    loginCell.textContent = user.last_login;
+    row.appendChild(loginCell);
+
+    const actionsCell = document.createElement('td');
+    actionsCell.appendChild(makeButton('+ ADD GROUP',
+        "background: rgba(0, 255, 0, 0.1); border: 1px solid #00ff00; color: #00ff00; padding: 0.4rem 0.8rem; cursor: pointer; margin-right: 0.5rem; font-family: 'Source Code Pro', monospace; font-size: 0.75rem;",
+        () => showAddGroupModal(user.username, user.email)));
+    if (user.groups.length > 0) {
+        actionsCell.appendChild(makeButton('- REMOVE GROUP',
+            "background: rgba(255, 0, 0, 0.1); border: 1px solid #ff0000; color: #ff0000; padding: 0.4rem 0.8rem; cursor: pointer; margin-right: 0.5rem; font-family: 'Source Code Pro', monospace; font-size: 0.75rem;",
+            () => showRemoveGroupModal(user.username, user.email, user.groups)));
+    }
+    actionsCell.appendChild(makeButton('🗑 DELETE USER',
+        "background: rgba(255, 0, 0, 0.2); border: 1px solid #ff0000; color: #ff0000; padding: 0.4rem 0.8rem; cursor: pointer; font-family: 'Source Code Pro', monospace; font-size: 0.75rem;",
+        () => showDeleteUserModal(user.username, user.email)));
+    row.appendChild(actionsCell);
+
+    return row;
+}
+
+async function loadUserPage() {
+    if (userTable.loading || userTable.done) return;
+    userTable.loading = true;
+    const generation = userTable.generation;
+    const sentinel = document.getElementById('users-sentinel');
+
+    const params = new URLSearchParams({ q: userTable.q, sort: userTable.sort, order: userTable.order, limit: '50' });
+    if (userTable.cursor) params.set('cursor', userTable.cursor);
+
+    try {
+        const response = await fetch('/api/admin/users?' + params.toString());
+        const data = await response.json();
+        if (generation !== userTable.generation) return;  // search/sort changed meanwhile
+
+        if (data.stale_cursor) {
+            if (userTable.restarted) {
+                // Changed again since the restart - stop rather than reload forever
+                sentinel.textContent = 'Users are changing - sort or search again to refresh';
+                userTable.done = true;
+                return;
+            }
+            // Users changed under a non-email sort - start the table over once
+            resetUserTable(true);
+            return;
+        }
+
+        if (!data.success) {
+            sentinel.textContent = 'Error: ' + data.error;
+            userTable.done = true;
+            return;
+        }
+
+        const tbody = document.getElementById('users-tbody');
+        data.users.forEach(user => tbody.appendChild(renderUserRow(user)));
+        document.getElementById('user-count').textContent = tbody.children.length + ' of ' + data.total + ' users';
+
+        if (userTable.cursor) userTable.restarted = false;  // paged past the restart
+        userTable.cursor = data.next_cursor;
+        userTable.done = !data.next_cursor;
+        sentinel.textContent = userTable.done ? (data.total === 0 ? 'No users found' : '') : 'Loading more...';
+    } catch (error) {
+        sentinel.textContent = 'Error: ' + error.message;
+    } finally {
+        if (generation === userTable.generation) {
+            userTable.loading = false;
+            // Keep filling while the sentinel is still on screen
+            const rect = sentinel.getBoundingClientRect();
+            if (!userTable.done && rect.top < window.innerHeight) loadUserPage();
+        }
+    }
+}
+
+function resetUserTable(restarted = false) {
+    userTable.generation += 1;
+    userTable.restarted = restarted;
+    userTable.cursor = null;
+    userTable.done = false;
+    userTable.loading = false;
+    document.getElementById('users-tbody').innerHTML = '';
+    document.getElementById('users-sentinel').textContent = 'Loading users...';
+    document.querySelectorAll('th.sortable').forEach(th => {
+        const arrow = th.dataset.sort === userTable.sort ? (userTable.order === 'asc' ? ' ▲' : ' ▼') : '';
+        th.textContent = th.textContent.replace(/ [▲▼]/, '') + arrow;
+    });
+    loadUserPage();
+}
+
+function onUserSearch() {
+    clearTimeout(userSearchTimer);
+    userSearchTimer = setTimeout(() => {
+        userTable.q = document.getElementById('user-search').value.trim();
+        resetUserTable();
+    }, 200);
+}
+
+function sortUsers(key) {
+    userTable.order = (userTable.sort === key && userTable.order === 'asc') ? 'desc' : 'asc';
+    userTable.sort = key;
+    resetUserTable();
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    new IntersectionObserver(entries => {
+        if (entries.some(e => e.isIntersecting)) loadUserPage();
+    }).observe(document.getElementById('users-sentinel'));
+    resetUserTable();
+});
 </script>
 {% endblock %}
 EOFADMIN
@@ -4505,6 +7744,7 @@ cat > /opt/employee-portal/templates/ec2_resources.html << 'EOFEC2'
                     <th>PUBLIC IP</th>
                     <th>PRIVATE IP</th>
                     <th>AREA</th>
+                    <th>REGION</th>
                     <th>STATE</th>
                     <th>PORT 80</th>
                     <th>PORT 443</th>
@@ -4593,7 +7833,7 @@ async function refreshInstances() {
     document.getElementById('no-instances').style.display = 'none';
 
     try {
-        const response = await fetch('/api/ec2/instances');
+        const response = await fetch('/api/me/access');
         const data = await response.json();
 
         // Display client IP
@@ -4653,6 +7893,10 @@ function displayInstances(instances) {
         areaCell.appendChild(areaBadge);
         row.appendChild(areaCell);
 
+        const regionCell = document.createElement('td');
+        regionCell.textContent = instance.region;
+        row.appendChild(regionCell);
+
         const stateCell = document.createElement('td');
         stateCell.textContent = instance.state.toUpperCase();
         stateCell.style.color = stateColor;
@@ -4761,6 +8005,28 @@ function closeModal() {
     document.getElementById('launch-button').disabled = false;
 }
 
+// Poll a launch job until it is running, launched (not waited on) or failed
+async function waitForLaunchJob(jobId, loadingDiv) {
+    while (true) {
+        const response = await fetch('/api/ec2/jobs/' + encodeURIComponent(jobId));
+        const data = await response.json();
+        if (!data.success) {
+            return {success: false, message: data.error};
+        }
+
+        const job = data.job;
+        loadingDiv.textContent = 'Launching instance... [' + job.stage.toUpperCase() + '] ' + job.message;
+
+        if (job.stage === 'running' || job.stage === 'launched') {
+            return {success: true, message: job.message, instance: job.instance};
+        }
+        if (job.stage === 'failed') {
+            return {success: false, message: job.error};
+        }
+        await new Promise(resolve => setTimeout(resolve, 2000));
+    }
+}
+
 async function launchInstance() {
     const instanceType = document.getElementById('instance-type-select').value;
     const areaSelect = document.getElementById('area-select').value;
@@ -4793,6 +8059,7 @@ async function launchInstance() {
     const resultDiv = document.getElementById('launch-result');
 
     launchButton.disabled = true;
+    loadingDiv.textContent = 'Launching instance... This may take 30-60 seconds';
     loadingDiv.style.display = 'block';
     resultDiv.style.display = 'none';
 
@@ -4808,7 +8075,10 @@ async function launchInstance() {
             })
         });
 
-        const data = await response.json();
+        let data = await response.json();
+        if (data.success && data.job_id) {
+            data = await waitForLaunchJob(data.job_id, loadingDiv);
+        }
 
         loadingDiv.style.display = 'none';
 
@@ -4830,9 +8100,11 @@ async function launchInstance() {
             resultDiv.style.whiteSpace = 'pre-line';
             resultDiv.style.display = 'block';
 
-            // Show status and refresh instances list
+            // Show status (the live stream pushes the new instance)
             showStatus(data.message, 'success');
-            refreshInstances();
+            if (!instanceStream) {
+                refreshInstances();
+            }
 
             // Auto-close modal after 3 seconds
             setTimeout(() => {
@@ -4882,8 +8154,71 @@ function showStatus(message, type) {
     }, 5000);
 }
 
-// Load instances on page load
-refreshInstances();
+// Live updates: /api/ec2/stream pushes a snapshot, then only changes
+const instanceState = {};
+let instanceStream = null;
+
+// Instances are unique per (region, instance_id)
+function instanceKey(instance) {
+    return instance.region + '/' + instance.instance_id;
+}
+
+function renderInstanceState() {
+    const instances = Object.values(instanceState).sort((a, b) => a.name.localeCompare(b.name));
+    if (instances.length > 0) {
+        document.getElementById('no-instances').style.display = 'none';
+        displayInstances(instances);
+    } else {
+        document.getElementById('loading').style.display = 'none';
+        document.getElementById('instances-table').style.display = 'none';
+        document.getElementById('no-instances').style.display = 'block';
+    }
+}
+
+function connectInstanceStream() {
+    instanceStream = new EventSource('/api/ec2/stream');
+
+    instanceStream.addEventListener('snapshot', (e) => {
+        const data = JSON.parse(e.data);
+        document.getElementById('client-ip-value').textContent = data.client_ip;
+        document.getElementById('client-ip-banner').style.display = 'block';
+        Object.keys(instanceState).forEach(id => delete instanceState[id]);
+        data.instances.forEach(instance => { instanceState[instanceKey(instance)] = instance; });
+        renderInstanceState();
+    });
+
+    instanceStream.addEventListener('upsert', (e) => {
+        const instance = JSON.parse(e.data);
+        instanceState[instanceKey(instance)] = instance;
+        renderInstanceState();
+    });
+
+    instanceStream.addEventListener('remove', (e) => {
+        delete instanceState[instanceKey(JSON.parse(e.data))];
+        renderInstanceState();
+    });
+
+    instanceStream.addEventListener('error', (e) => {
+        // Server-side scan errors carry data; connection drops reconnect automatically
+        if (e.data) {
+            showStatus('Error fetching instances: ' + JSON.parse(e.data).error, 'error');
+        }
+    });
+}
+
+// First paint from the access manifest rendered with the page
+const initialAccess = {{ access | tojson }};
+document.getElementById('client-ip-value').textContent = initialAccess.client_ip;
+document.getElementById('client-ip-banner').style.display = 'block';
+initialAccess.instances.forEach(instance => { instanceState[instanceKey(instance)] = instance; });
+renderInstanceState();
+
+// Then keep it live
+if (window.EventSource) {
+    connectInstanceStream();
+} else {
+    refreshInstances();
+}
 </script>
 {% endblock %}
 EOFEC2
@@ -4906,6 +8241,20 @@ Type=simple
 User=app
 WorkingDirectory=/opt/employee-portal
 Environment="PATH=/opt/employee-portal/venv/bin"
+# Extra regions to scan for VibeCode instances (default: portal region only)
+# Environment="EC2_REGIONS=us-west-2,us-east-1"
+# Default per-request latency budget for AWS calls, in seconds
+# Environment="ROUTE_BUDGET_SECONDS=3"
+# Skip the startup cache warm-up (/ready then reports ready immediately)
+# Environment="WARMUP_ON_STARTUP=false"
+# Profile this fraction of requests (admins can always profile one with X-Profile: 1)
+# Environment="PROFILE_SAMPLE_RATE=0.01"
+# Seconds between EC2 rescans behind the per-user access manifests
+# Environment="ACCESS_INVENTORY_TTL=30"
+# Background whitelist reconciler (revokes stale rules) - off unless enabled;
+# run it with RECONCILER_DRY_RUN=true first and check /admin/reconciler/status
+# Environment="RECONCILER_ENABLED=true"
+# Environment="RECONCILER_DRY_RUN=true"
 ExecStart=/opt/employee-portal/venv/bin/uvicorn app:app --host 0.0.0.0 --port 8000
 Restart=always
 RestartSec=10
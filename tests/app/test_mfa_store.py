@@ -0,0 +1,111 @@
+"""
+Unit tests for the TOTP enrollment store in app/mfa_routes.py
+
+Covers pending-secret expiry and bounds, persistence through the append
+log (including compaction and a torn last line) and replay rejection.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+pyotp = pytest.importorskip("pyotp")
+pytest.importorskip("qrcode")
+pytest.importorskip("fastapi")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "app"))
+
+import mfa_routes  # noqa: E402
+
+SECRET = 'JBSWY3DPEHPK3PXPJBSWY3DPEHPK3PXP'
+NOW = 1_800_000_000.0
+
+
+def code_at(secret, when):
+    return pyotp.TOTP(secret).at(when)
+
+
+class TestMfaEnrollmentStore:
+    """Test cases for MfaEnrollmentStore"""
+
+    def test_pending_secrets_expire_and_stay_bounded(self, tmp_path):
+        """
+        Test: Enroll past the pending cap, re-init a user, let the TTL pass
+        Expected: Oldest pending evicted at the cap; re-init replaces the entry;
+                  an expired secret can't be verified; nothing is written to disk
+        """
+        store = mfa_routes.MfaEnrollmentStore(str(tmp_path / 'mfa.log'), pending_ttl=600, pending_max=3)
+        for i in range(5):
+            store.begin(f'user{i}@capsule.com', SECRET, now=NOW + i)
+        assert list(store.pending) == ['user2@capsule.com', 'user3@capsule.com', 'user4@capsule.com']
+
+        store.begin('user2@capsule.com', 'KRSXG5CTMVRXEZLU', now=NOW + 10)
+        assert list(store.pending) == ['user3@capsule.com', 'user4@capsule.com', 'user2@capsule.com']
+        assert store.pending['user2@capsule.com'].secret == 'KRSXG5CTMVRXEZLU'
+
+        later = NOW + 605
+        assert store.verify('user3@capsule.com', code_at(SECRET, later), now=later) == 'not_initialized'
+        assert len(store.pending) == 1
+        assert not (tmp_path / 'mfa.log').exists()
+        with pytest.raises(AttributeError):
+            store.pending['user2@capsule.com'].extra = 1
+
+    def test_verified_enrollment_survives_restart_and_rejects_replay(self, tmp_path):
+        """
+        Test: Verify a code, reuse it, use an older one, then reopen the store from its log
+        Expected: First use enrolls; same and earlier steps are rejected as replays,
+                  also after the restart; a later step is accepted
+        """
+        path = str(tmp_path / 'mfa.log')
+        store = mfa_routes.MfaEnrollmentStore(path)
+        store.begin('alice@capsule.com', SECRET, now=NOW)
+
+        assert store.verify('alice@capsule.com', code_at(SECRET, NOW + 3600), now=NOW) == 'invalid'
+        assert store.verify('alice@capsule.com', code_at(SECRET, NOW), now=NOW) is None
+        assert store.is_enabled('alice@capsule.com') and not store.pending
+        assert store.verify('alice@capsule.com', code_at(SECRET, NOW), now=NOW + 5) == 'replayed'
+        assert store.verify('alice@capsule.com', code_at(SECRET, NOW - 30), now=NOW) == 'replayed'
+
+        reopened = mfa_routes.MfaEnrollmentStore(path)
+        assert reopened.is_enabled('alice@capsule.com')
+        assert reopened.verify('alice@capsule.com', code_at(SECRET, NOW), now=NOW + 10) == 'replayed'
+        assert reopened.verify('alice@capsule.com', code_at(SECRET, NOW + 30), now=NOW + 30) is None
+        assert (Path(path).stat().st_mode & 0o777) == 0o600
+
+    def test_log_compaction_and_torn_line(self, tmp_path, monkeypatch):
+        """
+        Test: Enough verifications and removals to trigger compaction, then a partial last line
+        Expected: Log is rewritten to one line per live user; a torn trailing line is
+                  cut off on replay so later appends stay readable
+        """
+        monkeypatch.setattr(mfa_routes, 'MFA_COMPACT_SLACK', 0)
+        path = tmp_path / 'mfa.log'
+        store = mfa_routes.MfaEnrollmentStore(str(path))
+        for i in range(4):
+            email = f'user{i}@capsule.com'
+            store.begin(email, SECRET, now=NOW)
+            assert store.verify(email, code_at(SECRET, NOW), now=NOW) is None
+        store.remove('user0@capsule.com')
+        store.remove('user1@capsule.com')
+
+        assert [line.split('"email":"')[1][:5] for line in path.read_text().splitlines()] == ['user2', 'user3']
+        with open(path, 'a') as f:
+            f.write('{"op":"enroll","email":"tor')
+
+        reopened = mfa_routes.MfaEnrollmentStore(str(path))
+        assert set(reopened.verified) == {'user2@capsule.com', 'user3@capsule.com'}
+        reopened.remove('user2@capsule.com')
+        assert set(mfa_routes.MfaEnrollmentStore(str(path)).verified) == {'user3@capsule.com'}
+
+    def test_non_digit_codes_are_invalid(self, tmp_path):
+        """
+        Test: Verify six-character codes with a non-ASCII character, letters and full-width digits
+        Expected: Each is reported as invalid (no TypeError) and the real code still enrolls
+        """
+        store = mfa_routes.MfaEnrollmentStore(str(tmp_path / 'mfa.log'))
+        store.begin('alice@capsule.com', SECRET, now=NOW)
+
+        for code in ('12345é', 'abcdef', '１２３４５６'):
+            assert store.verify('alice@capsule.com', code, now=NOW) == 'invalid'
+        assert store.verify('alice@capsule.com', code_at(SECRET, NOW), now=NOW) is None
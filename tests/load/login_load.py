@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Concurrent load harness for the passwordless login flow.
+
+Runs the portal app (extracted from terraform/envs/tier5/user_data.sh) in
+process behind httpx's ASGI transport, with no AWS account needed:
+
+- Cognito custom auth is a local stand-in that invokes the three real
+  Lambda handlers (define -> create -> verify -> define) and issues a
+  jose-encoded ID token when the define handler says so
+- DynamoDB (MFA codes) and SES are in-memory fakes; the code is read back
+  from the fake SES outbox, like a user reading their email
+- EC2 is the FakeEC2 from tests/portal/fake_aws.py
+
+Each virtual user runs POST /login -> POST /verify-code -> GET / ->
+GET /api/ec2/instances with its own cookie jar and X-Forwarded-For IP.
+For each concurrency level the harness reports throughput, p50/p95/p99
+latency per step and event-loop lag (how late a 10ms timer fires on the
+loop that serves the app - synchronous AWS calls in async routes show up
+here).
+
+Usage:
+    python tests/load/login_load.py --workers 1,10,50,200 --users 400
+    python tests/load/login_load.py --workers 50 --aws-latency-ms 40 --json
+
+The load generator shares the event loop with the app, so absolute numbers
+are a lower bound for a deployed instance; compare levels and commits
+rather than reading them as production capacity.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+LOAD_DIR = Path(__file__).resolve().parent
+REPO_ROOT = LOAD_DIR.parents[1]
+TIER5 = REPO_ROOT / "terraform" / "envs" / "tier5"
+
+sys.path.insert(0, str(REPO_ROOT / "tests" / "portal"))
+sys.path.insert(0, str(TIER5 / "lambdas"))
+sys.path.insert(0, str(TIER5))
+
+# Before anything builds a boto3 client
+for name, value in {
+    "AWS_REGION": "us-west-2",
+    "AWS_DEFAULT_REGION": "us-west-2",
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "MFA_CODES_TABLE": "employee-portal-mfa-codes",
+    "RECONCILER_ENABLED": "false",
+}.items():
+    os.environ.setdefault(name, value)
+
+from fake_aws import FakeCognito, FakeEC2, make_instance, make_security_group  # noqa: E402
+from portal_sources import import_portal  # noqa: E402
+
+STEPS = ("login", "verify_code", "home", "instances")
+AREAS = ("engineering", "hr", "automation", "product")
+CODE_PATTERN = re.compile(r"verification code is: (\d{6})")
+SESSION_INPUT = re.compile(r'name="session" value="([^"]+)"')
+
+
+# ============================================================================
+# FAKE AWS BACK END
+# ============================================================================
+
+class FakeMfaCodesTable:
+    """In-memory stand-in for the DynamoDB MFA codes table."""
+
+    def __init__(self):
+        self.items = {}
+        self.lock = threading.Lock()
+
+    def put_item(self, Item):
+        with self.lock:
+            self.items[Item['username']] = dict(Item)
+
+    def get_item(self, Key):
+        with self.lock:
+            item = self.items.get(Key['username'])
+        return {'Item': dict(item)} if item else {}
+
+    def delete_item(self, Key):
+        with self.lock:
+            self.items.pop(Key['username'], None)
+
+
+class FakeSES:
+    """Captures outgoing code emails; outbox maps recipient -> last code."""
+
+    def __init__(self):
+        self.outbox = {}
+
+    def send_email(self, Source, Destination, Message):
+        code = CODE_PATTERN.search(Message['Body']['Text']['Data']).group(1)
+        for recipient in Destination['ToAddresses']:
+            self.outbox[recipient] = code
+        return {'MessageId': uuid.uuid4().hex}
+
+
+class LatencyMixin:
+    """Adds a fixed blocking delay to every call, like a boto3 round trip."""
+
+    latency = 0.0
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class LoadEC2(LatencyMixin, FakeEC2):
+    """FakeEC2 that is safe to call from the portal's worker threads."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+
+    def describe_instances(self, **kwargs):
+        self._round_trip()
+        with self.lock:
+            return super().describe_instances(**kwargs)
+
+    def describe_security_groups(self, **kwargs):
+        self._round_trip()
+        with self.lock:
+            return super().describe_security_groups(**kwargs)
+
+    def authorize_security_group_ingress(self, **kwargs):
+        self._round_trip()
+        with self.lock:
+            return super().authorize_security_group_ingress(**kwargs)
+
+    def revoke_security_group_ingress(self, **kwargs):
+        self._round_trip()
+        with self.lock:
+            return super().revoke_security_group_ingress(**kwargs)
+
+
+class CognitoCustomAuth(LatencyMixin, FakeCognito):
+    """
+    Cognito user pool stand-in that runs the custom auth Lambda triggers.
+
+    initiate_auth(CUSTOM_AUTH) and respond_to_auth_challenge follow the
+    same trigger sequence Cognito does, with the real handlers from
+    terraform/envs/tier5/lambdas.
+    """
+
+    class exceptions(FakeCognito.exceptions):
+        class NotAuthorizedException(Exception):
+            pass
+
+    def __init__(self, define, create, verify, **kwargs):
+        super().__init__(**kwargs)
+        self.define, self.create, self.verify = define, create, verify
+        # Session token -> {'username', 'history', 'private'}
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def _event(self, username, history, **request):
+        request.update({'session': history, 'userAttributes': {'email': username}})
+        return {'request': request, 'response': {}}
+
+    def _issue_challenge(self, username, history):
+        event = self.create.lambda_handler(
+            self._event(username, history, challengeName='CUSTOM_CHALLENGE'), None)
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.sessions[token] = {
+                'username': username,
+                'history': history,
+                'private': event['response']['privateChallengeParameters']
+            }
+        return {
+            'ChallengeName': 'CUSTOM_CHALLENGE',
+            'Session': token,
+            'ChallengeParameters': event['response']['publicChallengeParameters']
+        }
+
+    def _tokens(self, email):
+        from jose import jwt
+
+        username = self._require(email)
+        groups = sorted(self.memberships[username])
+        id_token = jwt.encode({
+            'email': email,
+            'cognito:username': username,
+            'cognito:groups': groups,
+            'token_use': 'id',
+            'exp': int(time.time()) + 3600
+        }, 'load-test-key')
+        return {'AuthenticationResult': {
+            'IdToken': id_token,
+            'RefreshToken': uuid.uuid4().hex,
+            'ExpiresIn': 3600,
+            'TokenType': 'Bearer'
+        }}
+
+    def initiate_auth(self, AuthFlow, ClientId, AuthParameters):
+        self.calls['initiate_auth'] += 1
+        self._round_trip()
+        if AuthFlow != 'CUSTOM_AUTH':
+            raise self.exceptions.NotAuthorizedException(f'{AuthFlow} is not supported by the load harness')
+        # The portal signs in with the email alias; sessions and triggers use it as-is
+        username = AuthParameters['USERNAME']
+        self._require(username)
+
+        event = self.define.lambda_handler(self._event(username, []), None)
+        if event['response']['failAuthentication']:
+            raise self.exceptions.NotAuthorizedException('Incorrect username or password.')
+        return self._issue_challenge(username, [])
+
+    def respond_to_auth_challenge(self, ClientId, ChallengeName, Session, ChallengeResponses):
+        self.calls['respond_to_auth_challenge'] += 1
+        self._round_trip()
+        with self.lock:
+            state = self.sessions.pop(Session, None)
+        if state is None or state['username'] != ChallengeResponses['USERNAME']:
+            raise self.exceptions.NotAuthorizedException('Invalid session for the user.')
+        username = state['username']
+
+        event = self.verify.lambda_handler(self._event(
+            username, state['history'],
+            privateChallengeParameters=state['private'],
+            challengeAnswer=ChallengeResponses['ANSWER']
+        ), None)
+        history = state['history'] + [{
+            'challengeName': 'CUSTOM_CHALLENGE',
+            'challengeResult': event['response']['answerCorrect']
+        }]
+
+        event = self.define.lambda_handler(self._event(username, history), None)
+        if event['response']['issueTokens']:
+            return self._tokens(username)
+        if event['response']['failAuthentication']:
+            raise self.exceptions.NotAuthorizedException('Incorrect username or password.')
+        return self._issue_challenge(username, history)
+
+    def admin_list_groups_for_user(self, **kwargs):
+        self._round_trip()
+        return super().admin_list_groups_for_user(**kwargs)
+
+
+def user_email(index: int) -> str:
+    return f'load{index:05d}@capsule.com'
+
+
+def user_ip(index: int) -> str:
+    return f'198.18.{index // 250}.{index % 250 + 1}'
+
+
+def build_environment(users: int, aws_latency_ms: float = 0, workdir: str = None):
+    """
+    Import the portal and wire it to the fake AWS back end.
+
+    Args:
+        users: Number of Cognito users to create (spread across the areas)
+        aws_latency_ms: Blocking delay added to each Cognito/EC2 call
+        workdir: Where to extract the app (default: a new temp directory)
+
+    Returns:
+        tuple: (portal module, CognitoCustomAuth, FakeSES)
+    """
+    import create_auth_challenge
+    import define_auth_challenge
+    import verify_auth_challenge
+
+    table, ses = FakeMfaCodesTable(), FakeSES()
+    create_auth_challenge.mfa_codes_table = table
+    create_auth_challenge.ses_client = ses
+    verify_auth_challenge.mfa_codes_table = table
+
+    workdir = Path(workdir or tempfile.mkdtemp(prefix='portal-load-'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        portal = import_portal(workdir, 'portal_load_app')
+
+    cognito = CognitoCustomAuth(
+        define_auth_challenge, create_auth_challenge, verify_auth_challenge,
+        users={user_email(i): [AREAS[i % len(AREAS)]] for i in range(users)}
+    )
+    ec2 = LoadEC2(
+        instances=[make_instance(f'i-{area}-{n}', area) for area in AREAS for n in range(3)],
+        security_groups=[make_security_group('sg-launched')]
+    )
+    cognito.latency = ec2.latency = aws_latency_ms / 1000
+    portal.cognito_client = cognito
+    portal.ec2_client = ec2
+    return portal, cognito, ses
+
+
+# ============================================================================
+# LOAD GENERATOR
+# ============================================================================
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+async def monitor_loop_lag(samples: list, stop: asyncio.Event, interval: float = 0.01):
+    """Record how late a sleep(interval) wakes up until stop is set."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+
+async def login_flow(portal, ses, index: int, timings: dict, errors: list):
+    """One virtual user: log in with the emailed code, open home, list instances."""
+    import httpx
+
+    email = user_email(index)
+    headers = {'X-Forwarded-For': user_ip(index)}
+    transport = httpx.ASGITransport(app=portal.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url='https://testserver', headers=headers) as client:
+        async def step(name, expected, send):
+            started = time.perf_counter()
+            response = await send()
+            timings[name].append(time.perf_counter() - started)
+            if response.status_code != expected:
+                raise RuntimeError(f'{name}: HTTP {response.status_code}')
+            return response
+
+        try:
+            response = await step('login', 200, lambda: client.post('/login', data={'email': email}))
+            match = SESSION_INPUT.search(response.text)
+            if not match:
+                raise RuntimeError('login: no challenge session in page')
+            code = ses.outbox.pop(email)
+
+            await step('verify_code', 303, lambda: client.post('/verify-code', data={
+                'code': code, 'session': match.group(1), 'email': email
+            }))
+            if 'auth_token' not in client.cookies:
+                raise RuntimeError('verify_code: no auth_token cookie')
+
+            await step('home', 200, lambda: client.get('/'))
+            await step('instances', 200, lambda: client.get('/api/ec2/instances'))
+        except Exception as e:
+            errors.append(f'{email}: {e}')
+
+
+async def run_level(portal, ses, workers: int, users: int) -> dict:
+    """
+    Run `users` login flows with `workers` of them in flight at a time.
+
+    Returns:
+        dict: Throughput, per-step latency percentiles (ms), loop lag and errors
+    """
+    timings = defaultdict(list)
+    errors, lag = [], []
+    queue = asyncio.Queue()
+    for index in range(users):
+        queue.put_nowait(index)
+
+    async def worker():
+        while True:
+            try:
+                index = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await login_flow(portal, ses, index, timings, errors)
+
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_loop_lag(lag, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+
+    requests = sum(len(v) for v in timings.values())
+    ms = lambda seconds: round(seconds * 1000, 1)
+    return {
+        'workers': workers,
+        'users': users,
+        'seconds': round(elapsed, 2),
+        'logins_per_second': round((users - len(errors)) / elapsed, 1),
+        'requests_per_second': round(requests / elapsed, 1),
+        'latency_ms': {
+            name: {p: ms(percentile(timings[name], int(p[1:]))) for p in ('p50', 'p95', 'p99')}
+            for name in STEPS
+        },
+        'loop_lag_ms': {'p99': ms(percentile(lag, 99)), 'max': ms(max(lag, default=0))},
+        'errors': len(errors),
+        'error_samples': errors[:5]
+    }
+
+
+async def run(worker_levels: list, users: int, aws_latency_ms: float = 0) -> list:
+    """Run every concurrency level against one app instance. Returns one result per level."""
+    portal, cognito, ses = build_environment(max(users, max(worker_levels)), aws_latency_ms)
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for workers in worker_levels:
+            results.append(await run_level(portal, ses, workers, max(users, workers)))
+    return results
+
+
+def format_report(results: list) -> str:
+    """Render results as a fixed-width table."""
+    lines = [
+        f"{'workers':>7} {'users':>6} {'logins/s':>9} {'req/s':>8} "
+        + ' '.join(f'{name + " p50/p95/p99 ms":>28}' for name in STEPS)
+        + f" {'lag p99/max':>13} {'errors':>6}"
+    ]
+    for r in results:
+        cells = ' '.join(
+            f"{'/'.join(str(r['latency_ms'][name][p]) for p in ('p50', 'p95', 'p99')):>28}"
+            for name in STEPS
+        )
+        lag = f"{r['loop_lag_ms']['p99']}/{r['loop_lag_ms']['max']}"
+        lines.append(
+            f"{r['workers']:>7} {r['users']:>6} {r['logins_per_second']:>9} {r['requests_per_second']:>8} "
+            f"{cells} {lag:>13} {r['errors']:>6}"
+        )
+        lines.extend(f'        ! {sample}' for sample in r['error_samples'])
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent load test for the portal login flow')
+    parser.add_argument('--workers', default='1,10,50,200',
+                        help='Comma-separated concurrency levels (virtual users in flight)')
+    parser.add_argument('--users', type=int, default=200,
+                        help='Login flows per level (at least the worker count)')
+    parser.add_argument('--aws-latency-ms', type=float, default=0,
+                        help='Blocking delay added to each fake Cognito/EC2 call')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    levels = [int(w) for w in args.workers.split(',') if w.strip()]
+    results = asyncio.run(run(levels, args.users, args.aws_latency_ms))
+    print(json.dumps(results, indent=2) if args.json else format_report(results))
+    return 1 if any(r['errors'] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""
+Smoke test for the login load harness (login_load.py)
+
+Runs a handful of virtual users through the full passwordless flow so the
+harness stays in step with the app and the Lambda handlers.
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("jose")
+pytest.importorskip("boto3")
+
+import login_load  # noqa: E402
+
+
+class TestLoginLoad:
+    """Test cases for the login load harness"""
+
+    def test_concurrent_logins_complete(self):
+        """
+        Test: Two concurrency levels of eight users each through the custom auth stand-in
+        Expected: Every flow logs in with its emailed code and reaches / and
+                  the instance API; latency and loop lag are reported
+        """
+        results = asyncio.run(login_load.run([1, 4], users=8))
+
+        assert [(r['workers'], r['users'], r['errors']) for r in results] == [(1, 8, 0), (4, 8, 0)]
+        for result in results:
+            assert result['logins_per_second'] > 0
+            assert all(result['latency_ms'][step]['p99'] > 0 for step in login_load.STEPS)
+            assert result['loop_lag_ms']['max'] >= result['loop_lag_ms']['p99']
@@ -0,0 +1,40 @@
+"""
+Shared fixtures for portal application unit tests.
+
+The portal app is embedded in terraform/envs/tier5/user_data.sh as a heredoc.
+These fixtures extract app.py and the Jinja templates the same way
+deploy-portal.sh does, substitute the Terraform placeholders and import the
+result as a fresh module for each test.
+"""
+
+import importlib.util
+import itertools
+import sys
+
+import pytest
+
+from portal_sources import extract_portal_sources
+
+_module_counter = itertools.count()
+
+
+@pytest.fixture
+def portal(tmp_path, monkeypatch):
+    """Import a fresh copy of the portal app module (no AWS calls are made at import)."""
+    pytest.importorskip("fastapi")
+    pytest.importorskip("boto3")
+    pytest.importorskip("jose")
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("RECONCILER_ENABLED", "false")
+
+    app_path = extract_portal_sources(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module_name = f"portal_app_{next(_module_counter)}"
+    spec = importlib.util.spec_from_file_location(module_name, app_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    yield module
+    sys.modules.pop(module_name, None)
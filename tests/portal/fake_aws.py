@@ -0,0 +1,269 @@
+"""
+In-memory stand-ins for the boto3 EC2 and Cognito clients used by the portal.
+
+Only the calls the portal makes are implemented, with response shapes
+matching boto3. Every call is counted in .calls so tests can assert on
+AWS round trips.
+"""
+
+import copy
+import fnmatch
+import uuid
+from collections import Counter
+
+
+class FakePaginator:
+    """Single-page paginator over a fake client method."""
+
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, **kwargs):
+        yield self.method(**kwargs)
+
+
+class FakeClientError(Exception):
+    """Generic AWS error (message mimics botocore error strings)."""
+
+
+class FakeEC2:
+    """Fake EC2 client holding instances and security groups."""
+
+    def __init__(self, instances=None, security_groups=None):
+        self.instances = instances or []
+        self.security_groups = {sg['GroupId']: sg for sg in (security_groups or [])}
+        self.calls = Counter()
+
+    def get_paginator(self, name):
+        return FakePaginator(getattr(self, name))
+
+    # -- instances ----------------------------------------------------------
+
+    def _matches(self, instance, filters):
+        for f in filters or []:
+            name, values = f['Name'], f['Values']
+            if name.startswith('tag:'):
+                tag = next((t['Value'] for t in instance.get('Tags', []) if t['Key'] == name[4:]), None)
+                if tag is None or not any(fnmatch.fnmatch(tag, v) for v in values):
+                    return False
+            elif name == 'instance-state-name':
+                if instance['State']['Name'] not in values:
+                    return False
+        return True
+
+    def describe_instances(self, Filters=None, InstanceIds=None, **kwargs):
+        self.calls['describe_instances'] += 1
+        selected = [i for i in self.instances
+                    if (InstanceIds is None or i['InstanceId'] in InstanceIds) and self._matches(i, Filters)]
+        for instance in selected:
+            for sg in instance.get('SecurityGroups', []):
+                sg.setdefault('GroupName', self.security_groups.get(sg['GroupId'], {}).get('GroupName'))
+        return {'Reservations': [{'Instances': copy.deepcopy(selected)}] if selected else []}
+
+    def create_tags(self, Resources, Tags):
+        self.calls['create_tags'] += 1
+        for instance in self.instances:
+            if instance['InstanceId'] in Resources:
+                existing = {t['Key']: t for t in instance.setdefault('Tags', [])}
+                for tag in Tags:
+                    existing[tag['Key']] = dict(tag)
+                instance['Tags'] = list(existing.values())
+
+    # -- security groups ----------------------------------------------------
+
+    def describe_security_groups(self, Filters=None, GroupIds=None, **kwargs):
+        self.calls['describe_security_groups'] += 1
+        groups = list(self.security_groups.values())
+        if GroupIds is not None:
+            groups = [sg for sg in groups if sg['GroupId'] in GroupIds]
+        for f in Filters or []:
+            if f['Name'] == 'group-name':
+                groups = [sg for sg in groups if sg['GroupName'] in f['Values']]
+        return {'SecurityGroups': copy.deepcopy(groups)}
+
+    def _permission(self, sg, protocol, port):
+        for permission in sg.setdefault('IpPermissions', []):
+            if (permission['IpProtocol'], permission.get('FromPort'), permission.get('ToPort')) == (protocol, port, port):
+                return permission
+        permission = {'IpProtocol': protocol, 'FromPort': port, 'ToPort': port, 'IpRanges': []}
+        sg['IpPermissions'].append(permission)
+        return permission
+
+    def authorize_security_group_ingress(self, GroupId, IpPermissions):
+        self.calls['authorize_security_group_ingress'] += 1
+        sg = self.security_groups[GroupId]
+        for request in IpPermissions:
+            permission = self._permission(sg, request['IpProtocol'], request['FromPort'])
+            existing = {r['CidrIp'] for r in permission['IpRanges']}
+            if any(r['CidrIp'] in existing for r in request['IpRanges']):
+                raise FakeClientError('InvalidPermission.Duplicate: the specified rule already exists')
+        for request in IpPermissions:
+            permission = self._permission(sg, request['IpProtocol'], request['FromPort'])
+            permission['IpRanges'].extend(copy.deepcopy(request['IpRanges']))
+
+    def revoke_security_group_ingress(self, GroupId, IpPermissions):
+        self.calls['revoke_security_group_ingress'] += 1
+        sg = self.security_groups[GroupId]
+        for request in IpPermissions:
+            permission = self._permission(sg, request['IpProtocol'], request['FromPort'])
+            cidrs = {r['CidrIp'] for r in request['IpRanges']}
+            if not cidrs <= {r['CidrIp'] for r in permission['IpRanges']}:
+                raise FakeClientError('InvalidPermission.NotFound: the specified rule does not exist')
+            permission['IpRanges'] = [r for r in permission['IpRanges'] if r['CidrIp'] not in cidrs]
+
+    def rules(self, group_id):
+        """Test helper: set of (port, cidr) currently on a security group."""
+        return {(p['FromPort'], r['CidrIp'])
+                for p in self.security_groups[group_id].get('IpPermissions', [])
+                for r in p['IpRanges']}
+
+
+class FakeCognito:
+    """
+    Fake Cognito user pool that signs users in by email.
+
+    As with username_attributes=["email"], each user gets a UUID username and
+    the admin_* calls accept either that username or the email alias.
+    """
+
+    class exceptions:
+        class ResourceNotFoundException(Exception):
+            pass
+
+        class UserNotFoundException(Exception):
+            pass
+
+    def __init__(self, users=None, groups=None):
+        self.groups = {name: {'GroupName': name, 'Description': ''} for name in (groups or [])}
+        self.users = {}
+        self.memberships = {}
+        self.calls = Counter()
+        for email, user_groups in (users or {}).items():
+            username = self._add_user(email)
+            for group in user_groups:
+                self.groups.setdefault(group, {'GroupName': group, 'Description': ''})
+                self.memberships[username].add(group)
+
+    def _add_user(self, email, status='CONFIRMED'):
+        username = str(uuid.uuid5(uuid.NAMESPACE_URL, email))
+        self.users[username] = {
+            'Username': username,
+            'Attributes': [{'Name': 'email', 'Value': email}],
+            'UserStatus': status,
+            'Enabled': True
+        }
+        self.memberships[username] = set()
+        return username
+
+    @staticmethod
+    def _email(user):
+        return next(a['Value'] for a in user['Attributes'] if a['Name'] == 'email')
+
+    def _resolve(self, name):
+        """Username for a username or email alias, or None."""
+        if name in self.users:
+            return name
+        return next((u for u, user in self.users.items() if self._email(user) == name), None)
+
+    def _require(self, name):
+        username = self._resolve(name)
+        if username is None:
+            raise self.exceptions.UserNotFoundException(name)
+        return username
+
+    def username_of(self, email):
+        """Test helper: the UUID username for an email, or None."""
+        return self._resolve(email)
+
+    def groups_of(self, email):
+        """Test helper: set of groups the user with this email belongs to."""
+        return self.memberships[self._require(email)]
+
+    def get_paginator(self, name):
+        return FakePaginator(getattr(self, name))
+
+    def list_groups(self, UserPoolId, **kwargs):
+        self.calls['list_groups'] += 1
+        return {'Groups': [dict(g) for g in self.groups.values()]}
+
+    def get_group(self, UserPoolId, GroupName):
+        self.calls['get_group'] += 1
+        if GroupName not in self.groups:
+            raise self.exceptions.ResourceNotFoundException(GroupName)
+        return {'Group': dict(self.groups[GroupName])}
+
+    def create_group(self, UserPoolId, GroupName, Description=''):
+        self.calls['create_group'] += 1
+        self.groups[GroupName] = {'GroupName': GroupName, 'Description': Description}
+
+    def list_users(self, UserPoolId, AttributesToGet=None, Filter=None, **kwargs):
+        self.calls['list_users'] += 1
+        users = list(self.users.values())
+        if Filter:
+            # Only 'email ^= "prefix"' is used by the portal
+            prefix = Filter.split('"')[1]
+            users = [u for u in users if self._email(u).startswith(prefix)]
+        return {'Users': copy.deepcopy(users)}
+
+    def list_users_in_group(self, UserPoolId, GroupName, **kwargs):
+        self.calls['list_users_in_group'] += 1
+        return {'Users': [copy.deepcopy(self.users[u]) for u, g in self.memberships.items() if GroupName in g]}
+
+    def admin_list_groups_for_user(self, UserPoolId, Username):
+        self.calls['admin_list_groups_for_user'] += 1
+        username = self._require(Username)
+        return {'Groups': [dict(self.groups[g]) for g in sorted(self.memberships[username])]}
+
+    def admin_list_user_auth_events(self, UserPoolId, Username, MaxResults=1):
+        self.calls['admin_list_user_auth_events'] += 1
+        return {'AuthEvents': []}
+
+    def admin_add_user_to_group(self, UserPoolId, Username, GroupName):
+        self.calls['admin_add_user_to_group'] += 1
+        username = self._require(Username)
+        if GroupName not in self.groups:
+            raise self.exceptions.ResourceNotFoundException(GroupName)
+        self.memberships[username].add(GroupName)
+
+    def admin_remove_user_from_group(self, UserPoolId, Username, GroupName):
+        self.calls['admin_remove_user_from_group'] += 1
+        self.memberships[self._require(Username)].discard(GroupName)
+
+    def admin_create_user(self, UserPoolId, Username, **kwargs):
+        self.calls['admin_create_user'] += 1
+        if self._resolve(Username) is not None:
+            raise FakeClientError('UsernameExistsException: User account already exists')
+        username = self._add_user(Username, status='FORCE_CHANGE_PASSWORD')
+        return {'User': copy.deepcopy(self.users[username])}
+
+    def admin_delete_user(self, UserPoolId, Username):
+        self.calls['admin_delete_user'] += 1
+        username = self._require(Username)
+        del self.users[username]
+        del self.memberships[username]
+
+
+def make_instance(instance_id, area, sg_id='sg-launched', state='running', name=None):
+    """Build a describe_instances-shaped instance dict."""
+    tags = [{'Key': 'Name', 'Value': name or f'{area}-box'}]
+    if area:
+        tags.append({'Key': 'VibeCodeArea', 'Value': area})
+    return {
+        'InstanceId': instance_id,
+        'InstanceType': 't3.micro',
+        'State': {'Name': state},
+        'PrivateIpAddress': '10.0.1.10',
+        'Tags': tags,
+        'SecurityGroups': [{'GroupId': sg_id, 'GroupName': 'vibecode-launched-instances'}]
+    }
+
+
+def make_security_group(sg_id='sg-launched', rules=()):
+    """Build a vibecode-launched-instances SG. rules: iterable of (port, cidr, description)."""
+    sg = {'GroupId': sg_id, 'GroupName': 'vibecode-launched-instances', 'IpPermissions': []}
+    by_port = {}
+    for port, cidr, description in rules:
+        by_port.setdefault(port, []).append({'CidrIp': cidr, 'Description': description})
+    for port, ranges in by_port.items():
+        sg['IpPermissions'].append({'IpProtocol': 'tcp', 'FromPort': port, 'ToPort': port, 'IpRanges': ranges})
+    return sg
@@ -0,0 +1,56 @@
+"""
+Extracts the portal app from terraform/envs/tier5/user_data.sh.
+
+app.py and the Jinja templates are embedded there as heredocs; this pulls
+them out the same way deploy-portal.sh does and substitutes the Terraform
+placeholders. Used by the unit-test fixtures and the load harness.
+"""
+
+import importlib.util
+import re
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+USER_DATA = REPO_ROOT / "terraform" / "envs" / "tier5" / "user_data.sh"
+AWS_CLIENTS = REPO_ROOT / "terraform" / "envs" / "tier5" / "aws_clients.py"
+
+TEMPLATE_VARS = {
+    "user_pool_id": "us-west-2_TESTPOOL",
+    "aws_region": "us-west-2",
+    "client_id": "test-client-id",
+    "client_secret": "test-client-secret",
+}
+
+def extract_portal_sources(target_dir: Path) -> Path:
+    """Write app.py, aws_clients.py and templates/ into target_dir. Returns app.py path."""
+    text = USER_DATA.read_text()
+
+    app_source = re.search(r"^cat > /opt/employee-portal/app\.py << EOFAPP\n(.*?)^EOFAPP$", text, re.S | re.M).group(1)
+    for name, value in TEMPLATE_VARS.items():
+        app_source = app_source.replace("${" + name + "}", value)
+
+    templates_dir = target_dir / "templates"
+    templates_dir.mkdir(parents=True, exist_ok=True)
+    app_source = app_source.replace("/opt/employee-portal/templates", str(templates_dir))
+
+    for match in re.finditer(r"^cat > /opt/employee-portal/templates/([\w.]+) << '(\w+)'\n(.*?)^\2$", text, re.S | re.M):
+        (templates_dir / match.group(1)).write_text(match.group(3))
+
+    (target_dir / "aws_clients.py").write_text(AWS_CLIENTS.read_text())
+
+    app_path = target_dir / "app.py"
+    app_path.write_text(app_source)
+    return app_path
+
+
+def import_portal(target_dir: Path, module_name: str):
+    """Extract the portal into target_dir and import app.py as module_name."""
+    app_path = extract_portal_sources(target_dir)
+    if str(target_dir) not in sys.path:
+        sys.path.insert(0, str(target_dir))
+    spec = importlib.util.spec_from_file_location(module_name, app_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
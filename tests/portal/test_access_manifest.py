@@ -0,0 +1,136 @@
+"""
+Unit tests for the per-user access manifest (/api/me/access) in app.py
+
+Covers what the manifest contains, that page navigations share one cached
+manifest, and each invalidation path: groups, IP, the user's own membership,
+whitelist changes and inventory expiry (rescanned in the background).
+"""
+
+import time
+
+import pytest
+
+from fake_aws import FakeCognito, FakeEC2, make_instance, make_security_group
+
+
+def make_client(portal, groups, ip='73.158.64.21'):
+    from jose import jwt
+    from starlette.testclient import TestClient
+
+    client = TestClient(portal.app, base_url='https://testserver', headers={'X-Forwarded-For': ip})
+    client.cookies.set('auth_token', jwt.encode({
+        'email': 'alice@capsule.com', 'cognito:groups': groups, 'exp': int(time.time()) + 3600
+    }, 'test-key'))
+    return client
+
+
+def wait_for_scans(service, scans):
+    """Wait for background rescans to reach a scan count."""
+    deadline = time.monotonic() + 5
+    while service.scans < scans or service._scan_lock.locked():
+        assert time.monotonic() < deadline, 'background rescan did not finish'
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def ec2(portal):
+    """Running engineering box (443 open to alice's IP), stopped hr box, automation box."""
+    portal.cognito_client = FakeCognito(users={'alice@capsule.com': ['engineering', 'hr']})
+    ec2 = FakeEC2(
+        instances=[
+            make_instance('i-eng', 'engineering'),
+            make_instance('i-hr', 'hr', state='stopped'),
+            make_instance('i-auto', 'automation'),
+        ],
+        security_groups=[make_security_group('sg-launched', rules=[(443, '73.158.64.21/32', 'User=alice@capsule.com')])]
+    )
+    portal.ec2_client = ec2
+    return ec2
+
+
+class TestAccessManifest:
+    """Test cases for the access manifest"""
+
+    def test_pages_share_one_manifest(self, portal, ec2):
+        """
+        Test: Navigate home, both area pages, /ec2-resources and /api/me/access
+        Expected: One inventory scan and one manifest build for the whole visit;
+                  areas, SSM URLs, reachability and per-port whitelist status are right
+        """
+        client = make_client(portal, ['engineering', 'hr'])
+
+        home = client.get('/')
+        assert 'href="/areas/engineering"' in home.text and 'href="/areas/hr"' in home.text
+
+        engineering = client.get('/areas/engineering', follow_redirects=False)
+        assert engineering.status_code == 302
+        assert engineering.headers['location'] == portal.build_ssm_url('i-eng', 'us-west-2')
+        assert 'EC2 instance is stopped' in client.get('/areas/hr').text
+        assert client.get('/ec2-resources').status_code == 200
+
+        manifest = client.get('/api/me/access').json()
+        assert manifest['client_ip'] == '73.158.64.21'
+        assert manifest['area_groups'] == ['engineering', 'hr']
+        assert [(a['group'], a['instance']['instance_id']) for a in manifest['areas']] == [('engineering', 'i-eng'), ('hr', 'i-hr')]
+        by_id = {i['instance_id']: i for i in manifest['instances']}
+        assert (by_id['i-eng']['port_80_whitelisted'], by_id['i-eng']['port_443_whitelisted']) == (False, True)
+        assert by_id['i-eng']['reachable'] and by_id['i-eng']['ssm_url']
+        assert not by_id['i-auto']['reachable'] and by_id['i-auto']['ssm_url'] is None
+
+        assert (ec2.calls['describe_instances'], ec2.calls['describe_security_groups']) == (1, 1)
+        assert (portal.access_manifests.scans, portal.access_manifests.builds) == (1, 1)
+
+    def test_invalidation(self, portal, ec2, monkeypatch):
+        """
+        Test: Change groups, IP, membership and whitelist rules; let the inventory expire
+        Expected: Groups/IP and the user's own membership rebuild without
+                  rescanning, other users' membership changes don't; a whitelist
+                  change is rescanned in the background and then flips port
+                  status; an unchanged rescan keeps the version
+        """
+        service = portal.access_manifests
+        portal.membership.load()
+        client = make_client(portal, ['engineering'])
+        first = client.get('/api/me/access').json()
+        portal.membership.apply_changes([('add_user', 'u-zed', 'zed@capsule.com')])
+        client.get('/api/me/access')
+        assert service.builds == 1
+        alice = portal.membership.find_username('alice@capsule.com')
+        portal.membership.apply_changes([('remove_from_group', alice, 'hr')])
+        client.get('/api/me/access')
+        assert service.builds == 2
+
+        make_client(portal, ['engineering', 'hr']).get('/api/me/access')
+        make_client(portal, ['engineering'], ip='203.0.113.9').get('/api/me/access')
+        client.get('/api/me/access')
+        assert (service.scans, service.builds) == (1, 5)
+
+        assert portal.add_ip_to_security_group('sg-launched', 80, '73.158.64.21', 'User=alice@capsule.com')
+        client.get('/api/me/access')  # starts the background rescan
+        wait_for_scans(service, 2)
+        second = client.get('/api/me/access').json()
+        assert service.scans == 2 and second['inventory_version'] == first['inventory_version'] + 1
+        assert next(i for i in second['instances'] if i['instance_id'] == 'i-eng')['port_80_whitelisted'] is True
+
+        monkeypatch.setattr(portal, 'ACCESS_INVENTORY_TTL', 0)
+        client.get('/api/me/access')
+        wait_for_scans(service, 3)
+        monkeypatch.setattr(portal, 'ACCESS_INVENTORY_TTL', 30)
+        third = client.get('/api/me/access').json()
+        assert service.scans == 3 and third['inventory_version'] == second['inventory_version']
+
+    def test_ec2_down_without_history_still_renders(self, portal, ec2):
+        """
+        Test: EC2 fails before any scan succeeded
+        Expected: Home still lists the areas; the manifest is empty, marked stale and not cached
+        """
+        def broken(**kwargs):
+            raise RuntimeError('throttled')
+        ec2.describe_instances = broken
+        client = make_client(portal, ['engineering'])
+
+        assert 'href="/areas/engineering"' in client.get('/').text
+        response = client.get('/api/me/access')
+        assert response.headers['x-served-stale'] == 'ec2'
+        assert response.json()['instances'] == []
+        assert portal.access_manifests.manifests == {}
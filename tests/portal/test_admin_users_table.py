@@ -0,0 +1,218 @@
+"""
+Unit tests for the paged admin users table (MembershipModel.query and
+/api/admin/users) in app.py
+"""
+
+import time
+
+import pytest
+
+from fake_aws import FakeCognito
+
+EMAILS = ['dan@capsule.com', 'Amy@capsule.com', 'bob@capsule.com', 'cat@capsule.com', 'eve@capsule.com']
+
+
+@pytest.fixture
+def cognito(portal):
+    """Five users with assorted groups; the admin is amy."""
+    cognito = FakeCognito(users={
+        'dan@capsule.com': ['hr'],
+        'Amy@capsule.com': ['admins'],
+        'bob@capsule.com': ['engineering', 'hr'],
+        'cat@capsule.com': [],
+        'eve@capsule.com': ['engineering'],
+    })
+    portal.cognito_client = cognito
+    portal.membership.load()
+    return cognito
+
+
+def make_client(portal, groups=('admins',)):
+    from jose import jwt
+    from starlette.testclient import TestClient
+
+    client = TestClient(portal.app, base_url='https://testserver')
+    client.cookies.set('auth_token', jwt.encode({
+        'email': 'amy@capsule.com', 'cognito:groups': list(groups), 'exp': int(time.time()) + 3600
+    }, 'test-key'))
+    return client
+
+
+def page_through(query, **kwargs):
+    """All rows from following next_cursor until it is None."""
+    rows, cursor = [], None
+    while True:
+        page, cursor, total = query(cursor=cursor, **kwargs)
+        rows.extend(page)
+        if cursor is None:
+            return rows, total
+
+
+class TestUserTableQuery:
+    """Test cases for MembershipModel.query"""
+
+    def test_sort_orders(self, portal, cognito):
+        """
+        Test: Query every sort key ascending and descending, plus a prefix
+        Expected: Email order ignores case; ties break on email; descending is
+                  the exact reverse; the prefix narrows rows and the total
+        """
+        query = portal.membership.query
+
+        rows, _, total = query(limit=50)
+        assert [r['email'] for r in rows] == sorted(EMAILS, key=str.lower) and total == 5
+        assert [r['email'] for r in query(sort='groups', limit=50)[0]] == [
+            'cat@capsule.com', 'Amy@capsule.com', 'eve@capsule.com', 'bob@capsule.com', 'dan@capsule.com'
+        ]
+        for sort in portal.USER_TABLE_SORT_KEYS:
+            ascending = [r['username'] for r in query(sort=sort, limit=50)[0]]
+            descending = [r['username'] for r in query(sort=sort, descending=True, limit=50)[0]]
+            assert descending == ascending[::-1]
+
+        rows, _, total = query(prefix='B', limit=50)
+        assert [r['email'] for r in rows] == ['bob@capsule.com'] and total == 1
+        assert rows[0]['groups'] == ['engineering', 'hr']
+
+    def test_cursor_pages_cover_every_row_once(self, portal, cognito):
+        """
+        Test: Page with limit 2 in each sort order and direction
+        Expected: Pages of at most two rows that together equal the unpaged result
+        """
+        query = portal.membership.query
+        for sort in portal.USER_TABLE_SORT_KEYS:
+            for descending in (False, True):
+                full = query(sort=sort, descending=descending, limit=50)[0]
+                first, cursor, _ = query(sort=sort, descending=descending, limit=2)
+                assert len(first) == 2 and cursor is not None
+                paged, total = page_through(query, sort=sort, descending=descending, limit=2)
+                assert paged == full and total == 5
+
+    def test_cursor_after_a_change(self, portal, cognito):
+        """
+        Test: Take a cursor in email order, add a user before and after it, continue
+        Expected: The next page starts right after the cursor and includes only the later user
+        """
+        model = portal.membership
+        first, cursor, _ = model.query(limit=2)
+        model.add_user('u-aaa', 'aaron@capsule.com')
+        model.add_user('u-zed', 'zed@capsule.com')
+
+        rows, _, total = model.query(cursor=cursor, limit=50)
+        assert [r['email'] for r in first] == ['Amy@capsule.com', 'bob@capsule.com']
+        assert [r['email'] for r in rows] == ['cat@capsule.com', 'dan@capsule.com', 'eve@capsule.com', 'zed@capsule.com']
+        assert total == 7
+
+
+class TestAdminUsersApi:
+    """Test cases for /api/admin/users"""
+
+    def test_pages_round_trip_through_the_cursor(self, portal, cognito):
+        """
+        Test: Page through sort=groups desc with limit 2 via next_cursor
+        Expected: Three pages covering every user once in query() order;
+                  the last page has no next_cursor; the limit is clamped
+        """
+        client = make_client(portal)
+        expected = [r['email'] for r in portal.membership.query(sort='groups', descending=True, limit=50)[0]]
+
+        emails, cursor, pages = [], None, 0
+        while True:
+            params = {'sort': 'groups', 'order': 'desc', 'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            data = client.get('/api/admin/users', params=params).json()
+            assert data['success'] and data['total'] == 5 and len(data['users']) <= 2
+            emails.extend(u['email'] for u in data['users'])
+            pages += 1
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        assert emails == expected and pages == 3
+
+        first = client.get('/api/admin/users', params={'limit': 0}).json()
+        assert len(first['users']) == 1
+        assert set(first['users'][0]) == {'username', 'email', 'status', 'enabled', 'groups', 'last_login'}
+
+    def test_version_bump_invalidates_non_email_cursors(self, portal, cognito):
+        """
+        Test: Take cursors in email and last_login order, record a login, then continue both
+        Expected: The last_login cursor is rejected with 409 stale_cursor; the
+                  email cursor still continues from where it left off
+        """
+        client = make_client(portal)
+        by_email = client.get('/api/admin/users', params={'limit': 2}).json()
+        by_login = client.get('/api/admin/users', params={'sort': 'last_login', 'limit': 2}).json()
+        assert by_email['version'] == by_login['version'] == portal.membership.version
+
+        portal.membership.record_login('cat@capsule.com')
+
+        stale = client.get('/api/admin/users', params={'sort': 'last_login', 'limit': 2, 'cursor': by_login['next_cursor']})
+        assert stale.status_code == 409 and stale.json()['stale_cursor'] is True
+
+        resumed = client.get('/api/admin/users', params={'limit': 2, 'cursor': by_email['next_cursor']}).json()
+        assert [u['email'] for u in resumed['users']] == ['cat@capsule.com', 'dan@capsule.com']
+        assert resumed['version'] == by_email['version'] + 1
+
+    def test_logins_only_invalidate_last_login_cursors(self, portal, cognito):
+        """
+        Test: Page sort=groups and sort=status across record_login calls, then a membership change
+        Expected: Logins leave those cursors valid and the pages cover every user
+                  once; a group change makes the groups cursor stale
+        """
+        client = make_client(portal)
+        for sort in ('groups', 'status'):
+            expected = [r['email'] for r in portal.membership.query(sort=sort, limit=50)[0]]
+            emails, cursor = [], None
+            while True:
+                params = {'sort': sort, 'limit': 2}
+                if cursor:
+                    params['cursor'] = cursor
+                response = client.get('/api/admin/users', params=params)
+                assert response.status_code == 200
+                data = response.json()
+                emails.extend(u['email'] for u in data['users'])
+                cursor = data['next_cursor']
+                if cursor is None:
+                    break
+                portal.membership.record_login(emails[-1])
+            assert emails == expected
+
+        first = client.get('/api/admin/users', params={'sort': 'groups', 'limit': 2}).json()
+        portal.membership.add_to_group(cognito.username_of('cat@capsule.com'), 'hr')
+        stale = client.get('/api/admin/users', params={'sort': 'groups', 'limit': 2, 'cursor': first['next_cursor']})
+        assert stale.status_code == 409
+
+    def test_backfill_bumps_last_login_once(self, portal, cognito):
+        """
+        Test: Backfill last logins for every user from auth events
+        Expected: One last_login sort-version bump for the whole backfill; other orders untouched
+        """
+        from datetime import datetime
+
+        def auth_events(UserPoolId, Username, MaxResults):
+            return {'AuthEvents': [{'EventType': 'SignIn', 'EventResponse': 'Pass', 'CreationDate': datetime(2026, 1, 2)}]}
+        cognito.admin_list_user_auth_events = auth_events
+        model = portal.membership
+        deadline = time.monotonic() + 5
+        while any(r['last_login_source'] == 'modified' for r in model.users.values()):  # load's own backfill
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        for record in model.users.values():
+            record['last_login_source'] = 'modified'
+        before = dict(model.sort_versions)
+
+        model._backfill_last_logins(list(model.users))
+
+        assert model.sort_versions == {**before, 'last_login': before['last_login'] + 1}
+        assert {u['last_login'] for u in model.users_snapshot()} == {'2026-01-02 00:00 UTC'}
+
+    def test_rejects_bad_input_and_non_admins(self, portal, cognito):
+        """
+        Test: Unknown sort, tampered cursor, non-integer limit, non-admin caller
+        Expected: 400 for each bad parameter; 403 for the non-admin
+        """
+        client = make_client(portal)
+        assert client.get('/api/admin/users', params={'sort': 'password'}).status_code == 400
+        assert client.get('/api/admin/users', params={'cursor': 'not-a-cursor'}).status_code == 400
+        assert client.get('/api/admin/users', params={'limit': 'ten'}).status_code == 400
+        assert make_client(portal, groups=['engineering']).get('/api/admin/users').status_code == 403
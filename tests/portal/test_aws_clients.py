@@ -0,0 +1,26 @@
+"""
+Unit tests for the shared AWS client factory (aws_clients.py)
+"""
+
+
+class TestAwsClients:
+    """Test cases for the shared AWS client factory"""
+
+    def test_clients_share_session_and_tuned_config(self, portal):
+        """
+        Test: Request the same client twice, and one with a different timeout
+        Expected: Same object for the same key; pool size, adaptive retries,
+                  keepalive and timeouts set on the config
+        """
+        import aws_clients
+
+        first = aws_clients.get_client('ec2', 'eu-west-1', timeout=4)
+        assert aws_clients.get_client('ec2', 'eu-west-1', timeout=4) is first
+        assert aws_clients.get_client('ec2', 'eu-west-1') is not first
+
+        config = first.meta.config
+        assert config.max_pool_connections == aws_clients.MAX_POOL_CONNECTIONS
+        assert config.retries['mode'] == 'adaptive'
+        assert config.tcp_keepalive is True
+        assert (config.connect_timeout, config.read_timeout) == (4, 4)
+        assert portal.cognito_client.meta.config.read_timeout == portal.AWS_CALL_TIMEOUT
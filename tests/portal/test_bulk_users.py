@@ -0,0 +1,218 @@
+"""
+Unit tests for bulk user provisioning (/api/users/bulk) in app.py
+
+Covers CSV and JSON batches, whole-batch validation, per-row failures, the
+single membership update and the shared rate limit.
+"""
+
+import json
+import time
+
+import pytest
+
+from fake_aws import FakeCognito
+
+
+@pytest.fixture
+def bulk_client(portal):
+    """Admin TestClient over a Cognito fake with an existing team."""
+    from jose import jwt
+    from starlette.testclient import TestClient
+
+    cognito = FakeCognito(users={
+        'admin@capsule.com': ['admins'],
+        'bob@capsule.com': ['hr'],
+        'carol@capsule.com': ['engineering'],
+    }, groups=['product'])
+    portal.cognito_client = cognito
+    portal.membership.load()
+
+    client = TestClient(portal.app, base_url='https://testserver')
+    client.cookies.set('auth_token', jwt.encode({
+        'email': 'admin@capsule.com', 'cognito:groups': ['admins'], 'exp': int(time.time()) + 3600
+    }, 'test-key'))
+    return client, cognito
+
+
+def read_records(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+class TestBulkUsers:
+    """Test cases for bulk user provisioning"""
+
+    def test_csv_create_streams_rows_and_updates_membership_once(self, portal, bulk_client):
+        """
+        Test: Upload a CSV of three new users with groups
+        Expected: One row record per user then a summary; Cognito and the
+                  membership model have the users; one membership version bump
+        """
+        client, cognito = bulk_client
+        version = portal.membership.version
+        csv_body = 'Email,Groups\nDan@capsule.com,engineering;product\neve@capsule.com,hr\nfay@capsule.com,\n'
+
+        response = client.post('/api/users/bulk', content=csv_body, headers={'Content-Type': 'text/csv'})
+
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('application/x-ndjson')
+        records = read_records(response)
+        rows = sorted((r for r in records if r['type'] == 'row'), key=lambda r: r['row'])
+        assert [(r['email'], r['ok']) for r in rows] == [
+            ('dan@capsule.com', True), ('eve@capsule.com', True), ('fay@capsule.com', True)
+        ]
+        assert records[-1]['type'] == 'summary'
+        assert (records[-1]['succeeded'], records[-1]['failed']) == (3, 0)
+
+        assert cognito.groups_of('dan@capsule.com') == {'engineering', 'product'}
+        dan = portal.membership.find_username('dan@capsule.com')
+        assert dan == cognito.username_of('dan@capsule.com')
+        assert portal.membership.groups_for(dan) == ['engineering', 'product']
+        assert portal.membership.find_username('fay@capsule.com') == cognito.username_of('fay@capsule.com')
+        assert portal.membership.version == version + 1
+
+    def test_invalid_batch_is_rejected_without_changes(self, portal, bulk_client):
+        """
+        Test: JSON batch with a bad email, a duplicate, an existing user and an unknown group
+        Expected: 400 listing every bad row; no Cognito writes
+        """
+        client, cognito = bulk_client
+
+        response = client.post('/api/users/bulk', json={'action': 'create', 'users': [
+            {'email': 'ok@capsule.com', 'groups': ['hr']},
+            {'email': 'not-an-email'},
+            {'email': 'ok@capsule.com'},
+            {'email': 'bob@capsule.com'},
+            {'email': 'new@capsule.com', 'groups': ['finance']},
+        ]})
+
+        assert response.status_code == 400
+        errors = {e['row']: e['error'] for e in response.json()['errors']}
+        assert errors == {
+            2: 'Invalid email format',
+            3: 'Duplicate email in batch',
+            4: 'User already exists',
+            5: 'Unknown groups: finance',
+        }
+        assert cognito.calls['admin_create_user'] == 0
+
+    def test_reassign_and_delete(self, portal, bulk_client):
+        """
+        Test: Reassign bob to engineering+product, then delete carol; try deleting yourself
+        Expected: Groups added/removed per row; carol gone; self-delete rejected
+        """
+        client, cognito = bulk_client
+
+        response = client.post('/api/users/bulk', json={'action': 'reassign', 'users': [
+            {'email': 'bob@capsule.com', 'groups': ['engineering', 'product']}
+        ]})
+        row = read_records(response)[0]
+        assert (row['groups_added'], row['groups_removed']) == (['engineering', 'product'], ['hr'])
+        assert cognito.groups_of('bob@capsule.com') == {'engineering', 'product'}
+        assert portal.membership.groups_for(cognito.username_of('bob@capsule.com')) == ['engineering', 'product']
+
+        response = client.post('/api/users/bulk?action=delete', content='email\ncarol@capsule.com\n',
+                               headers={'Content-Type': 'text/csv'})
+        assert read_records(response)[-1]['succeeded'] == 1
+        assert cognito.username_of('carol@capsule.com') is None
+        assert portal.membership.find_username('carol@capsule.com') is None
+
+        response = client.post('/api/users/bulk', json={'action': 'delete', 'users': ['admin@capsule.com']})
+        assert response.json()['errors'][0]['error'] == 'Cannot delete your own account'
+
+    def test_failed_row_does_not_stop_batch(self, portal, bulk_client):
+        """
+        Test: Cognito rejects one user's group add mid-batch
+        Expected: That row reports the error; the others succeed; only the
+                  calls that succeeded reach the membership model
+        """
+        client, cognito = bulk_client
+        original = cognito.admin_add_user_to_group
+
+        def flaky(UserPoolId, Username, GroupName):
+            if Username == cognito.username_of('eve@capsule.com'):
+                raise RuntimeError('TooManyRequestsException')
+            return original(UserPoolId=UserPoolId, Username=Username, GroupName=GroupName)
+        cognito.admin_add_user_to_group = flaky
+
+        response = client.post('/api/users/bulk', json=[
+            {'email': 'dan@capsule.com', 'groups': ['hr']},
+            {'email': 'eve@capsule.com', 'groups': ['hr']},
+        ])
+
+        rows = {r['email']: r for r in read_records(response) if r['type'] == 'row'}
+        assert rows['dan@capsule.com']['ok'] is True
+        assert rows['eve@capsule.com'] == {
+            'type': 'row', 'row': 2, 'email': 'eve@capsule.com', 'action': 'create',
+            'ok': False, 'error': 'TooManyRequestsException'
+        }
+        eve = portal.membership.find_username('eve@capsule.com')
+        assert eve == cognito.username_of('eve@capsule.com')
+        assert portal.membership.groups_for(eve) == []
+
+    def test_rate_limiter_spaces_calls(self, portal):
+        """
+        Test: Eleven acquires on a 50/s bucket with a burst of one, from four threads
+        Expected: Ten waits of 20ms each - about 0.2s in total
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        limiter = portal.RateLimiter(50, burst=1)
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda _: limiter.acquire(), range(11)))
+
+        assert 0.18 <= time.monotonic() - started < 0.5
+
+    def test_rows_in_flight_at_disconnect_still_reach_membership(self, portal, bulk_client, monkeypatch):
+        """
+        Test: Close the stream after the first row while two rows are still inside Cognito
+        Expected: Closing does not wait for them; once they finish, every user
+                  Cognito created is in the membership model
+        """
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        _, cognito = bulk_client
+        executor = ThreadPoolExecutor(max_workers=3)
+        monkeypatch.setattr(portal, 'bulk_executor', executor)
+        gate = threading.Event()
+        waiting = threading.Semaphore(0)
+        original = cognito.admin_create_user
+
+        def slow(UserPoolId, Username, **kwargs):
+            if Username != 'dan@capsule.com':
+                waiting.release()
+                gate.wait(5)
+            return original(UserPoolId=UserPoolId, Username=Username, **kwargs)
+        cognito.admin_create_user = slow
+
+        rows = [{'row': i, 'email': email, 'groups': ['hr']}
+                for i, email in enumerate(['dan@capsule.com', 'eve@capsule.com', 'fay@capsule.com'], start=1)]
+        stream = portal.stream_bulk_results('create', rows, 'admin@capsule.com')
+        assert json.loads(next(stream))['email'] == 'dan@capsule.com'
+        assert waiting.acquire(timeout=5) and waiting.acquire(timeout=5)  # both slow rows are in Cognito
+        stream.close()
+        assert portal.membership.find_username('eve@capsule.com') is None
+
+        gate.set()
+        executor.shutdown(wait=True)
+        for email in ('dan@capsule.com', 'eve@capsule.com', 'fay@capsule.com'):
+            username = portal.membership.find_username(email)
+            assert username == cognito.username_of(email)
+            assert portal.membership.groups_for(username) == ['hr']
+
+    def test_reconciler_wakeup_from_a_worker_thread(self, portal):
+        """
+        Test: Request a reconcile from a plain thread while the reconciler's loop waits
+        Expected: The wake-up is handed to the loop and the waiter returns
+        """
+        import asyncio
+        import threading
+
+        async def wait_for_wakeup():
+            portal.reconciler_wakeup = asyncio.Event()
+            portal.reconciler_loop = asyncio.get_running_loop()
+            threading.Thread(target=portal.request_whitelist_reconcile).start()
+            await asyncio.wait_for(portal.reconciler_wakeup.wait(), 2)
+
+        asyncio.run(wait_for_wakeup())
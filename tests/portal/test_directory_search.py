@@ -0,0 +1,144 @@
+"""
+Unit tests for directory search (MembershipModel.search and
+/api/directory/search) in app.py
+"""
+
+import time
+
+import pytest
+
+from fake_aws import FakeCognito
+
+
+@pytest.fixture
+def cognito(portal):
+    """Pool of six users; loading into the model is left to each test."""
+    cognito = FakeCognito(users={
+        'ann@capsule.com': ['engineering'],
+        'Andy@capsule.com': ['hr'],
+        'anton@capsule.com': [],
+        'bea@capsule.com': ['engineering', 'hr'],
+        'ben@capsule.com': [],
+        'zoe@capsule.com': ['admins'],
+    })
+    portal.cognito_client = cognito
+    return cognito
+
+
+def make_client(portal):
+    from jose import jwt
+    from starlette.testclient import TestClient
+
+    client = TestClient(portal.app, base_url='https://testserver')
+    client.cookies.set('auth_token', jwt.encode({
+        'email': 'zoe@capsule.com', 'cognito:groups': ['admins'], 'exp': int(time.time()) + 3600
+    }, 'test-key'))
+    return client
+
+
+def emails(rows):
+    return [r['email'] for r in rows]
+
+
+class TestMembershipSearch:
+    """Test cases for MembershipModel.search"""
+
+    def test_prefix_limit_and_offset(self, portal, cognito):
+        """
+        Test: Search by prefixes of different case and length, with limit and offset
+        Expected: Case-insensitive, email-ordered matches; total counts every
+                  match regardless of the page; an empty prefix matches everyone
+        """
+        model = portal.membership
+        model.load()
+
+        rows, total = model.search('AN', limit=25)
+        assert emails(rows) == ['Andy@capsule.com', 'ann@capsule.com', 'anton@capsule.com'] and total == 3
+        assert rows[0] == {'email': 'Andy@capsule.com', 'status': 'CONFIRMED', 'groups': ['hr'], 'last_login': 'Never'}
+
+        assert emails(model.search('an', limit=2)[0]) == ['Andy@capsule.com', 'ann@capsule.com']
+        assert model.search('an', limit=2, offset=2) == (model.search('anton', limit=25)[0], 3)
+        assert model.search('an', limit=2, offset=5) == ([], 3)
+        assert model.search('ann@capsule.com', limit=25)[1] == 1
+        assert model.search('c', limit=25) == ([], 0)
+        assert model.search('', limit=4)[1] == 6
+
+    def test_index_follows_adds_and_removes(self, portal, cognito):
+        """
+        Test: Add and remove users in place, including one sharing a prefix
+        Expected: email_index stays sorted and matches the users; searches and
+                  find_username see the change without a reload
+        """
+        model = portal.membership
+        model.load()
+        version = model.version
+
+        model.apply_changes([
+            ('add_user', 'u-amy', 'Amy@capsule.com'),
+            ('add_user', 'u-bo', 'bo@capsule.com'),
+            ('remove_user', cognito.username_of('ann@capsule.com')),
+        ])
+
+        assert model.version == version + 1
+        assert model.email_index == sorted((r['email'].lower(), u) for u, r in model.users.items())
+        assert emails(model.search('a', limit=25)[0]) == ['Amy@capsule.com', 'Andy@capsule.com', 'anton@capsule.com']
+        assert emails(model.search('b', limit=25)[0]) == ['bea@capsule.com', 'ben@capsule.com', 'bo@capsule.com']
+        assert model.find_username('amy@capsule.com') == 'u-amy'
+        assert model.find_username('ann@capsule.com') is None
+
+        model.remove_user('u-amy')
+        model.remove_user('u-missing')
+        assert emails(model.search('am', limit=25)[0]) == []
+        assert len(model.email_index) == len(model.users) == 6
+
+
+class TestDirectorySearchApi:
+    """Test cases for /api/directory/search"""
+
+    def test_answers_from_the_index(self, portal, cognito):
+        """
+        Test: Search with a loaded index, then page and send bad parameters
+        Expected: source=index with totals and no Cognito calls; limit is
+                  clamped to 1..100; non-integer paging is a 400
+        """
+        portal.membership.load()
+        client = make_client(portal)
+        calls = sum(cognito.calls.values())
+
+        data = client.get('/api/directory/search', params={'q': 'b', 'limit': 1, 'offset': 1}).json()
+        assert (data['source'], data['total'], data['offset'], data['limit']) == ('index', 2, 1, 1)
+        assert emails(data['users']) == ['ben@capsule.com']
+        assert client.get('/api/directory/search', params={'limit': 1000}).json()['limit'] == 100
+        assert client.get('/api/directory/search', params={'offset': 'x'}).status_code == 400
+        assert sum(cognito.calls.values()) == calls
+
+    def test_cold_fallback_makes_one_cognito_call(self, portal, cognito, monkeypatch):
+        """
+        Test: Search before the index has loaded, with one user's groups in the legacy cache
+        Expected: source=cognito from a single list_users call; no per-row group
+                  lookups - cached groups are used, the rest are null
+        """
+        monkeypatch.setattr(portal.membership, 'load_in_background', lambda: None)
+        portal.group_cache[cognito.username_of('ann@capsule.com')] = (['engineering'], 0)
+        client = make_client(portal)
+
+        data = client.get('/api/directory/search', params={'q': 'an', 'limit': 2}).json()
+
+        assert (data['source'], data['total']) == ('cognito', None)
+        assert {u['email']: u['groups'] for u in data['users']} == {'ann@capsule.com': ['engineering'], 'anton@capsule.com': None}
+        assert cognito.calls['list_users'] == 1
+        assert cognito.calls['admin_list_groups_for_user'] == 0
+
+    def test_cold_pages_past_the_cognito_cap_use_the_index(self, portal, cognito, monkeypatch):
+        """
+        Test: Before the index has loaded, ask for a page ending past COGNITO_LIST_USERS_MAX
+        Expected: The model is loaded and answers (source=index with a total)
+                  instead of the single capped Cognito page returning short
+        """
+        monkeypatch.setattr(portal.membership, 'load_in_background', lambda: None)
+        client = make_client(portal)
+
+        data = client.get('/api/directory/search', params={'q': 'b', 'limit': 10, 'offset': 55}).json()
+
+        assert (data['source'], data['total'], data['users']) == ('index', 2, [])
+        assert portal.membership.is_loaded()
@@ -0,0 +1,105 @@
+"""
+Unit tests for the EC2 inventory feed behind /api/ec2/stream in app.py
+
+Covers the single-scan inventory, per-viewer whitelist flags and diff
+fan-out to multiple subscribers.
+"""
+
+import asyncio
+
+from fake_aws import FakeEC2, make_instance, make_security_group
+
+
+def build_ec2(portal):
+    ec2 = FakeEC2(
+        instances=[make_instance('i-eng', 'engineering'), make_instance('i-hr', 'hr')],
+        security_groups=[make_security_group('sg-launched', [
+            (22, '10.0.0.5/32', 'SSH from portal host'),
+            (80, '1.1.1.1/32', 'User=alice@capsule.com, IP=1.1.1.1, Port=80, Added=x'),
+        ])]
+    )
+    portal.ec2_client = ec2
+    return ec2
+
+
+class TestEc2Feed:
+    """Test cases for the EC2 inventory feed"""
+
+    def test_scan_uses_one_security_group_call(self, portal):
+        """
+        Test: Scan a fleet of two instances sharing one security group
+        Expected: One describe_security_groups call; per-viewer flags match the rules
+        """
+        ec2 = build_ec2(portal)
+
+        inventory, errors = portal.scan_ec2_inventory()
+
+        assert errors == {}
+        assert ec2.calls['describe_security_groups'] == 1
+        eng = inventory[('us-west-2', 'i-eng')]
+        assert eng['open_cidrs'] == {80: ['1.1.1.1/32'], 443: []}
+        view = portal.ec2_instance_view(eng, '1.1.1.1')
+        assert view['port_80_whitelisted'] is True
+        assert view['port_443_whitelisted'] is False
+        assert 'open_cidrs' not in view
+        assert view['region'] == 'us-west-2'
+        assert portal.ec2_instance_view(eng, '2.2.2.2')['port_80_whitelisted'] is False
+
+    def test_diffs_fan_out_to_all_subscribers(self, portal):
+        """
+        Test: Three subscribers, then an instance changes state and another is terminated
+        Expected: One scan per poll regardless of subscribers; each gets the same diff
+        """
+        ec2 = build_ec2(portal)
+        feed = portal.Ec2InventoryFeed()
+
+        async def next_events(queue, count):
+            return [await asyncio.wait_for(queue.get(), timeout=5) for _ in range(count)]
+
+        async def scenario():
+            queues = [feed.subscribe() for _ in range(3)]
+            first = [await next_events(q, 1) for q in queues]
+
+            ec2.instances[0]['State'] = {'Name': 'stopped'}
+            del ec2.instances[1]
+            feed.poke()
+            second = [await next_events(q, 2) for q in queues]
+
+            for queue in queues:
+                feed.unsubscribe(queue)
+            return first, second
+
+        first, second = asyncio.run(scenario())
+
+        assert all(events == [{'type': 'snapshot'}] for events in first)
+        for events in second:
+            assert [e['type'] for e in events] == ['upsert', 'remove']
+            assert events[0]['instance']['state'] == 'stopped'
+            assert events[1]['instance_id'] == 'i-hr'
+        assert ec2.calls['describe_instances'] == 2
+
+    def test_scan_failure_keeps_last_state(self, portal):
+        """
+        Test: A scan fails after a successful one
+        Expected: Subscribers get an error event and the previous state is kept
+        """
+        ec2 = build_ec2(portal)
+        feed = portal.Ec2InventoryFeed()
+
+        async def scenario():
+            queue = feed.subscribe()
+            await asyncio.wait_for(queue.get(), timeout=5)
+
+            def broken(**kwargs):
+                raise RuntimeError('throttled')
+            ec2.describe_instances = broken
+            feed.poke()
+            event = await asyncio.wait_for(queue.get(), timeout=5)
+            instance_ids = set(feed.instances)
+            feed.unsubscribe(queue)
+            return event, instance_ids
+
+        event, instance_ids = asyncio.run(scenario())
+
+        assert event == {'type': 'error', 'error': 'us-west-2: throttled'}
+        assert instance_ids == {('us-west-2', 'i-eng'), ('us-west-2', 'i-hr')}
@@ -0,0 +1,256 @@
+"""
+Unit tests for route latency budgets, stale fallback and circuit breakers in app.py
+
+Includes a fault-injection run: EC2 turns slow mid-test and request latency
+must stay within the route budget while last known good data is served.
+"""
+
+import time
+
+import pytest
+
+from fake_aws import FakeCognito, FakeEC2, make_instance, make_security_group
+
+
+class SlowableEC2(FakeEC2):
+    """FakeEC2 whose describe calls sleep for .delay seconds once set."""
+
+    delay = 0
+    slow_calls = 0
+
+    def describe_instances(self, **kwargs):
+        if self.delay:
+            self.slow_calls += 1
+            time.sleep(self.delay)
+        return super().describe_instances(**kwargs)
+
+
+@pytest.fixture
+def client(portal):
+    from jose import jwt
+    from starlette.testclient import TestClient
+
+    client = TestClient(portal.app, base_url='https://testserver')
+    client.cookies.set('auth_token', jwt.encode({
+        'email': 'alice@capsule.com', 'cognito:groups': ['engineering'], 'exp': int(time.time()) + 3600
+    }, 'test-key'))
+    return client
+
+
+class TestLatencyBudgets:
+    """Test cases for latency budgets and degraded-upstream handling"""
+
+    def test_slow_ec2_serves_stale_within_budget(self, portal, client, monkeypatch):
+        """
+        Test: EC2 becomes 1s slow after one good request; 20 requests with a 0.2s budget
+        Expected: p99 latency stays near the budget, last good instances are served
+                  marked stale, and the breaker stops calling EC2
+        """
+        monkeypatch.setattr(portal, 'DEFAULT_ROUTE_BUDGET', 0.2)
+        ec2 = SlowableEC2(
+            instances=[make_instance('i-eng', 'engineering'), make_instance('i-hr', 'hr')],
+            security_groups=[make_security_group('sg-launched')]
+        )
+        portal.ec2_client = ec2
+
+        healthy = client.get('/api/ec2/instances')
+        assert healthy.json()['stale'] == []
+        assert 'x-served-stale' not in healthy.headers
+
+        ec2.delay = 1.0
+        latencies = []
+        for _ in range(20):
+            started = time.perf_counter()
+            response = client.get('/api/ec2/instances')
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200
+            assert response.headers['x-served-stale'] == 'ec2'
+            assert [i['instance_id'] for i in response.json()['instances']] == ['i-eng', 'i-hr']
+
+        p99 = sorted(latencies)[int(len(latencies) * 0.99) - 1]
+        assert p99 < 0.5
+        assert portal.ec2_breaker('us-west-2').state == 'open'
+        assert ec2.slow_calls <= portal.CIRCUIT_FAILURE_THRESHOLD
+
+    def test_failure_without_history_returns_503(self, portal, client):
+        """
+        Test: EC2 fails before any successful describe
+        Expected: 503 with Retry-After instead of an empty instance list
+        """
+        ec2 = FakeEC2()
+
+        def broken(**kwargs):
+            raise RuntimeError('throttled')
+        ec2.describe_instances = broken
+        portal.ec2_client = ec2
+
+        response = client.get('/api/ec2/instances')
+
+        assert response.status_code == 503
+        assert response.headers['retry-after'] == str(int(portal.CIRCUIT_RESET_SECONDS))
+
+    def test_security_group_failure_is_not_reported_as_closed(self, portal, client):
+        """
+        Test: Security group lookups fail after one good request, then on an instance never seen
+        Expected: Known instances keep their last port status, marked stale;
+                  an instance without history gets 503 instead of "not whitelisted"
+        """
+        ec2 = FakeEC2(
+            instances=[make_instance('i-eng', 'engineering')],
+            security_groups=[make_security_group('sg-launched', rules=[(443, 'testclient/32', 'User=alice@capsule.com')])]
+        )
+        portal.ec2_client = ec2
+        assert client.get('/api/ec2/instances').json()['instances'][0]['port_443_whitelisted'] is True
+
+        def broken(**kwargs):
+            raise RuntimeError('throttled')
+        ec2.describe_security_groups = broken
+
+        stale = client.get('/api/ec2/instances')
+        assert stale.headers['x-served-stale'] == 'ec2'
+        assert stale.json()['instances'][0]['port_443_whitelisted'] is True
+
+        ec2.instances.append(make_instance('i-new', 'engineering'))
+        assert client.get('/api/ec2/instances').status_code == 503
+
+    def test_instances_route_keeps_aws_calls_off_the_event_loop(self, portal, client):
+        """
+        Test: Call /api/ec2/instances and /api/ec2/areas with the inventory scan instrumented
+        Expected: The scan runs in a worker thread with no event loop, and
+                  still sees the request's deadline
+        """
+        seen = []
+
+        def get_instances_by_tag(**kwargs):
+            import asyncio
+            with pytest.raises(RuntimeError):
+                asyncio.get_running_loop()
+            seen.append(portal.request_deadline.get())
+            return []
+        portal.get_instances_by_tag = get_instances_by_tag
+
+        assert client.get('/api/ec2/instances').json()['instances'] == []
+        assert client.get('/api/ec2/areas').json()['areas'] == []
+        assert len(seen) == 2 and all(deadline is not None for deadline in seen)
+
+    def test_request_path_uses_the_warmed_clients(self, portal):
+        """
+        Test: Get EC2 clients inside a request with 2.3s left, then outside any request
+        Expected: The same pooled client per region both times - the one
+                  warm-up exercised - so the budget never splits the pool
+        """
+        token = portal.request_deadline.set(time.monotonic() + 2.3)
+        try:
+            inside = portal.get_ec2_client()
+        finally:
+            portal.request_deadline.reset(token)
+
+        assert inside is portal.get_ec2_client() is portal.ec2_client
+        checks = portal.aws_warmup_checks()
+        assert set(checks) == {'cognito'} | {f'ec2:{region}' for region in portal.EC2_REGIONS}
+
+    def test_user_groups_fall_back_to_expired_cache(self, portal):
+        """
+        Test: Cognito fails after a user's cached groups expire
+        Expected: The expired groups are served and the request is marked stale;
+                  an uncached user raises UpstreamUnavailable
+        """
+        cognito = FakeCognito(users={'alice@capsule.com': ['engineering']})
+        portal.cognito_client = cognito
+        assert portal.get_user_groups('alice@capsule.com') == ['engineering']
+
+        portal.group_cache['alice@capsule.com'] = (['engineering'], time.time() - portal.CACHE_TTL - 1)
+
+        def broken(**kwargs):
+            raise RuntimeError('throttled')
+        cognito.admin_list_groups_for_user = broken
+
+        stale = set()
+        portal.stale_dependencies.set(stale)
+        assert portal.get_user_groups('alice@capsule.com') == ['engineering']
+        assert stale == {'cognito'}
+        with pytest.raises(portal.UpstreamUnavailable):
+            portal.get_user_groups('bob@capsule.com')
+
+    def test_breaker_probes_after_reset(self, portal, monkeypatch):
+        """
+        Test: Trip a breaker, wait out the reset period, then probe
+        Expected: Open rejects calls; one probe is let through; success closes it
+        """
+        monkeypatch.setattr(portal, 'CIRCUIT_RESET_SECONDS', 0.05)
+        breaker = portal.CircuitBreaker('test')
+        for _ in range(portal.CIRCUIT_FAILURE_THRESHOLD):
+            breaker.record_failure()
+
+        assert breaker.state == 'open'
+        with pytest.raises(portal.CircuitOpen):
+            portal.call_with_budget(breaker, lambda: 'unreachable')
+
+        time.sleep(0.06)
+        assert breaker.allow() is True
+        assert breaker.allow() is False
+        breaker.record_success()
+        assert portal.call_with_budget(breaker, lambda: 'ok') == 'ok'
+        assert breaker.state == 'closed'
+
+    def test_admin_writes_go_through_the_cognito_breaker(self, portal):
+        """
+        Test: Add a user to a group via the admin form, then again with the Cognito circuit open
+        Expected: The Cognito call runs off the event loop; with the circuit
+                  open Cognito is not called and the form reports the error
+        """
+        import asyncio
+
+        from jose import jwt
+        from starlette.testclient import TestClient
+
+        cognito = FakeCognito(users={'admin@capsule.com': ['admins'], 'bob@capsule.com': []}, groups=['hr'])
+        portal.cognito_client = cognito
+        original = cognito.admin_add_user_to_group
+
+        def add_user_to_group(**kwargs):
+            with pytest.raises(RuntimeError):
+                asyncio.get_running_loop()
+            return original(**kwargs)
+        cognito.admin_add_user_to_group = add_user_to_group
+
+        admin = TestClient(portal.app, base_url='https://testserver')
+        admin.cookies.set('auth_token', jwt.encode({
+            'email': 'admin@capsule.com', 'cognito:groups': ['admins'], 'exp': int(time.time()) + 3600
+        }, 'test-key'))
+        bob = cognito.username_of('bob@capsule.com')
+        form = {'username': bob, 'group_name': 'hr'}
+
+        response = admin.post('/admin/add-user-to-group', data=form, follow_redirects=False)
+        assert 'success=added' in response.headers['location']
+        assert cognito.groups_of('bob@capsule.com') == {'hr'}
+
+        for _ in range(portal.CIRCUIT_FAILURE_THRESHOLD):
+            portal.cognito_breaker.record_failure()
+        calls = cognito.calls['admin_add_user_to_group']
+        response = admin.post('/admin/remove-user-from-group', data=form, follow_redirects=False)
+        assert 'circuit' in response.headers['location']
+        assert cognito.groups_of('bob@capsule.com') == {'hr'} and cognito.calls['admin_add_user_to_group'] == calls
+
+    def test_rejected_requests_do_not_trip_the_breaker(self, portal):
+        """
+        Test: Repeated 400 ClientErrors, then a throttling error
+        Expected: The 400s are raised but leave the circuit closed; throttling counts as a failure
+        """
+        from botocore.exceptions import ClientError
+
+        def error(code, status):
+            return ClientError({'Error': {'Code': code, 'Message': code}, 'ResponseMetadata': {'HTTPStatusCode': status}}, 'Op')
+
+        def create_existing_user():
+            raise error('UsernameExistsException', 400)
+
+        breaker = portal.CircuitBreaker('test')
+        for _ in range(portal.CIRCUIT_FAILURE_THRESHOLD + 1):
+            with pytest.raises(ClientError):
+                portal.call_with_budget(breaker, create_existing_user)
+        assert (breaker.state, breaker.failures) == ('closed', 0)
+
+        assert portal.is_upstream_failure(error('ThrottlingException', 400))
+        assert portal.is_upstream_failure(error('InternalErrorException', 500))
+        assert portal.is_upstream_failure(RuntimeError('connection reset'))
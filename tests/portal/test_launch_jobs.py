@@ -0,0 +1,173 @@
+"""
+Unit tests for asynchronous EC2 launch jobs in app.py
+
+Covers stage reporting, the optional instance_running wait and the
+bounded job store.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from fake_aws import FakeEC2
+
+
+RESULT = {'instance_id': 'i-new', 'name': 'box-01', 'private_ip': '10.0.1.20', 'type': 't3.micro', 'area': 'engineering'}
+
+
+class FakeWaiter:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+
+    def wait(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture
+def launch_env(portal):
+    """Stub launch_ec2_instance (recording stages) and the instance_running waiter."""
+    stages = []
+
+    def fake_launch(instance_type, area, on_stage=None):
+        for stage in ('resolving-ami', 'creating'):
+            on_stage(stage, stage)
+            stages.append(portal.get_launch_job(job_ids[-1])['stage'])
+        return True, 'Successfully launched instance box-01 (i-new)', dict(RESULT)
+
+    ec2 = FakeEC2()
+    waiter = FakeWaiter()
+    ec2.get_waiter = lambda name: waiter
+    portal.ec2_client = ec2
+    portal.launch_ec2_instance = fake_launch
+    job_ids = []
+    loop = asyncio.new_event_loop()
+    yield job_ids, stages, waiter, loop
+    loop.close()
+
+
+class TestLaunchJobs:
+    """Test cases for EC2 launch jobs"""
+
+    def test_job_reports_stages_and_waits_for_running(self, portal, launch_env):
+        """
+        Test: Run a launch job with LAUNCH_WAIT_FOR_RUNNING on
+        Expected: Stages progress to running after the waiter; instance recorded
+        """
+        job_ids, stages, waiter, loop = launch_env
+        job = portal.create_launch_job('t3.micro', 'engineering', 'admin@capsule.com')
+        job_ids.append(job['job_id'])
+        assert job['stage'] == 'pending'
+
+        portal.run_launch_job(job['job_id'], 't3.micro', 'engineering', loop)
+
+        assert stages == ['resolving-ami', 'creating']
+        finished = portal.get_launch_job(job['job_id'])
+        assert finished['stage'] == 'running'
+        assert finished['instance']['instance_id'] == 'i-new'
+        assert waiter.calls[0]['InstanceIds'] == ['i-new']
+
+    def test_waiter_failure_marks_job_failed(self, portal, launch_env):
+        """
+        Test: Instance launches but never reaches running
+        Expected: Job ends failed with the instance still recorded
+        """
+        job_ids, _, waiter, loop = launch_env
+        waiter.error = RuntimeError('Max attempts exceeded')
+        job = portal.create_launch_job('t3.micro', 'engineering', 'admin@capsule.com')
+        job_ids.append(job['job_id'])
+
+        portal.run_launch_job(job['job_id'], 't3.micro', 'engineering', loop)
+
+        failed = portal.get_launch_job(job['job_id'])
+        assert failed['stage'] == 'failed'
+        assert 'did not reach running' in failed['error']
+        assert failed['instance']['instance_id'] == 'i-new'
+
+    def test_without_wait_job_ends_launched(self, portal, launch_env, monkeypatch):
+        """
+        Test: Run a launch job with LAUNCH_WAIT_FOR_RUNNING off
+        Expected: Job ends 'launched' (not 'running') without calling the waiter
+        """
+        job_ids, _, waiter, loop = launch_env
+        monkeypatch.setattr(portal, 'LAUNCH_WAIT_FOR_RUNNING', False)
+        job = portal.create_launch_job('t3.micro', 'engineering', 'admin@capsule.com')
+        job_ids.append(job['job_id'])
+
+        portal.run_launch_job(job['job_id'], 't3.micro', 'engineering', loop)
+
+        launched = portal.get_launch_job(job['job_id'])
+        assert launched['stage'] == 'launched'
+        assert launched['instance']['instance_id'] == 'i-new'
+        assert waiter.calls == []
+
+    def test_unexpected_error_marks_job_failed(self, portal, launch_env):
+        """
+        Test: launch_ec2_instance raises instead of returning a failure tuple
+        Expected: Job ends failed with the error instead of staying in its last stage
+        """
+        job_ids, _, _, loop = launch_env
+
+        def broken_launch(instance_type, area, on_stage=None):
+            on_stage('resolving-ami', 'resolving-ami')
+            raise KeyError('ImageId')
+        portal.launch_ec2_instance = broken_launch
+        job = portal.create_launch_job('t3.micro', 'engineering', 'admin@capsule.com')
+
+        portal.run_launch_job(job['job_id'], 't3.micro', 'engineering', loop)
+
+        failed = portal.get_launch_job(job['job_id'])
+        assert failed['stage'] == 'failed'
+        assert 'ImageId' in failed['error']
+
+    def test_store_evicts_oldest_finished_jobs(self, portal, monkeypatch):
+        """
+        Test: Fill the job store, finishing only the first job
+        Expected: The finished job is evicted first; a store of active jobs rejects new ones
+        """
+        monkeypatch.setattr(portal, 'LAUNCH_JOB_HISTORY', 3)
+        jobs = [portal.create_launch_job('t3.micro', 'hr', 'admin@capsule.com') for _ in range(3)]
+        portal.update_launch_job(jobs[0]['job_id'], stage='failed')
+
+        newest = portal.create_launch_job('t3.micro', 'hr', 'admin@capsule.com')
+
+        assert portal.get_launch_job(jobs[0]['job_id']) is None
+        assert list(portal.launch_jobs) == [jobs[1]['job_id'], jobs[2]['job_id'], newest['job_id']]
+        assert portal.create_launch_job('t3.micro', 'hr', 'admin@capsule.com') is None
+
+    def test_launch_api_returns_job_immediately(self, portal, launch_env):
+        """
+        Test: POST /api/ec2/launch-instance as an admin
+        Expected: 202 with a job ID; polling the job reaches running
+        """
+        from jose import jwt
+        from starlette.testclient import TestClient
+
+        job_ids, _, _, _ = launch_env
+        original_create = portal.create_launch_job
+
+        def create_and_record(*args):
+            job = original_create(*args)
+            job_ids.append(job['job_id'])
+            return job
+        portal.create_launch_job = create_and_record
+
+        client = TestClient(portal.app, base_url='https://testserver')
+        client.cookies.set('auth_token', jwt.encode({
+            'email': 'admin@capsule.com', 'cognito:groups': ['admins'], 'exp': int(time.time()) + 3600
+        }, 'test-key'))
+
+        response = client.post('/api/ec2/launch-instance', json={'instance_type': 't3.micro', 'area': 'engineering'})
+        assert response.status_code == 202
+        job_id = response.json()['job_id']
+
+        for _ in range(100):
+            job = client.get(f'/api/ec2/jobs/{job_id}').json()['job']
+            if job['stage'] in portal.LAUNCH_JOB_FINAL_STAGES:
+                break
+            time.sleep(0.02)
+        assert job['stage'] == 'running'
+        assert client.get('/api/ec2/jobs/unknown').status_code == 404
@@ -0,0 +1,178 @@
+"""
+Unit tests for the membership model (MembershipModel) in app.py
+
+Cognito usernames are UUIDs (the pool signs in by email), so every test
+checks the model stays keyed by username while callers pass emails.
+"""
+
+import time
+
+import pytest
+
+from fake_aws import FakeCognito
+
+
+@pytest.fixture
+def cognito(portal):
+    """Pool with an admin, two engineers and an empty product group, loaded into the model."""
+    cognito = FakeCognito(users={
+        'admin@capsule.com': ['admins'],
+        'alice@capsule.com': ['engineering'],
+        'bob@capsule.com': ['engineering', 'hr'],
+    }, groups=['product'])
+    portal.cognito_client = cognito
+    portal.membership.load()
+    return cognito
+
+
+def admin_client(portal):
+    from jose import jwt
+    from starlette.testclient import TestClient
+
+    client = TestClient(portal.app, base_url='https://testserver')
+    client.cookies.set('auth_token', jwt.encode({
+        'email': 'admin@capsule.com', 'cognito:groups': ['admins'], 'exp': int(time.time()) + 3600
+    }, 'test-key'))
+    return client
+
+
+def snapshot(portal):
+    return [(u['email'], u['groups']) for u in portal.membership.users_snapshot()]
+
+
+class TestMembershipModel:
+    """Test cases for MembershipModel"""
+
+    def test_load_keys_users_by_cognito_username(self, portal, cognito):
+        """
+        Test: Load a pool whose usernames are UUIDs
+        Expected: Users and group members are keyed by username; emails resolve
+                  to usernames; every group is listed, including empty ones
+        """
+        model = portal.membership
+        bob = cognito.username_of('bob@capsule.com')
+
+        assert bob != 'bob@capsule.com'
+        assert model.find_username('BOB@capsule.com') == bob
+        assert model.get_user(bob)['email'] == 'bob@capsule.com'
+        assert model.groups_for(bob) == ['engineering', 'hr']
+        assert model.members_of('engineering') == sorted([cognito.username_of('alice@capsule.com'), bob])
+        assert model.group_names() == ['admins', 'engineering', 'hr', 'product']
+        assert snapshot(portal) == [
+            ('admin@capsule.com', ['admins']),
+            ('alice@capsule.com', ['engineering']),
+            ('bob@capsule.com', ['engineering', 'hr']),
+        ]
+
+    def test_created_users_match_a_reload(self, portal, cognito):
+        """
+        Test: Create users through create_cognito_user and /admin/create-user, then reload
+        Expected: Each user appears once under its Cognito username, with its
+                  groups, and a full reload yields the same users
+        """
+        ok, _ = portal.create_cognito_user('Carol@capsule.com', ['product'])
+        assert ok
+        response = admin_client(portal).post('/admin/create-user', data={'email': 'dan@capsule.com'},
+                                             follow_redirects=False)
+        assert 'success=created' in response.headers['location']
+
+        carol = portal.membership.find_username('carol@capsule.com')
+        assert carol == cognito.username_of('carol@capsule.com')
+        assert portal.membership.groups_for(carol) == ['product']
+        assert portal.membership.find_username('dan@capsule.com') == cognito.username_of('dan@capsule.com')
+
+        before = snapshot(portal)
+        portal.membership.load()
+        assert snapshot(portal) == before
+        assert len(before) == 5
+
+    def test_remove_and_regroup(self, portal, cognito):
+        """
+        Test: Delete a user by email, then move another between groups through the admin forms
+        Expected: The deleted user leaves the index and every group; regrouping
+                  updates both directions of the group map and bumps the version
+        """
+        model = portal.membership
+        alice = cognito.username_of('alice@capsule.com')
+        bob = cognito.username_of('bob@capsule.com')
+
+        ok, _ = portal.delete_cognito_user('alice@capsule.com')
+        assert ok and cognito.username_of('alice@capsule.com') is None
+        assert model.find_username('alice@capsule.com') is None
+        assert model.get_user(alice) is None
+        assert model.members_of('engineering') == [bob]
+
+        client = admin_client(portal)
+        version = model.version
+        client.post('/admin/add-user-to-group', data={'username': bob, 'group_name': 'product'})
+        client.post('/admin/remove-user-from-group', data={'username': bob, 'group_name': 'hr'})
+
+        assert model.groups_for(bob) == ['engineering', 'product']
+        assert model.members_of('hr') == [] and model.members_of('product') == [bob]
+        assert cognito.groups_of('bob@capsule.com') == {'engineering', 'product'}
+        assert model.version == version + 2
+
+    def test_record_login_by_email(self, portal, cognito):
+        """
+        Test: Record a login for an email, then reload the pool
+        Expected: The user's last_login is set from the email and survives the
+                  reload; an unknown email changes nothing
+        """
+        model = portal.membership
+        alice = cognito.username_of('alice@capsule.com')
+        assert model.get_user(alice)['last_login'] == 'Never'
+
+        model.record_login('Alice@capsule.com')
+        last_login = model.get_user(alice)['last_login']
+        assert last_login.endswith('UTC')
+
+        version = model.version
+        model.record_login('nobody@capsule.com')
+        assert model.version == version
+
+        model.load()
+        assert model.get_user(alice)['last_login'] == last_login
+
+    def test_changes_during_a_reload_are_kept(self, portal, cognito):
+        """
+        Test: Add, regroup and delete users while a reload is stuck after list_users
+        Expected: The reload's result includes every change made during the scan
+                  instead of overwriting them with the older listing
+        """
+        import threading
+
+        model = portal.membership
+        listed, release = threading.Event(), threading.Event()
+        original = cognito.list_users
+
+        def slow_list_users(**kwargs):
+            response = original(**kwargs)
+            listed.set()
+            release.wait(5)
+            return response
+        cognito.list_users = slow_list_users
+
+        reload = threading.Thread(target=model.load)
+        reload.start()
+        assert listed.wait(5)
+
+        ok, _ = portal.create_cognito_user('carol@capsule.com', ['product'])
+        assert ok
+        alice = cognito.username_of('alice@capsule.com')
+        cognito.admin_add_user_to_group(UserPoolId='pool', Username=alice, GroupName='admins')
+        model.add_to_group(alice, 'admins')
+        ok, _ = portal.delete_cognito_user('bob@capsule.com')
+        assert ok
+        model.add_group('finance', 'Finance team')
+
+        release.set()
+        reload.join(5)
+
+        assert snapshot(portal) == [
+            ('admin@capsule.com', ['admins']),
+            ('alice@capsule.com', ['admins', 'engineering']),
+            ('carol@capsule.com', ['product']),
+        ]
+        assert model.find_username('bob@capsule.com') is None
+        assert 'finance' in model.group_names()
+        assert model._changes_during_load is None
@@ -0,0 +1,153 @@
+"""
+Unit tests for multi-region EC2 access in app.py
+
+Each region gets its own stubbed EC2 client. Covers the merged inventory,
+per-region timeouts and the reconciler applying rules region by region.
+"""
+
+import time
+
+import pytest
+
+from fake_aws import FakeCognito, FakeEC2, make_instance, make_security_group
+
+
+class SlowEC2(FakeEC2):
+    """Region whose describe calls take longer than the per-region budget."""
+
+    def describe_instances(self, **kwargs):
+        time.sleep(0.5)
+        return super().describe_instances(**kwargs)
+
+
+@pytest.fixture
+def regions(portal, monkeypatch):
+    """Portal region us-west-2 plus us-east-1 and a slow eu-west-1."""
+    west = FakeEC2(
+        instances=[make_instance('i-west', 'engineering', sg_id='sg-west')],
+        security_groups=[make_security_group('sg-west')]
+    )
+    east = FakeEC2(
+        instances=[make_instance('i-east', 'hr', sg_id='sg-east')],
+        security_groups=[make_security_group('sg-east', [
+            (80, '9.9.9.9/32', 'User=carol@capsule.com, IP=9.9.9.9, Port=80, Added=x'),
+        ])]
+    )
+    slow = SlowEC2(instances=[make_instance('i-eu', 'engineering', sg_id='sg-eu')])
+
+    portal.ec2_client = west
+    monkeypatch.setattr(portal, 'ec2_clients', {'us-east-1': east, 'eu-west-1': slow})
+    monkeypatch.setattr(portal, 'EC2_REGIONS', ['us-west-2', 'us-east-1', 'eu-west-1'])
+    return west, east, slow
+
+
+class TestMultiRegion:
+    """Test cases for multi-region EC2 access"""
+
+    def test_inventory_merges_regions_and_skips_slow_one(self, portal, regions):
+        """
+        Test: List instances across three regions, one slower than its budget
+        Expected: Instances from the fast regions, tagged with their region, within the budget
+        """
+        started = time.time()
+        results, errors = portal.fan_out_regions(lambda region: portal.get_ec2_client(region).describe_instances(), timeout=0.2)
+        assert time.time() - started < 0.45
+        assert set(results) == {'us-west-2', 'us-east-1'}
+        assert 'timed out' in errors['eu-west-1']
+
+        instances = portal.get_instances_by_tag()
+        assert {(i['region'], i['instance_id']) for i in instances} >= {('us-west-2', 'i-west'), ('us-east-1', 'i-east')}
+
+    def test_feed_keys_instances_by_region(self, portal, regions):
+        """
+        Test: Scan the inventory feed across all three regions
+        Expected: Keys are (region, instance_id) and each record carries its region
+        """
+        inventory, errors = portal.scan_ec2_inventory()
+
+        assert errors == {}
+        assert set(inventory) == {('us-west-2', 'i-west'), ('us-east-1', 'i-east'), ('eu-west-1', 'i-eu')}
+        assert inventory[('us-east-1', 'i-east')]['region'] == 'us-east-1'
+
+    def test_reconciler_applies_rules_per_region(self, portal, regions):
+        """
+        Test: Users in area groups whose instances live in different regions
+        Expected: Rules land on each region's own security group; stale rule revoked in its region
+        """
+        west, east, slow = regions
+        slow.security_groups = {'sg-eu': make_security_group('sg-eu')}
+        portal.cognito_client = FakeCognito(users={
+            'alice@capsule.com': ['engineering'],
+            'bob@capsule.com': ['hr'],
+            'carol@capsule.com': [],
+        })
+        portal.last_known_ips.update({'alice@capsule.com': '1.1.1.1', 'bob@capsule.com': '2.2.2.2'})
+
+        result = portal.run_whitelist_reconcile_cycle(dry_run=False)
+
+        assert result['success'], result['errors']
+        assert west.rules('sg-west') == {(80, '1.1.1.1/32'), (443, '1.1.1.1/32')}
+        assert east.rules('sg-east') == {(80, '2.2.2.2/32'), (443, '2.2.2.2/32')}
+        assert slow.rules('sg-eu') == {(80, '1.1.1.1/32'), (443, '1.1.1.1/32')}
+        assert {r['region'] for r in result['revoke']} == {'us-east-1'}
+
+    def test_reconciler_skips_failed_region(self, portal, regions):
+        """
+        Test: One region's describe fails during a cycle
+        Expected: Other regions are still reconciled; the failed region is untouched and reported
+        """
+        west, east, _ = regions
+        portal.EC2_REGIONS.remove('eu-west-1')
+        portal.cognito_client = FakeCognito(users={'alice@capsule.com': ['engineering']})
+        portal.last_known_ips['alice@capsule.com'] = '1.1.1.1'
+
+        def broken(**kwargs):
+            raise RuntimeError('throttled')
+        east.describe_security_groups = broken
+
+        result = portal.run_whitelist_reconcile_cycle(dry_run=False)
+
+        assert not result['success']
+        assert any(e.startswith('us-east-1: describe failed') for e in result['errors'])
+        assert west.rules('sg-west') == {(80, '1.1.1.1/32'), (443, '1.1.1.1/32')}
+        assert east.rules('sg-east') == {(80, '9.9.9.9/32')}
+
+    def test_audit_and_cleanup_cover_every_region(self, portal, regions):
+        """
+        Test: Audit, clean up orphans and clean up one user with rules in two
+              regions (a login-style User= rule and a legacy User: rule)
+        Expected: The audit lists both rules with their regions; the orphan is
+                  revoked in us-east-1 and the user's rule in us-west-2
+        """
+        import json
+        from jose import jwt
+        from starlette.testclient import TestClient
+
+        west, east, _ = regions
+        west.security_groups['sg-west'] = make_security_group('sg-west', [
+            (443, '1.1.1.1/32', 'User: alice@capsule.com | IP: 1.1.1.1 | Port: 443 | Added: x'),
+        ])
+        portal.cognito_client = FakeCognito(users={
+            'admin@capsule.com': ['admins'],
+            'alice@capsule.com': ['engineering'],
+        })
+        admin = TestClient(portal.app, base_url='https://testserver')
+        admin.cookies.set('auth_token', jwt.encode({
+            'email': 'admin@capsule.com', 'cognito:groups': ['admins'], 'exp': int(time.time()) + 3600
+        }, 'test-key'))
+
+        audit = admin.get('/admin/ip-whitelist-audit').json()
+        assert audit['success'] and audit['region_errors'] == {}
+        assert {(r['region'], r['email'], r['port']) for r in audit['valid']} == {('us-west-2', 'alice@capsule.com', '443')}
+        assert {(r['region'], r['email'], r['port']) for r in audit['orphaned']} == {('us-east-1', 'carol@capsule.com', '80')}
+        streamed = [json.loads(line) for line in portal.stream_whitelist_audit()]
+        assert {r['region'] for r in streamed if r['type'] == 'rule'} == {'us-west-2', 'us-east-1'}
+
+        cleanup = admin.post('/admin/cleanup-orphaned-ips').json()
+        assert cleanup['rules_removed'] == 1
+        assert cleanup['removed'] == [{'region': 'us-east-1', 'security_group_id': 'sg-east', 'ip': '9.9.9.9', 'port': '80'}]
+        assert east.rules('sg-east') == set()
+
+        cleanup = admin.post('/admin/cleanup-user-ip', json={'email': 'alice@capsule.com'}).json()
+        assert (cleanup['rules_removed'], cleanup['errors']) == (1, [])
+        assert west.rules('sg-west') == set()
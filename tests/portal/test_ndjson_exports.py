@@ -0,0 +1,105 @@
+"""
+Unit tests for the streaming NDJSON exports in app.py
+
+Covers the whitelist audit and user list generators against fake
+EC2/Cognito clients.
+"""
+
+import json
+
+from fake_aws import FakeCognito, FakeEC2, make_security_group
+
+
+def read_records(lines):
+    return [json.loads(line) for line in lines]
+
+
+class TestNdjsonExports:
+    """Test cases for the NDJSON export generators"""
+
+    def test_audit_streams_rules_then_summary(self, portal):
+        """
+        Test: Whitelist SG with a valid rule, an orphaned rule and an SSH rule
+        Expected: One record per user rule with its status, summary last
+        """
+        portal.ec2_client = FakeEC2(security_groups=[make_security_group('sg-launched', [
+            (22, '10.0.0.5/32', 'SSH from portal host'),
+            (80, '1.1.1.1/32', 'User: alice@capsule.com | IP: 1.1.1.1 | Port: 80 | Added: x'),
+            (80, '3.3.3.3/32', 'User: carol@capsule.com | IP: 3.3.3.3 | Port: 80 | Added: x'),
+        ])])
+        portal.cognito_client = FakeCognito(users={
+            'alice@capsule.com': ['engineering'],
+            'carol@capsule.com': ['admins'],
+        })
+
+        records = read_records(portal.stream_whitelist_audit())
+
+        rules = {r['email']: r for r in records if r['type'] == 'rule'}
+        assert rules['alice@capsule.com']['status'] == 'valid'
+        assert rules['carol@capsule.com']['status'] == 'orphaned'
+        assert rules['carol@capsule.com']['orphan_reason'] == 'User has no area group memberships'
+        assert records[-1]['type'] == 'summary'
+        assert records[-1]['total_rules'] == 2
+        assert records[-1]['orphaned_rules'] == 1
+
+    def test_users_stream_includes_groups(self, portal):
+        """
+        Test: Export users with and without an email prefix
+        Expected: One record per matching user with groups, summary last
+        """
+        portal.cognito_client = FakeCognito(users={
+            'alice@capsule.com': ['engineering'],
+            'bob@capsule.com': ['hr', 'admins'],
+        })
+
+        records = read_records(portal.stream_cognito_users())
+        users = {r['email']: r for r in records if r['type'] == 'user'}
+        assert users['bob@capsule.com']['groups'] == ['admins', 'hr']
+        assert records[-1] == {'type': 'summary', 'total_users': 2, 'took_ms': records[-1]['took_ms']}
+
+        records = read_records(portal.stream_cognito_users('ali'))
+        assert [r['email'] for r in records if r['type'] == 'user'] == ['alice@capsule.com']
+
+    def test_failure_ends_with_error_record(self, portal):
+        """
+        Test: Cognito fails while the user export is streaming
+        Expected: Stream ends with an error record instead of a summary
+        """
+        cognito = FakeCognito(users={'alice@capsule.com': []})
+
+        def broken(**kwargs):
+            raise RuntimeError('throttled')
+        cognito.list_users = broken
+        portal.cognito_client = cognito
+
+        records = read_records(portal.stream_cognito_users())
+
+        assert records == [{'type': 'error', 'error': 'throttled', 'users_sent': 0}]
+
+    def test_users_stream_reads_groups_from_the_model(self, portal):
+        """
+        Test: Export users once with membership loadable, then with list_groups failing
+        Expected: No per-user group lookups either way; when membership can't
+                  load, rows have null groups and the export still completes
+        """
+        cognito = FakeCognito(users={
+            'alice@capsule.com': ['engineering'],
+            'bob@capsule.com': ['hr', 'admins'],
+        })
+        portal.cognito_client = cognito
+
+        records = read_records(portal.stream_cognito_users())
+        assert {r['email']: r['groups'] for r in records if r['type'] == 'user'} == {
+            'alice@capsule.com': ['engineering'], 'bob@capsule.com': ['admins', 'hr']
+        }
+
+        def broken(**kwargs):
+            raise RuntimeError('throttled')
+        fresh = type(portal.membership)()
+        portal.membership = fresh
+        cognito.list_groups = broken
+
+        records = read_records(portal.stream_cognito_users())
+        assert [r['groups'] for r in records if r['type'] == 'user'] == [None, None]
+        assert records[-1]['type'] == 'summary' and records[-1]['total_users'] == 2
+        assert cognito.calls['admin_list_groups_for_user'] == 0
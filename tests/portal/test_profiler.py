@@ -0,0 +1,112 @@
+"""
+Unit tests for the on-demand request profiler in app.py
+"""
+
+import time
+
+import pytest
+
+
+def make_client(portal, email, groups):
+    from jose import jwt
+    from starlette.testclient import TestClient
+
+    client = TestClient(portal.app, base_url='https://testserver')
+    client.cookies.set('auth_token', jwt.encode({
+        'email': email, 'cognito:groups': groups, 'exp': int(time.time()) + 3600
+    }, 'test-key'))
+    return client
+
+
+@pytest.fixture
+def slow_route(portal, tmp_path, monkeypatch):
+    """A route that spends its time in a named synchronous function."""
+    monkeypatch.setattr(portal, 'PROFILE_DIR', str(tmp_path / 'profiles'))
+    monkeypatch.setattr(portal, 'PROFILE_INTERVAL_MS', 2)
+
+    def render_report():
+        time.sleep(0.1)
+        return 'done'
+
+    @portal.app.get('/slow-report')
+    async def slow_report(request: portal.Request):
+        return {'result': render_report()}
+
+
+class TestProfiler:
+    """Test cases for the request profiler"""
+
+    def test_admin_flag_profiles_one_request(self, portal, slow_route):
+        """
+        Test: Admin calls a slow route with X-Profile: 1, then lists and downloads the profile
+        Expected: X-Profile-Id on the response; /admin/profiles lists it; the
+                  folded stacks attribute the time to the slow function
+        """
+        admin = make_client(portal, 'admin@capsule.com', ['admins'])
+
+        response = admin.get('/slow-report', headers={'X-Profile': '1'})
+
+        profile_id = response.headers['x-profile-id']
+        listing = admin.get('/admin/profiles').json()
+        assert [p['id'] for p in listing['profiles']] == [profile_id]
+        meta = listing['profiles'][0]
+        assert (meta['path'], meta['status'], meta['trigger'], meta['user']) == (
+            '/slow-report', 200, 'requested', 'admin@capsule.com'
+        )
+        assert meta['duration_ms'] >= 100 and meta['samples'] > 10
+
+        folded = admin.get(f'/admin/profiles/{profile_id}')
+        assert folded.headers['content-type'].startswith('text/plain')
+        assert folded.headers['content-disposition'] == f'attachment; filename="{profile_id}.folded"'
+        lines = folded.text.splitlines()
+        assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+        hot = sum(int(line.rsplit(' ', 1)[1]) for line in lines if 'render_report (test_profiler.py:' in line)
+        assert hot >= meta['samples'] // 2
+
+        assert admin.get('/admin/profiles/..%2F..%2Fetc%2Fpasswd').status_code == 404
+
+    def test_off_unless_admin_flag_or_sample_rate(self, portal, slow_route, monkeypatch):
+        """
+        Test: Plain requests and a non-admin's flag, then a 100% sample rate with two kept files
+        Expected: No profiler is started and non-admins get 403 on /admin/profiles;
+                  sampled requests are profiled and only the newest two are kept
+        """
+        started = []
+        original = portal.RequestProfiler.start
+        monkeypatch.setattr(portal.RequestProfiler, 'start', lambda self: started.append(self) or original(self))
+
+        user = make_client(portal, 'bob@capsule.com', ['engineering'])
+        assert 'x-profile-id' not in user.get('/slow-report', headers={'X-Profile': '1'}).headers
+        assert 'x-profile-id' not in user.get('/slow-report?profile=1').headers
+        assert started == []
+        assert user.get('/admin/profiles').status_code == 403
+
+        monkeypatch.setattr(portal, 'PROFILE_SAMPLE_RATE', 1.0)
+        monkeypatch.setattr(portal, 'PROFILE_MAX_FILES', 2)
+        ids = [user.get('/slow-report').headers['x-profile-id'] for _ in range(3)]
+        assert user.get('/health').status_code == 200
+
+        admin = make_client(portal, 'admin@capsule.com', ['admins'])
+        profiles = admin.get('/admin/profiles').json()['profiles']
+        assert [p['id'] for p in profiles] == [ids[2], ids[1]]
+        assert {p['trigger'] for p in profiles} == {'sampled'}
+        assert len(started) == 4
+
+    def test_sampler_is_joined_off_the_event_loop(self, portal, slow_route, monkeypatch):
+        """
+        Test: Profile one request while recording which threads start and stop the profiler
+        Expected: start() runs on the event loop; stop() (which joins the
+                  sampler thread) runs on a worker thread
+        """
+        import threading
+
+        threads = {}
+        original_start, original_stop = portal.RequestProfiler.start, portal.RequestProfiler.stop
+        monkeypatch.setattr(portal.RequestProfiler, 'start',
+                            lambda self: threads.setdefault('start', threading.get_ident()) and original_start(self))
+        monkeypatch.setattr(portal.RequestProfiler, 'stop',
+                            lambda self: threads.setdefault('stop', threading.get_ident()) and original_stop(self))
+
+        admin = make_client(portal, 'admin@capsule.com', ['admins'])
+        assert 'x-profile-id' in admin.get('/slow-report', headers={'X-Profile': '1'}).headers
+        assert threads['start'] != threads['stop']
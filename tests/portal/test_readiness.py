@@ -0,0 +1,143 @@
+"""
+Unit tests for the startup warm-up and the /ready endpoint in app.py
+"""
+
+import asyncio
+
+import pytest
+
+from fake_aws import FakeCognito, FakeEC2, make_instance, make_security_group
+
+
+@pytest.fixture
+def warm_env(portal):
+    """Fake Cognito/EC2 and a stubbed IMDS for the portal host."""
+    portal.cognito_client = FakeCognito(users={'alice@capsule.com': ['engineering']})
+    ec2 = FakeEC2(
+        instances=[make_instance('i-portal', 'portal'), make_instance('i-eng', 'engineering')],
+        security_groups=[make_security_group('sg-launched')]
+    )
+    ec2.instances[0]['VpcId'] = 'vpc-1'
+    portal.ec2_client = ec2
+    metadata = {'instance-id': 'i-portal', 'local-ipv4': '10.0.0.5'}
+    portal.get_instance_metadata = metadata.get
+    return ec2
+
+
+class TestReadiness:
+    """Test cases for startup warm-up and /ready"""
+
+    def test_not_ready_until_warmed(self, portal, warm_env):
+        """
+        Test: Call /ready and /health before and after the warm-up
+        Expected: /ready is 503 then 200 with a timing per component; /health is always 200
+        """
+        from starlette.testclient import TestClient
+
+        client = TestClient(portal.app, base_url='https://testserver')
+        assert client.get('/health').status_code == 200
+        assert client.get('/ready').status_code == 503
+
+        asyncio.run(portal.run_startup_warmup())
+
+        response = client.get('/ready')
+        assert response.status_code == 200
+        body = response.json()
+        assert body['status'] == 'ready'
+        assert set(body['components']) == {
+            'credentials', 'cognito', 'ec2:us-west-2',
+            'memberships', 'ec2_inventory', 'security_groups', 'instance_metadata'
+        }
+        assert all(c['ok'] and 'ms' in c for c in body['components'].values())
+        assert body['circuits']['cognito'] == 'closed'
+
+        # Caches are warm: membership model, feed snapshot, stale fallback, host info
+        assert portal.membership.is_loaded()
+        assert ('us-west-2', 'i-eng') in portal.ec2_feed.instances
+        assert ('VibeCodeArea', None, 'us-west-2') in portal.last_good_instances
+        assert portal.get_current_instance_info()['vpc_id'] == 'vpc-1'
+
+    def test_optional_failure_reported_but_ready(self, portal, warm_env):
+        """
+        Test: EC2 is failing during the warm-up
+        Expected: EC2 components are reported failed, but the process is still ready
+        """
+        def broken(**kwargs):
+            raise RuntimeError('UnauthorizedOperation')
+        warm_env.describe_instances = broken
+
+        asyncio.run(portal.run_startup_warmup())
+
+        components = portal.readiness['components']
+        assert portal.readiness['state'] == 'ready'
+        assert components['ec2:us-west-2'] == {'ok': False, 'error': 'UnauthorizedOperation', 'ms': components['ec2:us-west-2']['ms']}
+        assert components['instance_metadata']['ok'] is False
+        assert components['memberships']['ok'] is True
+
+    def test_feed_failing_in_every_region_is_not_ok(self, portal, warm_env):
+        """
+        Test: The security group scan fails in every region during the warm-up
+        Expected: security_groups is reported failed with the region error and
+                  the feed stays unloaded
+        """
+        def broken(**kwargs):
+            raise RuntimeError('AuthFailure')
+        warm_env.describe_security_groups = broken
+
+        asyncio.run(portal.run_startup_warmup())
+
+        component = portal.readiness['components']['security_groups']
+        assert component['ok'] is False and 'us-west-2: AuthFailure' in component['error']
+        assert portal.ec2_feed.loaded_at is None
+
+    def test_required_failure_retried_with_backoff(self, portal, warm_env, monkeypatch):
+        """
+        Test: Credentials fail for the first three warm-up passes
+        Expected: Only the failed steps are retried, with doubling delays, until
+                  /ready reports ready
+        """
+        original_warm_up = portal.warm_up
+        client_passes = []
+
+        def flaky_warm_up(checks):
+            client_passes.append(len(client_passes))
+            if len(client_passes) <= 3:
+                return {'credentials': {'ok': False, 'error': 'no AWS credentials found', 'ms': 0.1}}
+            return original_warm_up(checks)
+        monkeypatch.setattr(portal, 'warm_up', flaky_warm_up)
+
+        delays = []
+        original_sleep = asyncio.sleep
+        monkeypatch.setattr(portal.asyncio, 'sleep', lambda delay: delays.append(delay) or original_sleep(0))
+        loads = []
+        monkeypatch.setattr(portal.membership, 'ensure_loaded', lambda: loads.append(1))
+
+        asyncio.run(portal.warm_up_until_ready())
+
+        assert portal.readiness['state'] == 'ready'
+        assert len(client_passes) == 4 and len(loads) == 1
+        assert delays == [portal.WARMUP_RETRY_SECONDS * 2 ** i for i in range(3)]
+
+    def test_optional_failures_retried_a_bounded_number_of_times(self, portal, warm_env, monkeypatch):
+        """
+        Test: EC2 keeps failing while credentials are fine
+        Expected: Ready after the first pass; the EC2 steps are retried
+                  WARMUP_RETRY_ATTEMPTS passes in total, then given up
+        """
+        def broken(**kwargs):
+            raise RuntimeError('UnauthorizedOperation')
+        warm_env.describe_instances = broken
+        monkeypatch.setattr(portal, 'WARMUP_RETRY_SECONDS', 0.001)
+        passes = []
+        original = portal.run_startup_warmup
+
+        async def counted(only=None):
+            passes.append(only)
+            return await original(only)
+        monkeypatch.setattr(portal, 'run_startup_warmup', counted)
+
+        asyncio.run(portal.warm_up_until_ready())
+
+        assert portal.readiness['state'] == 'ready'
+        assert len(passes) == portal.WARMUP_RETRY_ATTEMPTS
+        assert passes[1] == {'aws_clients', 'ec2_inventory', 'security_groups', 'instance_metadata'}
@@ -0,0 +1,155 @@
+"""
+Unit tests for refresh-token sessions in app.py
+
+Covers the encrypted refresh cookie, silent renewal in auth_middleware and
+skipping IP whitelisting when a refreshed session's IP hasn't changed.
+"""
+
+import time
+
+import pytest
+
+from fake_aws import FakeCognito, FakeEC2
+
+
+def make_id_token(email, groups, expires_in):
+    from jose import jwt
+    return jwt.encode({
+        'email': email,
+        'cognito:username': email,
+        'cognito:groups': groups,
+        'exp': int(time.time()) + expires_in
+    }, 'test-key')
+
+
+@pytest.fixture
+def session_client(portal):
+    """TestClient with a /whoami route and a Cognito fake that answers REFRESH_TOKEN_AUTH."""
+    from starlette.testclient import TestClient
+
+    cognito = FakeCognito(users={'alice@capsule.com': ['engineering']})
+    revoked = set()
+
+    def initiate_auth(AuthFlow, ClientId, AuthParameters):
+        cognito.calls['initiate_auth'] += 1
+        assert AuthFlow == 'REFRESH_TOKEN_AUTH'
+        assert AuthParameters['REFRESH_TOKEN'] == 'rt-alice'
+        if AuthParameters['REFRESH_TOKEN'] in revoked:
+            raise RuntimeError('NotAuthorizedException: Refresh Token has been revoked')
+        return {'AuthenticationResult': {'IdToken': make_id_token('alice@capsule.com', ['engineering'], 3600)}}
+    cognito.initiate_auth = initiate_auth
+
+    def revoke_token(Token, ClientId, ClientSecret):
+        cognito.calls['revoke_token'] += 1
+        revoked.add(Token)
+    cognito.revoke_token = revoke_token
+
+    portal.cognito_client = cognito
+    portal.ec2_client = FakeEC2()
+    whitelist_calls = []
+    portal.apply_login_whitelist = lambda email, groups, ip: whitelist_calls.append((email, ip)) or True
+
+    @portal.app.get('/whoami')
+    async def whoami(request: portal.Request):
+        return {'email': request.state.email}
+
+    client = TestClient(portal.app, base_url='https://testserver')
+    return client, cognito, whitelist_calls
+
+
+class TestSessions:
+    """Test cases for refresh-token sessions"""
+
+    def test_refresh_cookie_round_trip(self, portal):
+        """
+        Test: Seal a refresh session, then open it and a tampered copy
+        Expected: Original decrypts to (username, token), tampered copy is rejected
+        """
+        cookie = portal.seal_refresh_session('alice@capsule.com', 'rt-alice')
+
+        assert portal.open_refresh_session(cookie) == ('alice@capsule.com', 'rt-alice')
+        assert portal.open_refresh_session(cookie[:-4] + 'AAAA') is None
+        assert portal.open_refresh_session('not-a-cookie') is None
+
+    def test_expired_token_renewed_silently(self, portal, session_client):
+        """
+        Test: Request with an expired ID token and a valid refresh cookie
+        Expected: Request succeeds, new auth_token cookie is set, one Cognito call
+        """
+        client, cognito, whitelist_calls = session_client
+        client.cookies.set('auth_token', make_id_token('alice@capsule.com', ['engineering'], -10))
+        client.cookies.set(portal.REFRESH_COOKIE, portal.seal_refresh_session('alice@capsule.com', 'rt-alice'))
+
+        response = client.get('/whoami', follow_redirects=False)
+
+        assert response.status_code == 200
+        assert response.json() == {'email': 'alice@capsule.com'}
+        assert 'auth_token=' in response.headers['set-cookie']
+        assert cognito.calls['initiate_auth'] == 1
+        assert whitelist_calls == [('alice@capsule.com', 'testclient')]
+
+    def test_refresh_skips_whitelist_for_same_ip(self, portal, session_client):
+        """
+        Test: Session refreshed again from the same IP with the same groups
+        Expected: Whitelisting runs only for the first refresh
+        """
+        client, cognito, whitelist_calls = session_client
+        refresh_cookie = portal.seal_refresh_session('alice@capsule.com', 'rt-alice')
+
+        for _ in range(2):
+            portal.recent_refreshes.clear()
+            client.cookies.clear()
+            client.cookies.set(portal.REFRESH_COOKIE, refresh_cookie)
+            assert client.get('/whoami', follow_redirects=False).status_code == 200
+
+        assert cognito.calls['initiate_auth'] == 2
+        assert len(whitelist_calls) == 1
+
+    def test_no_valid_session_redirects_to_login(self, portal, session_client):
+        """
+        Test: Expired ID token and a refresh cookie that fails to decrypt
+        Expected: Redirect to /login without calling Cognito
+        """
+        client, cognito, _ = session_client
+        client.cookies.set('auth_token', make_id_token('alice@capsule.com', ['engineering'], -10))
+        client.cookies.set(portal.REFRESH_COOKIE, 'forged')
+
+        response = client.get('/whoami', follow_redirects=False)
+
+        assert response.status_code == 302
+        assert response.headers['location'] == '/login'
+        assert cognito.calls['initiate_auth'] == 0
+
+    def test_logout_clears_cached_refresh(self, portal, session_client):
+        """
+        Test: Refresh a session, log out, then replay the old refresh cookie within REFRESH_REUSE_SECONDS
+        Expected: Logout revokes the token and drops the cached result, so the
+                  replay goes to Cognito, is refused and redirects to /login
+        """
+        client, cognito, _ = session_client
+        refresh_cookie = portal.seal_refresh_session('alice@capsule.com', 'rt-alice')
+        client.cookies.set(portal.REFRESH_COOKIE, refresh_cookie)
+        assert client.get('/whoami', follow_redirects=False).status_code == 200
+        assert len(portal.recent_refreshes) == 1
+
+        client.get('/logout', follow_redirects=False)
+        assert cognito.calls['revoke_token'] == 1
+        assert portal.recent_refreshes == {}
+
+        client.cookies.clear()
+        client.cookies.set(portal.REFRESH_COOKIE, refresh_cookie)
+        response = client.get('/whoami', follow_redirects=False)
+        assert response.status_code == 302 and response.headers['location'] == '/login'
+        assert cognito.calls['initiate_auth'] == 2
+
+    def test_forget_drops_rotated_predecessor(self, portal):
+        """
+        Test: A cached refresh that rotated cookie A into cookie B, then B is forgotten
+        Expected: The entry for A (which would hand out B's session) is dropped too
+        """
+        portal.recent_refreshes['a-key'] = ('id-token', 'cookie-b', time.time())
+        portal.recent_refreshes['other'] = ('id-token', None, time.time())
+
+        portal.forget_refresh_session('cookie-b')
+
+        assert list(portal.recent_refreshes) == ['other']
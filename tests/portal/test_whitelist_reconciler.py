@@ -0,0 +1,120 @@
+"""
+Unit tests for the fleet-wide whitelist reconciler in app.py
+
+Covers rule-description parsing, the desired-state diff and a full cycle
+against fake EC2/Cognito clients.
+"""
+
+from fake_aws import FakeCognito, FakeEC2, make_instance, make_security_group
+
+
+def build_fleet(portal, rules=()):
+    ec2 = FakeEC2(
+        instances=[
+            make_instance('i-eng', 'engineering'),
+            make_instance('i-hr', 'hr'),
+        ],
+        security_groups=[make_security_group('sg-launched', rules)]
+    )
+    cognito = FakeCognito(users={
+        'alice@capsule.com': ['engineering'],
+        'bob@capsule.com': ['hr', 'admins'],
+        'carol@capsule.com': ['admins'],
+    })
+    portal.ec2_client = ec2
+    portal.cognito_client = cognito
+    return ec2, cognito
+
+
+class TestWhitelistReconciler:
+    """Test cases for the whitelist reconciler"""
+
+    def test_parse_rule_owner_both_formats(self, portal):
+        """
+        Test: Parse both description formats the portal has written
+        Expected: (email, ip) for managed rules, None otherwise
+        """
+        parse = portal.parse_whitelist_rule_owner
+        assert parse("User=a@capsule.com, IP=1.2.3.4, Port=80, Added=2026") == ('a@capsule.com', '1.2.3.4')
+        assert parse("User: a@capsule.com | IP: 1.2.3.4 | Port: 443 | Added: x") == ('a@capsule.com', '1.2.3.4')
+        assert parse("SSH from portal host") is None
+        assert parse("") is None
+
+    def test_diff_never_revokes_unmanaged_rules(self, portal):
+        """
+        Test: Current state has a hand-made rule that is not desired
+        Expected: Only portal-managed rules are revoked
+        """
+        desired = {('sg-1', 80, '1.1.1.1/32'): 'a@capsule.com'}
+        current = {
+            ('sg-1', 22, '10.0.0.5/32'): None,
+            ('sg-1', 80, '2.2.2.2/32'): 'b@capsule.com',
+        }
+
+        to_authorize, to_revoke = portal.diff_whitelist_rules(desired, current)
+
+        assert to_authorize == desired
+        assert to_revoke == {('sg-1', 80, '2.2.2.2/32'): 'b@capsule.com'}
+
+    def test_cycle_converges_fleet(self, portal):
+        """
+        Test: Stale rule for a user with no area groups, IP change for another
+        Expected: One cycle authorizes/revokes in batches; a second cycle is a no-op
+        """
+        ec2, _ = build_fleet(portal, rules=[
+            (22, '10.0.0.5/32', 'SSH from portal host'),
+            (80, '9.9.9.9/32', 'User=carol@capsule.com, IP=9.9.9.9, Port=80, Added=x'),
+            (80, '5.5.5.5/32', 'User: bob@capsule.com | IP: 5.5.5.5 | Port: 80 | Added: x'),
+            (443, '5.5.5.5/32', 'User: bob@capsule.com | IP: 5.5.5.5 | Port: 443 | Added: x'),
+        ])
+        portal.last_known_ips['alice@capsule.com'] = '1.1.1.1'
+        portal.last_known_ips['bob@capsule.com'] = '2.2.2.2'
+
+        result = portal.run_whitelist_reconcile_cycle(dry_run=False)
+
+        assert result['success'], result['errors']
+        assert ec2.rules('sg-launched') == {
+            (22, '10.0.0.5/32'),
+            (80, '1.1.1.1/32'), (443, '1.1.1.1/32'),
+            (80, '2.2.2.2/32'), (443, '2.2.2.2/32'),
+        }
+        # One authorize per port, one revoke per port
+        assert ec2.calls['authorize_security_group_ingress'] == 2
+        assert ec2.calls['revoke_security_group_ingress'] == 2
+
+        second = portal.run_whitelist_reconcile_cycle(dry_run=False)
+        assert second['to_authorize'] == 0
+        assert second['to_revoke'] == 0
+
+    def test_dry_run_changes_nothing(self, portal):
+        """
+        Test: Dry-run cycle with pending changes
+        Expected: Plan is reported, security group untouched, metrics recorded
+        """
+        ec2, _ = build_fleet(portal)
+        portal.last_known_ips['alice@capsule.com'] = '1.1.1.1'
+
+        result = portal.run_whitelist_reconcile_cycle(dry_run=True)
+
+        assert result['to_authorize'] == 2
+        assert {r['cidr'] for r in result['authorize']} == {'1.1.1.1/32'}
+        assert ec2.rules('sg-launched') == set()
+        assert portal.reconciler_history[-1]['dry_run'] is True
+
+    def test_aws_failure_aborts_without_revoking(self, portal):
+        """
+        Test: Cognito listing fails mid-cycle
+        Expected: Cycle aborts and no rules are revoked
+        """
+        ec2, cognito = build_fleet(portal, rules=[
+            (80, '5.5.5.5/32', 'User=bob@capsule.com, IP=5.5.5.5, Port=80, Added=x'),
+        ])
+
+        def broken(**kwargs):
+            raise RuntimeError('throttled')
+        cognito.list_groups = broken
+
+        result = portal.run_whitelist_reconcile_cycle(dry_run=False)
+
+        assert not result['success']
+        assert ec2.rules('sg-launched') == {(80, '5.5.5.5/32')}